@@ -18,16 +18,28 @@
 #
 from pathlib import Path
 import os
+from functools import partial
 
 import logging
 import time
 from decimal import Decimal
+from fractions import Fraction
 
 from htd_validate.decompositions import fhtd
 from htd_validate.utils.hypergraph_primalview import Hypergraph, HypergraphPrimalView
 
-from fhtd.preprocessing import FractionalHyperTreeDecomposition_Preprocessor as Preprocessor
+from fhtd.heuristics import join_tree_decomposition, chordal_decomposition, heuristic_decomposition, \
+    local_search_decomposition, multilevel_decomposition, heuristic_lower_bound
+from fhtd.dp import FractionalHypertreeDecompositionDP
+from fhtd.heuristics.cover import FractionalCoverCache
+from fhtd.preprocessing import FractionalHyperTreeDecomposition_Preprocessor as Preprocessor, dominated_hyperedges, \
+    twin_classes, quotient_twins, expand_twins, replay_decomposition, automorphism_generators
+from fhtd.preprocessing.cliques import CliqueSession, BackgroundClique, clingo_available
+from fhtd.preprocessing.native_cliques import PMCCliqueProvider
 from fhtd.smt import FractionalHypertreeDecompositionCommandline
+from fhtd.tw_sat import GraphSatTw, primal_graph, treewidth_bounds
+from fhtd.utils.race import BoundRace
+from fhtd.utils.signals import AbortException
 # from fhtd.smt import FractionalHypertreeDecomposition_z3
 
 
@@ -53,9 +65,19 @@ class FractionalHypertreeDecomposer:
     # todo: for hypergraph?!
     def solve(self, only_fhtw=False, connect_components=True, accuracy=Hypergraph.ACCURACY * 1000, encode_cliques=True,
               encode_twins=True, clique_k=4, topsort=0, clique_k_sym=1, run_preprocessing=True, upper_bound=None, preprocessing_only=False,
-              clique_timeout=600, clique_extended_lowerbounds=True,
+              clique_timeout=600, clique_extended_lowerbounds=True, dp_threshold=20,
+              heuristic_ub=True, local_search=0, local_search_only=False, seed=0, local_search_seeds=4, multilevel=0,
+              edge_contraction=True, dominated_edges=True, twin_quotient=True,
+              split_size=10, cache=None, clique_provider=None, clique_grace=5, symmetry_clauses=0,
+              implied_constraints=False, tw_bounds=0, lower_bound_timeout=5, gap=0, race=False,
               FractionalHypertreeDecomposition=FractionalHypertreeDecompositionCommandline):
         pre_wall = time.time()
+        # nothing runs next to the clique computations
+        if preprocessing_only:
+            clique_grace = None
+        if tw_bounds > 0 and not clingo_available():
+            tw_bounds = 0
+            logging.warning("Treewidth bounds require clingo, option tw_bounds is ignored!")
         if self.ghtd:
             run_preprocessing = False
             logging.warning("Option ghtd disables preprocessing for now!")
@@ -68,116 +90,115 @@ class FractionalHypertreeDecomposer:
         # seriously wrong, fhtd not defined for that cases!
         self._pp.remove_hyper_degree_vertex(0, log_deg0_replay=False)
         whole_hgp = self._pp.hgp
-        bcs = [self._pp.hgp.induced_graph(b, force_copy=True) for b in self._pp.hgp.biconnected_components()]
+        # contractions fire once the (global) lower bound proves them safe, see Preprocessor.fire_pending
+        self._pp.edge_contr = edge_contraction
+        self._pp.split_size = split_size
 
         # return preps
         tds = []
         solver_run_id = 1
         ret = {'pre_wall': [], 'enc_wall': 'nan', 'z3_wall': 'nan', 'subsolvers': {}, 'pre_clique_size': [], 'pre_clique_sym_size' : [],
                'pre_clique_k': [], 'pre_clique_k_sym': [], 'pre_num_twins': [], 'pre_size_max_twin': [], 'smt_objective': 'nan',
-               'pre_clique_type': clique_k, 'pre_clique_sym_type' : clique_k_sym, 'clique_symm_time': 'nan'}
+               'pre_clique_type': clique_k, 'pre_clique_sym_type' : clique_k_sym, 'clique_symm_time': 'nan',
+               'heur_width': None, 'heur_wall': 0, 'optimal': True,
+               'cover_stats': {'hits': 0, 'misses': 0, 'shortcuts': 0}, 'pre_contractions': [],
+               'pre_dominated_edges': 0, 'pre_saved_weight_vars': 0, 'pre_twin_quotient': [], 'pre_symmetries': [],
+               'tw_bounds': [], 'lb_engine': [], 'gap': 0, 'race': []}
+        # width of components whose decomposition is not proven optimal (local search only, solver aborted)
+        unproven_width = 0
+        interrupted = False
+
+        # alpha-acyclic hypergraphs have fhtw 1, a join tree is the decomposition (no preprocessing/solving required)
+        if not preprocessing_only and len(whole_hgp.hg.edges()) > 0:
+            acyclic_wall = time.time()
+            ftd = self._acyclic_decomposition(whole_hgp.hg.copy())
+            if ftd is not None:
+                logging.info("Hypergraph is alpha-acyclic, skipping preprocessing and solving.")
+                ret['pre_wall'].append(time.time() - pre_wall)
+                ret['subsolvers'][solver_run_id] = self._fastpath_result(ftd, 1, time.time() - acyclic_wall, 'acyclic')
+                ret['subsolver'] = 'acyclic'
+                self._pp.consider_lb(1)
+                ret['lower_bound'] = ret['objective'] = self._pp.lb
+                ret['td'] = ftd
+                return ret
+
+        bcs = [self._pp.hgp.induced_graph(b, force_copy=True) for b in self._pp.hgp.biconnected_components()]
+
+        # per component: reduced hypergraph, replay log, lower bound, stats, twin classes and cliques
+        # (see fhtd.utils.cache), the list is stored again whenever a component adds results
+        cache_params = {'replay': self._pp.replay is not None, 'run_preprocessing': run_preprocessing, 'ghtd': self.ghtd, 'edge_contraction': edge_contraction,
+                        'split_size': split_size, 'twin_quotient': twin_quotient and not preprocessing_only,
+                        'encode_cliques': encode_cliques, 'clique_k': clique_k, 'clique_k_sym': clique_k_sym,
+                        'clique_timeout': clique_timeout, 'clique_extended_lowerbounds': clique_extended_lowerbounds}
+        records = cache.load(cache_params) if cache is not None else None
+        # native maximum clique solver for clique_k = -1 and clique_k_sym = 7
+        if clique_provider is None and (clique_k == -1 or clique_k_sym == 7):
+            clique_provider = PMCCliqueProvider()
+            # fail before solving if pmc was not built
+            clique_provider.binary()
+        if records is None or len(records) > len(bcs):
+            records = []
 
         if len(bcs) == 0:
             assert (len(self._pp.hgp.hg.edges()) == 0 and len(self._pp.hgp.hg.nodes()) == 0)
         else:
             # for b in self.__hgp.biconnected_components():
-            for b in bcs:  # self.__hgp.biconnected_components():
+            for comp, b in enumerate(bcs):  # self.__hgp.biconnected_components():
                 gcheck = b.hg.copy()  # only needed for checking and linking later
-                # print self.__hgp.induced_graph(b)
-                self._pp.init(b, replay=self._pp.replay is not None)  # , lb=fhtw)
-                logging.info("next component: {0}".format(self._pp.hgp.hg))
-                if run_preprocessing:
-                    pres = self._pp.preprocess()
-                    logging.info("preprocessing details: {0}".format(pres))
-                    logging.info(
-                        "after preprocessing: {0}, {1}".format(self._pp.hgp.hg.edges(), self._pp.hgp.hg.nodes()))
+                if comp == len(records):
+                    records.append({})
+                record = records[comp]
+                twins, unquotient = self._prepare_component(b, record, ret, run_preprocessing,
+                                                            twin_quotient and not preprocessing_only, cache,
+                                                            cache_params, records)
                 revert_nodes, revert_edges = self._pp.hgp.hg.relabel_consecutively()
+                # covers of the relabeled component, shared by the heuristics and the lower bounds of the preprocessor
+                # (in ghtd mode the lower bounds keep fractional covers, integral ones are only upper bounds)
+                covers = FractionalCoverCache(self._pp.hgp.hg, ghtd=self.ghtd)
+                self._pp.relabeled(None if self.ghtd else covers)
+                # subsumed/identical hyperedges keep their ids but get no weight variables (also in ghtd mode)
+                skip_edges = dominated_hyperedges(self._pp.hgp.hg) if dominated_edges else {}
+                ret['pre_dominated_edges'] += len(skip_edges)
                 logging.info("after relabeling: {0}, {1}".format(self._pp.hgp.hg.edges(), self._pp.hgp.hg.nodes()))
 
                 ftd = None
+                fastpath_wall = time.time()
+                fastpath = None
+                if len(self._pp.hgp.hg.edges()) > 0 and not preprocessing_only:
+                    fastpath = self._fastpath_decomposition(covers)
+
                 if len(self._pp.hgp.hg.edges()) == 0:
                     ftd = fhtd.FractionalHypertreeDecomposition(epsilon=self.__checker_epsilon)
+                elif fastpath is not None:
+                    width, ftd, subsolver = fastpath
+                    ret['pre_wall'].append(time.time() - pre_wall)
+                    ret['subsolvers'][solver_run_id] = self._fastpath_result(ftd, width, time.time() - fastpath_wall,
+                                                                             subsolver)
+                    solver_run_id += 1
+                    self._pp.consider_lb(width)
+                    logging.info("FTW_COMPONENT {0} ({1})".format(width, 'alpha-acyclic' if subsolver == 'acyclic'
+                                                                  else subsolver))
                 else:
                     # TAKE CLIQUES HERE
                     clique = None
+                    # symmetry clique that is still computed while encoding and solving
+                    background = None
                     if encode_cliques:
                         logging.info("Compute cliques for encoding.")
-
-                        pre_clique_size = 1
-                        # Values clique_k are overloaded
-                        # clique_k = 1 ..largest hyperedge, 2 .. largest_clique (Z3), k>3 k-cliques
-                        if clique_k == 1:
-                            clique = self._pp.hgp.hg.largest_hyperedge()
-                        elif clique_k == 2:
-                            clique = self._pp.hgp.hg.largest_clique(timeout=60)
-                        else:
-                            clique_list = \
-                            self._pp.hgp.hg.largest_clique_asp(prevent_k_hyperedge=clique_k, enum=False, timeout=60)[2]
-                            if len(clique_list) > 0:
-                                clique = clique_list[0]
-                            pre_clique_size = len(clique_list)
-
-                        if clique is not None:
-                            self._pp.update_lb(clique, len(clique), clique_k == 3)
-
-                        logging.info("Computed Clique follows.")
-                        logging.info(clique)
-                        ret['pre_clique_size'].append(pre_clique_size)
-                        ret['pre_clique_k'].append(clique_k)
-
-                        # cliques for symmetry breaking
-                        pre_clique_size = 1
-                        clique_list = []
-                        clique = None
-                        encoder = None
-
-                        if clique_k_sym == -1:
-                            clique = []
-                        if clique_k_sym == 1:
-                            encoder = Hypergraph.encoder_k_hyperclique
-                        elif clique_k_sym == 2:
-                            encoder = Hypergraph.encoder_largest_clique
-                        elif clique_k_sym == 3:
-                            encoder = Hypergraph.encoder_largest_clique_neighborhood
-                        elif clique_k_sym == 4:
-                            encoder = Hypergraph.encoder_largest_clique_wo_twins
-                        elif clique_k_sym == 5:
-                            encoder = Hypergraph.encoder_clique_maximize_used_hyperedges
-                        elif clique_k_sym == 6:
-                            encoder = Hypergraph.encoder_clique_maximize_completely_used_hyperedges
-
-                        # use clique_k for computing k-hypercliques
-                        if encoder is not None:
+                        cached = len(record)
+                        lb_clique, session = self._lower_bound_clique(record, clique_k, clique_provider, cache, ret)
+                        # use clique_k for computing k-hypercliques (also for the following components)
+                        if 1 <= clique_k_sym <= 7:
                             clique_k = max(3, clique_k)
-                            clique_symm_wall = time.time()
-                            clique_list = self._pp.hgp.hg.solve_asp(encoder(self._pp.hgp.hg) if clique_k_sym > 1 else encoder(self._pp.hgp.hg, clique_k), \
-                                                                clingoctl=None, timeout=clique_timeout)[2]
-                            ret['clique_symm_time'] = time.time() - clique_symm_wall
-
-                        if len(clique_list) > 0:
-                            clique = clique_list[0]
-                        pre_clique_size = len(clique_list)
-
-                        # still update lower bounds
-                        # TODO: add parameter
-                        if clique_extended_lowerbounds and clique is not None and len(clique) > 0:
-                            self._pp.update_lb(clique, len(clique), clique_k == 3 and clique_k_sym == 1)
+                        clique_symm_wall = time.time()
+                        clique, background = self._symmetry_clique(record, clique_k, clique_k_sym, lb_clique, session,
+                                                                   clique_provider, clique_timeout, clique_grace,
+                                                                   clique_extended_lowerbounds, cache, ret)
+                        if cache is not None and len(record) > cached:
+                            cache.store(cache_params, records)
 
-                        logging.info("Computed Symmetry Clique follows.")
-                        logging.info(clique)
-                        ret['pre_clique_sym_size'].append(pre_clique_size)
-                        ret['pre_clique_k_sym'].append(clique_k_sym)
-
-                    twin_vertices = None
-                    if encode_twins:
-                        twin_vertices = list(self._pp.hgp.hg.iter_twin_vertices())
-                        pre_twin_vertices = len(twin_vertices)
-                        pre_size_max_twin = 0 if len(twin_vertices) == 0 else len(max(twin_vertices))
-
-                        twin_vertices = iter(twin_vertices)
-
-                        ret['pre_num_twins'].append(pre_twin_vertices)
-                        ret['pre_size_max_twin'].append(pre_size_max_twin)
+                    twin_vertices, fixed, symmetries = self._symmetry_breaking(clique, encode_twins, symmetry_clauses,
+                                                                               topsort, preprocessing_only, ret)
 
                     pre_wall = time.time() - pre_wall
                     ret['pre_wall'].append(pre_wall)
@@ -186,19 +207,52 @@ class FractionalHypertreeDecomposer:
                         continue
 
                     z3_wall = time.time()
-                    decomposer = FractionalHypertreeDecomposition(self._pp.hgp.hg, timeout=self.timeout,
-                                                                  checker_epsilon=self.__checker_epsilon,
-                                                                  ghtd=self.ghtd, solver_bin=self.__solver_bin, #debug=True,
-                                                                  odebug=self.odebug)
-                    res = decomposer.solve(lbound=self._pp.lb if only_fhtw else 1,
-                                           clique=clique, topsort=topsort, twins=twin_vertices, ubound=upper_bound)
+                    # heuristic upper bound, seeds the solver and serves as fallback answer
+                    ubound = upper_bound
+                    heur_res = None
+                    # anytime engines never prove optimality, the solver is skipped for local_search_only/multilevel
+                    anytime_only = local_search_only or multilevel > 0
+                    if (upper_bound is None and heuristic_ub) or local_search > 0 or anytime_only or interrupted or \
+                            gap > 0:
+                        heur_wall = time.time()
+                        # approximate mode: widths up to the gap are good enough
+                        heur_res = self._heuristic_decomposition(covers, multilevel, local_search, local_search_seeds,
+                                                                 seed, lbound=self._pp.lb * (1 + gap))
+                        ret['heur_wall'] += time.time() - heur_wall
+                        ret['heur_width'] = heur_res[0] if ret['heur_width'] is None \
+                            else max(ret['heur_width'], heur_res[0])
+                        ubound = heur_res[0] if ubound is None else min(ubound, heur_res[0])
+                        logging.info("Heuristic upper bound {0}".format(ubound))
+
+                    # the lower bound engines run next to the solver when racing (see _race)
+                    racing = race and not (anytime_only or interrupted)
+                    if not (anytime_only or interrupted or racing):
+                        ubound = self._lower_bounds(ubound, tw_bounds, lower_bound_timeout, gap, ret)
+
+                    if background is not None:
+                        clique, symmetries = self._join_symmetry_clique(background, clique_symm_wall, clique, fixed,
+                                                                        symmetries, clique_k == 3 and clique_k_sym == 1,
+                                                                        clique_extended_lowerbounds, record, cache,
+                                                                        cache_params, records, ret)
+                        background = None
+
+                    res, proven, subsolver, aborted = self._solve_component(
+                        FractionalHypertreeDecomposition, heur_res, ubound, gap, anytime_only or interrupted, racing,
+                        self._pp.hgp.hg.number_of_nodes() <= dp_threshold, skip_edges, lower_bound_timeout,
+                        tw_bounds, only_fhtw, ret, clique=clique, topsort=topsort, twins=twin_vertices,
+                        symmetries=symmetries, symmetry_clauses=symmetry_clauses, implied=implied_constraints)
+                    interrupted = interrupted or aborted
+                    if res is None:
+                        res = {'objective': heur_res[0], 'decomposition': heur_res[1], 'enc_wall': 0}
+                        subsolver = 'multilevel' if multilevel > 0 else 'local_search' if local_search > 0 \
+                            else 'heuristic'
                     ret['subsolvers'][solver_run_id] = {'width': res['objective'].numerator/res['objective'].denominator,
                                                         'width_fractional': {'numerator': res['objective'].numerator,
                                                                              'denominator': res['objective'].denominator},
                                                         'decomposition': res['decomposition'],
                                                         # 'smt_solver_stats': res['smt_solver_stats'],
                                                         'z3_wall': time.time() - z3_wall,
-                                                        'enc_wall': res['enc_wall']}
+                                                        'enc_wall': res['enc_wall'], 'subsolver': subsolver}
                     solver_run_id += 1
                     logging.info(ret)
                     ftd = res["decomposition"]
@@ -206,44 +260,25 @@ class FractionalHypertreeDecomposer:
                     # print "objective:", res["objective"]
                     # assert(ftd is not None)
                     logging.info("FTW_COMPONENT {0}".format(res["objective"]))
-                    if ftd is not None:
+                    if ftd is None:
+                        assert only_fhtw
+                    elif proven:
                         self._pp.consider_lb(res["objective"])
                     else:
-                        assert only_fhtw
+                        # only an upper bound, the lower bound is not raised
+                        ret['optimal'] = False
+                        unproven_width = max(unproven_width, res["objective"])
                     logging.info("FTW_POST_COMPONENT {0}".format(res["objective"]))
                     # logging.info(str(output))
 
+                self._add_cover_stats(ret, covers)
                 # TODO: replace hg by deep copy of current hg component?
                 # print whole_hgp.hg
                 if ftd is not None:
-                    self._pp.hgp.hg.relabel(revert_nodes, revert_edges, revert=False)
-                    logging.info(
-                        "after relabeling back: {0}, {1}".format(self._pp.hgp.hg.edges(), self._pp.hgp.hg.nodes()))
-                    ftd.relabel(revert_nodes, revert_edges)
-
-                    ftd.set_graph(gcheck)
-                    assert (self._pp.replay is not None)
-                    ftd.replay(self._pp.replay)
-                    logging.info("Graph after replay: {0}\n{1}".format(whole_hgp.hg.edges(), whole_hgp.hg.nodes()))
-                    logging.info("TD after replay: {0}\n{1}\n{2}".format(ftd.chi, ftd.T.edges(), ftd.weights))
-                    assert (ftd.validate(gcheck))
-
+                    ftd = self._revert_component(ftd, gcheck, whole_hgp, revert_nodes, revert_edges, twins,
+                                                 unquotient)
                     if connect_components:
-                        i = len(tds) - 1
-                        while i >= 0:
-                            # print tds[i].graph.nodes(), tds[i].graph.edges()
-                            e, eid = ftd.graph.edge_into(tds[i].graph.nodes(), whole_hgp.hg)
-                            if e is not None:
-                                # print gcheck.edges(), e
-                                logging.info(
-                                    "CONNECTING {0}, {1} to {2}, {3}".format(ftd.chi, ftd.T.edges(), tds[i].chi,
-                                                                             tds[i].T.edges()))
-                                conn = ftd.connect(tds[i], e, eid)
-                                logging.info("CONNECTING to {0}: {1}, {2}".format(i, ftd.chi, ftd.T.edges()))
-                                assert (conn)
-                                del tds[i]
-                            i -= 1
-                        tds.append(ftd)
+                        self._connect_component(tds, ftd, whole_hgp.hg)
 
             logging.info("FTW {0}".format(self._pp.lb))
             if preprocessing_only:
@@ -260,16 +295,517 @@ class FractionalHypertreeDecomposer:
                 # assert(not connect_components or len(tds) == 1)
                 assert (tds[0].validate(whole_hgp.hg, strict=False))
                 # assert that treewidth should be within numeric range! (due to cplex)
-                if not self._pp.lb - accuracy <= tds[0].max_bag_size() <= self._pp.lb + accuracy:
-                    raise ValueError("connected (combined) fhtw should be {0}, but actually is {1}".format(self._pp.lb,
+                width = max(self._pp.lb, unproven_width)
+                if not width - accuracy <= tds[0].max_bag_size() <= width + accuracy:
+                    raise ValueError("connected (combined) fhtw should be {0}, but actually is {1}".format(width,
                                                                                                            tds[
                                                                                                                0].max_bag_size()))
                     # assert (self._pp.lb - accuracy <= tds[0].max_bag_size() <= self._pp.lb + accuracy)
 
-        ret['objective'] = self._pp.lb
+        ret['lower_bound'] = self._pp.lb
+        ret['objective'] = max(self._pp.lb, unproven_width)
+        ret['gap'] = float(ret['objective'] / self._pp.lb - 1) if self._pp.lb > 0 else 'nan'
         ret['td'] = tds[0] if len(tds) > 0 else None
         return ret
 
+    # reduces the component b (preprocessing, twin quotient) or restores the reduced one of its cache record,
+    # a computed record is stored right away
+    # returns (twin classes, hypergraph before the twin quotient or None if there are no twins)
+    def _prepare_component(self, b, record, ret, run_preprocessing, twin_quotient, cache, cache_params, records):
+        unquotient = None
+        if 'hg' in record:
+            # the cached hypergraph is already reduced (and quotiented), only the state is restored
+            self._pp.init(HypergraphPrimalView(record['hg'].copy()), replay=self._pp.replay is not None)
+            self._pp.restore(record['replay'], record['lb'], record['stats'])
+            logging.info("next component (cached): {0}".format(self._pp.hgp.hg))
+            if run_preprocessing:
+                ret['pre_contractions'].append(self._pp.stats)
+            twins = record['twins']
+            if len(twins) > 0:
+                unquotient = record['unquotient'].copy()
+            if twin_quotient:
+                ret['pre_twin_quotient'].append(sum(len(t) for t in twins.values()))
+            return twins, unquotient
+
+        # print self.__hgp.induced_graph(b)
+        self._pp.init(b, replay=self._pp.replay is not None)  # , lb=fhtw)
+        logging.info("next component: {0}".format(self._pp.hgp.hg))
+        if run_preprocessing:
+            pres = self._pp.preprocess()
+            ret['pre_contractions'].append(self._pp.stats)
+            logging.info("preprocessing details: {0}".format(pres))
+            logging.info("after preprocessing: {0}, {1}".format(self._pp.hgp.hg.edges(), self._pp.hgp.hg.nodes()))
+        self._add_cover_stats(ret, self._pp.covers)
+        # twins (same hyperedges) are collapsed to one representative, the decomposition is expanded later
+        twins = {}
+        if twin_quotient:
+            twins = twin_classes(self._pp.hgp.hg)
+            if len(twins) > 0:
+                unquotient = self._pp.hgp.hg.copy()
+                quotient_twins(self._pp.hgp, twins)
+            ret['pre_twin_quotient'].append(sum(len(t) for t in twins.values()))
+        if cache is not None:
+            record.update(hg=self._pp.hgp.hg.copy(), replay=self._pp.replay, lb=self._pp.lb, stats=self._pp.stats,
+                          twins=twins, unquotient=unquotient)
+            cache.store(cache_params, records)
+        return twins, unquotient
+
+    # decomposition of the current component without the solver: the join tree if it is alpha-acyclic (optimal,
+    # width 1), otherwise the perfect elimination ordering of a chordal primal graph (optimal ordering, only the bags
+    # have to be covered)
+    # returns (width, decomposition, subsolver) or None
+    def _fastpath_decomposition(self, covers):
+        ftd = join_tree_decomposition(self._pp.hgp.hg, checker_epsilon=self.__checker_epsilon)
+        if ftd is not None:
+            return 1, ftd, 'acyclic'
+        res = chordal_decomposition(self._pp.hgp.hg, checker_epsilon=self.__checker_epsilon, ghtd=self.ghtd,
+                                    covers=covers)
+        if res is None:
+            return None
+        width, ftd, exact = res
+        if not exact:
+            # capped integral covers (ghtd), the width is no lower bound, the solver decides
+            logging.warning("Chordal decomposition used capped integral covers, falling back to the solver.")
+            return None
+        return width, ftd, 'chordal'
+
+    # clique of the current component for the lower bound, raises the lower bound of the preprocessor
+    # Values clique_k are overloaded
+    # clique_k = -1 .. largest clique (native), 1 ..largest hyperedge, 2 .. largest_clique (Z3), k>3 k-cliques
+    # returns (clique or None, clingo session of the component or None)
+    def _lower_bound_clique(self, record, clique_k, clique_provider, cache, ret):
+        clique = None
+        pre_clique_size = 1
+        # both clique computations of the component share one clingo session (facts grounded once)
+        session = None
+        if 'clique' in record:
+            clique, pre_clique_size = record['clique']
+        elif clique_k == -1:
+            clique_list = self._native_clique(clique_provider, timeout=60)
+            if len(clique_list) > 0:
+                clique = clique_list[0]
+            pre_clique_size = len(clique_list)
+        elif clique_k == 1:
+            clique = self._pp.hgp.hg.largest_hyperedge()
+        elif clique_k == 2:
+            clique = self._pp.hgp.hg.largest_clique(timeout=60)
+        else:
+            if clingo_available():
+                session = CliqueSession(self._pp.hgp.hg)
+                clique_list = session.largest_hyperclique(clique_k, timeout=60)
+            else:
+                # clingo is optional, without the session htd_validate computes the clique
+                clique_list = self._pp.hgp.hg.largest_clique_asp(prevent_k_hyperedge=clique_k, enum=False,
+                                                                 timeout=60)[2]
+            if len(clique_list) > 0:
+                clique = clique_list[0]
+            pre_clique_size = len(clique_list)
+        # cliques refer to the consecutive labels, relabeling the cached hypergraph yields the same
+        if cache is not None and 'clique' not in record:
+            record['clique'] = (clique, pre_clique_size)
+
+        if clique is not None:
+            self._pp.update_lb(clique, len(clique), clique_k == 3)
+
+        logging.info("Computed Clique follows.")
+        logging.info(clique)
+        ret['pre_clique_size'].append(pre_clique_size)
+        ret['pre_clique_k'].append(clique_k)
+        return clique, session
+
+    # clique of the current component for symmetry breaking (clique_k_sym selects the encoding). After the grace
+    # period the lower bound clique lb_clique stands in and the computation continues in the background, see
+    # _join_symmetry_clique.
+    # returns (clique or None, BackgroundClique or None)
+    def _symmetry_clique(self, record, clique_k, clique_k_sym, lb_clique, session, clique_provider, clique_timeout,
+                         clique_grace, clique_extended_lowerbounds, cache, ret):
+        clique_list = []
+        clique = None
+        encoder = None
+        background = None
+
+        if clique_k_sym == -1:
+            clique = []
+        if clique_k_sym == 1:
+            encoder = Hypergraph.encoder_k_hyperclique
+        elif clique_k_sym == 2:
+            encoder = Hypergraph.encoder_largest_clique
+        elif clique_k_sym == 3:
+            encoder = Hypergraph.encoder_largest_clique_neighborhood
+        elif clique_k_sym == 4:
+            encoder = Hypergraph.encoder_largest_clique_wo_twins
+        elif clique_k_sym == 5:
+            encoder = Hypergraph.encoder_clique_maximize_used_hyperedges
+        elif clique_k_sym == 6:
+            encoder = Hypergraph.encoder_clique_maximize_completely_used_hyperedges
+        elif clique_k_sym == 7:
+            encoder = clique_provider
+
+        if encoder is not None and 'clique_sym' in record:
+            clique_list = record['clique_sym']
+        elif encoder is not None:
+            clique_symm_wall = time.time()
+            use_session = clique_k_sym <= 2 and clingo_available()
+            if use_session and session is None:
+                session = CliqueSession(self._pp.hgp.hg)
+            cancel = session.cancel if use_session else None
+            if use_session and clique_k_sym == 1:
+                # same query as for the lower bound if clique_k did not change, an optimum is reused
+                compute = partial(session.largest_hyperclique, clique_k, timeout=clique_timeout)
+            elif use_session and clique_k_sym == 2:
+                # the lower bound clique bounds the largest clique from below
+                compute = partial(session.largest_clique, lb=0 if lb_clique is None else len(lb_clique),
+                                  timeout=clique_timeout)
+            elif clique_k_sym == 7:
+                compute = partial(self._native_clique, clique_provider, timeout=clique_timeout)
+                cancel = clique_provider.cancel
+            else:
+                # can not be cancelled, works on a copy as it might outlive the component
+                args = (clique_k,) if clique_k_sym == 1 else ()
+                compute = partial(lambda hg, enc: hg.solve_asp(enc(hg, *args), clingoctl=None,
+                                                               timeout=clique_timeout)[2],
+                                  self._pp.hgp.hg.copy(), encoder)
+            # after the grace period the lower bound clique stands in, the symmetry clique replaces
+            # it if it is ready before the solver starts
+            background = BackgroundClique(compute, cancel)
+            clique_list = background.result(clique_grace)
+            if clique_list is None:
+                logging.info("Symmetry clique not ready after {0}s, continuing in the background."
+                             .format(clique_grace))
+                clique_list = [] if lb_clique is None else [lb_clique]
+            else:
+                background = None
+                ret['clique_symm_time'] = time.time() - clique_symm_wall
+                if cache is not None:
+                    record['clique_sym'] = clique_list
+
+        if len(clique_list) > 0:
+            clique = clique_list[0]
+
+        # still update lower bounds
+        # TODO: add parameter
+        if clique_extended_lowerbounds and clique is not None and len(clique) > 0:
+            self._pp.update_lb(clique, len(clique), clique_k == 3 and clique_k_sym == 1)
+
+        logging.info("Computed Symmetry Clique follows.")
+        logging.info(clique)
+        ret['pre_clique_sym_size'].append(len(clique_list))
+        ret['pre_clique_k_sym'].append(clique_k_sym)
+        return clique, background
+
+    # twin vertices and lex-leader symmetry breaking of the current component
+    # returns (iterator over the twin classes or None, vertices fixed by the automorphisms, generators or None)
+    def _symmetry_breaking(self, clique, encode_twins, symmetry_clauses, topsort, preprocessing_only, ret):
+        twin_vertices = None
+        fixed = set(clique) if clique else set()
+        if encode_twins:
+            # vertices in exactly the same hyperedges: swapping two of them is an automorphism of the
+            # hypergraph that keeps every cover, fixing their order excludes no optimum. Twins of the
+            # primal graph (same closed neighbourhood) may lie in different hyperedges, they are not used.
+            twin_vertices = [[v] + ts for v, ts in twin_classes(self._pp.hgp.hg).items()]
+            pre_twin_vertices = len(twin_vertices)
+            pre_size_max_twin = 0 if len(twin_vertices) == 0 else len(max(twin_vertices))
+            fixed.update(v for ts in twin_vertices for v in ts)
+
+            twin_vertices = iter(twin_vertices)
+
+            ret['pre_num_twins'].append(pre_twin_vertices)
+            ret['pre_size_max_twin'].append(pre_size_max_twin)
+
+        # lex-leader symmetry breaking for automorphisms that fix the clique and the twins pointwise
+        # (not combined with topsort and the dynamic clique)
+        symmetries = None
+        if symmetry_clauses > 0 and topsort == 0 and clique != [] and not preprocessing_only:
+            symmetries = automorphism_generators(self._pp.hgp.hg, fixed=fixed)
+            ret['pre_symmetries'].append(len(symmetries))
+        return twin_vertices, fixed, symmetries
+
+    # heuristic decomposition of the current component: multilevel for large components (coarsen, order the coarse
+    # graph, uncoarsen and refine), the anytime local search starting from the best greedy ordering or the greedy
+    # orderings only; the anytime engines stop at lbound
+    # returns (width, decomposition)
+    def _heuristic_decomposition(self, covers, multilevel, local_search, local_search_seeds, seed, lbound):
+        if multilevel > 0:
+            return multilevel_decomposition(self._pp.hgp.hg, multilevel, seed=seed,
+                                            checker_epsilon=self.__checker_epsilon, ghtd=self.ghtd, lbound=lbound,
+                                            covers=covers)
+        if local_search > 0:
+            return local_search_decomposition(self._pp.hgp.hg, local_search, seed=seed, seeds=local_search_seeds,
+                                              checker_epsilon=self.__checker_epsilon, ghtd=self.ghtd, lbound=lbound,
+                                              covers=covers)
+        return heuristic_decomposition(self._pp.hgp.hg, checker_epsilon=self.__checker_epsilon, ghtd=self.ghtd,
+                                       covers=covers)
+
+    # lower bounds of the current component before the solver starts (see _race for running them next to it),
+    # raises the lower bound of the preprocessor
+    # returns the upper bound ubound, improved by the treewidth bound
+    def _lower_bounds(self, ubound, tw_bounds, lower_bound_timeout, gap, ret):
+        # treewidth of the primal graph: bags have at most tw + 1 vertices, each covered by one
+        # hyperedge (ghtw <= tw + 1), and a bag of weight w has at most w * rank vertices
+        if tw_bounds > 0:
+            tw_wall = time.time()
+            tw_lower, tw_upper = treewidth_bounds(self._pp.hgp.hg, timeout=tw_bounds)
+            tw_lbound = Fraction(tw_lower + 1, self._pp.hgp.hg.size_largest_hyperedge())
+            self._pp.consider_lb(tw_lbound)
+            ubound = tw_upper + 1 if ubound is None else min(ubound, tw_upper + 1)
+            ret['tw_bounds'].append({'lower': tw_lower, 'upper': tw_upper, 'wall': time.time() - tw_wall})
+            logging.info("Treewidth bounds {0}, {1}: fhtw >= {2}, ghtw <= {3}".format(
+                tw_lower, tw_upper, tw_lbound, tw_upper + 1))
+
+        # minor-min-width and degeneracy of the fractional covers, see fhtd.heuristics.lower_bound
+        if lower_bound_timeout > 0 and (ubound is None or self._pp.lb * (1 + gap) < ubound):
+            lb_wall = time.time()
+            cutoff = None if ubound is None else ubound / (1 + gap)
+            lb_engine, lb_name = heuristic_lower_bound(self._pp.hgp.hg, timeout=lower_bound_timeout,
+                                                       ghtd=self.ghtd, cutoff=cutoff)
+            self._pp.consider_lb(lb_engine)
+            ret['lb_engine'].append({'bound': float(lb_engine), 'engine': lb_name, 'wall': time.time() - lb_wall})
+        return ubound
+
+    # the symmetry clique computed next to the heuristics and bounds replaces clique if it is ready for the solver
+    # (the automorphisms are recomputed to fix it as well), otherwise it is cancelled
+    # returns (clique, symmetries)
+    def _join_symmetry_clique(self, background, clique_symm_wall, clique, fixed, symmetries, hyperclique,
+                              clique_extended_lowerbounds, record, cache, cache_params, records, ret):
+        finished = background.done()
+        late = background.cancel()
+        ret['clique_symm_time'] = time.time() - clique_symm_wall
+        if not finished:
+            logging.info("Symmetry clique not ready for the solver, cancelled.")
+        elif cache is not None:
+            record['clique_sym'] = late
+            cache.store(cache_params, records)
+        if finished and late and len(late[0]) > 0:
+            clique = late[0]
+            logging.info("Symmetry clique {0} ready for the solver".format(clique))
+            ret['pre_clique_sym_size'][-1] = len(late)
+            if clique_extended_lowerbounds:
+                self._pp.update_lb(clique, len(clique), hyperclique)
+            if symmetries is not None:
+                # the automorphisms have to fix the new clique pointwise as well
+                fixed.update(clique)
+                symmetries = automorphism_generators(self._pp.hgp.hg, fixed=fixed)
+                ret['pre_symmetries'][-1] = len(symmetries)
+        return clique, symmetries
+
+    # exact solver run of the current component unless the heuristic decomposition heur_res matches the lower bound
+    # (within gap) or the solver is skipped (skip_solver: anytime engines only or aborted before); heur_res answers
+    # if the solver fails or is aborted. kwargs are passed to solve of the engine.
+    # returns (result or None for heur_res, whether the width is proven optimal, subsolver, whether the solver was
+    # aborted by a signal)
+    def _solve_component(self, engine, heur_res, ubound, gap, skip_solver, racing, use_dp, skip_edges,
+                         lower_bound_timeout, tw_bounds, only_fhtw, ret, **kwargs):
+        if heur_res is not None and heur_res[0] <= self._pp.lb:
+            logging.info("Heuristic decomposition matches the lower bound, skipping the solver.")
+            return None, True, None, False
+        if heur_res is not None and heur_res[0] <= self._pp.lb * (1 + gap):
+            logging.info("Heuristic decomposition {0} within gap {1} of the lower bound {2}, skipping the "
+                         "solver.".format(heur_res[0], gap, self._pp.lb))
+            return None, False, None, False
+        if skip_solver:
+            return None, False, None, False
+
+        res = None
+        met = False
+        aborted = False
+        # the best lower bound (over all components) so far, the solver stops as soon as it finds
+        # a decomposition of that width (the upper bound of this component might be smaller);
+        # in approximate mode already at a width within the gap
+        lbound = max(self._pp.lb * (1 + gap), 1)
+        if ubound is not None:
+            ubound = max(ubound, lbound)
+        # small components are solved by the exact dp right away
+        solve, cancel, used = self._exact_engine(engine, use_dp, skip_edges, ret, lbound=lbound, ubound=ubound,
+                                                 **kwargs)
+        try:
+            if racing:
+                res, met = self._race(solve, cancel, heur_res, gap, lower_bound_timeout, tw_bounds, ret)
+            else:
+                res = solve()
+        except RuntimeError:
+            if heur_res is None:
+                raise
+            logging.error("Solver failed, falling back to the heuristic decomposition.")
+        except AbortException:
+            # anytime: keep the best decomposition found so far, do not start further solver runs
+            if heur_res is None:
+                raise
+            logging.error("Solver aborted by signal, falling back to the heuristic decomposition.")
+            aborted = True
+        if res is not None and res["decomposition"] is None and not only_fhtw:
+            res = None
+        subsolver = used[-1] if used else 'z3'
+        # solver cancelled as the heuristic decomposition matches the lower bound (or is within gap)
+        proven = res is not None or (met and heur_res[0] <= self._pp.lb)
+        # a solver width at the gap bound is only within the gap (not optimal) unless it meets the
+        # lower bound
+        if res is not None and gap > 0 and self._pp.lb < res['objective'] <= lbound:
+            proven = False
+        return res, proven, subsolver, aborted
+
+    # decomposition ftd of the relabeled (and reduced) current component in terms of the component gcheck: labels
+    # reverted, twins expanded and the preprocessing replayed
+    def _revert_component(self, ftd, gcheck, whole_hgp, revert_nodes, revert_edges, twins, unquotient):
+        self._pp.hgp.hg.relabel(revert_nodes, revert_edges, revert=False)
+        logging.info("after relabeling back: {0}, {1}".format(self._pp.hgp.hg.edges(), self._pp.hgp.hg.nodes()))
+        ftd.relabel(revert_nodes, revert_edges)
+
+        assert (self._pp.replay is not None)
+        if self._pp.replay.contractions == 0:
+            # twins expanded and the removed vertices eliminated first, in the order of the replay log
+            _, ftd = replay_decomposition(gcheck, ftd, self._pp.replay, classes=twins,
+                                          checker_epsilon=self.__checker_epsilon, ghtd=self.ghtd)
+            ftd.set_graph(gcheck)
+        else:
+            if len(twins) > 0:
+                _, ftd = expand_twins(unquotient, ftd, twins, checker_epsilon=self.__checker_epsilon, ghtd=self.ghtd)
+            ftd.set_graph(gcheck)
+            ftd.replay(self._pp.replay)
+        logging.info("Graph after replay: {0}\n{1}".format(whole_hgp.hg.edges(), whole_hgp.hg.nodes()))
+        logging.info("TD after replay: {0}\n{1}\n{2}".format(ftd.chi, ftd.T.edges(), ftd.weights))
+        assert (ftd.validate(gcheck))
+        return ftd
+
+    # links ftd to the decompositions tds of earlier components that share a hyperedge of hg with it (these are
+    # replaced by ftd)
+    @staticmethod
+    def _connect_component(tds, ftd, hg):
+        i = len(tds) - 1
+        while i >= 0:
+            # print tds[i].graph.nodes(), tds[i].graph.edges()
+            e, eid = ftd.graph.edge_into(tds[i].graph.nodes(), hg)
+            if e is not None:
+                # print gcheck.edges(), e
+                logging.info(
+                    "CONNECTING {0}, {1} to {2}, {3}".format(ftd.chi, ftd.T.edges(), tds[i].chi, tds[i].T.edges()))
+                conn = ftd.connect(tds[i], e, eid)
+                logging.info("CONNECTING to {0}: {1}, {2}".format(i, ftd.chi, ftd.T.edges()))
+                assert (conn)
+                del tds[i]
+            i -= 1
+        tds.append(ftd)
+
+    # runs solve (the exact engine, stopped by cancel) next to the lower bound engines, all sharing the bounds of
+    # the component (lower bound of the preprocessor, upper bound of the heuristic decomposition heur_res).
+    # Everything is cancelled as soon as the bounds meet, i.e., the heuristic decomposition is optimal (within gap).
+    # returns (result of solve or None if it was cancelled, whether the bounds met)
+    def _race(self, solve, cancel, heur_res, gap, lower_bound_timeout, tw_bounds, ret):
+        hg = self._pp.hgp.hg
+        race = BoundRace(self._pp.lb, None if heur_res is None else heur_res[0], gap=gap)
+
+        def exact():
+            res = solve()
+            if res is not None and res['objective'] != 'nan':
+                race.raise_lb(res['objective'])
+            return res
+
+        try:
+            race.start('exact', exact, cancel)
+            if lower_bound_timeout > 0:
+                race.start('lower_bound', partial(heuristic_lower_bound, hg, timeout=lower_bound_timeout,
+                                                  ghtd=self.ghtd, on_bound=race.raise_lb, stop=race.stopped))
+            if tw_bounds > 0:
+                tw = GraphSatTw(primal_graph(hg), timeout=tw_bounds)
+
+                def treewidth():
+                    lower, upper = tw.treewidth()
+                    race.raise_lb(Fraction(lower + 1, hg.size_largest_hyperedge()))
+                    return lower, upper
+
+                race.start('treewidth', treewidth, tw.cancel)
+            race.wait('exact')
+        finally:
+            race.cancel()
+        met = race.met()
+        self._pp.consider_lb(race.lb)
+        ret['race'].append(race.stats)
+        if race.done('lower_bound'):
+            bound, name = race.result('lower_bound')
+            ret['lb_engine'].append({'bound': float(bound), 'engine': name,
+                                     'wall': ret['race'][-1]['engines']['lower_bound']})
+        if race.done('treewidth'):
+            lower, upper = race.result('treewidth')
+            ret['tw_bounds'].append({'lower': lower, 'upper': upper,
+                                     'wall': ret['race'][-1]['engines']['treewidth']})
+        if met and not race.done('exact'):
+            logging.info("Race: bounds met at {0}, solver cancelled.".format(race.lb))
+            return None, True
+        return race.result('exact'), met
+
+    # exact engine of the component: the dp for small components (use_dp), the smt encoding otherwise and whenever
+    # the dp does not finish within the timeout or had to use capped integral covers (ghtd). kwargs are passed to
+    # solve of the engine.
+    # returns (solve, cancel of the running engine, names of the engines started)
+    def _exact_engine(self, engine, use_dp, skip_edges, ret, **kwargs):
+        hg = self._pp.hgp.hg
+        running = [None]
+        used = []
+        cancelled = [False]
+
+        def start(cls, name):
+            decomposer = cls(hg, timeout=self.timeout, checker_epsilon=self.__checker_epsilon, ghtd=self.ghtd,
+                             solver_bin=self.__solver_bin, odebug=self.odebug, skip_edges=skip_edges)
+            running[0] = decomposer
+            used.append(name)
+            if name == 'z3':
+                ret['pre_saved_weight_vars'] += len(skip_edges) * hg.number_of_nodes()
+            return decomposer.solve(**kwargs)
+
+        def solve():
+            if use_dp:
+                try:
+                    res = start(FractionalHypertreeDecompositionDP, 'dp')
+                    if res.get('exact', True):
+                        return res
+                    logging.warning("DP used capped integral covers, solving by the SMT encoding.")
+                except RuntimeError as e:
+                    if cancelled[0]:
+                        raise
+                    logging.warning("{0}, solving by the SMT encoding.".format(e))
+                if cancelled[0]:
+                    raise RuntimeError("Solver cancelled")
+            return start(engine, 'z3')
+
+        def cancel():
+            cancelled[0] = True
+            if running[0] is not None and hasattr(running[0], 'cancel'):
+                running[0].cancel()
+
+        return solve, cancel, used
+
+    # join tree of an alpha-acyclic hypergraph (relabeled consecutively for construction), None if not acyclic
+    def _acyclic_decomposition(self, hg):
+        gcheck = hg.copy()
+        revert_nodes, revert_edges = hg.relabel_consecutively()
+        ftd = join_tree_decomposition(hg, checker_epsilon=self.__checker_epsilon)
+        if ftd is None:
+            return None
+        ftd.relabel(revert_nodes, revert_edges)
+        ftd.set_graph(gcheck)
+        assert (ftd.validate(gcheck))
+        return ftd
+
+    # [largest clique] of the current component by the native solver, [] if it is not available
+    def _native_clique(self, provider, timeout):
+        try:
+            return provider.largest_clique(self._pp.hgp.hg, timeout=timeout)
+        except RuntimeError as e:
+            logging.error("Native clique solver {0} failed: {1}".format(provider.name, e))
+            return []
+
+    @staticmethod
+    def _add_cover_stats(ret, covers):
+        for k in ret['cover_stats']:
+            ret['cover_stats'][k] += covers.stats[k]
+
+    # subsolver entry for components that were decomposed without calling the solver
+    @staticmethod
+    def _fastpath_result(ftd, width, wall, subsolver):
+        width = Fraction(width)
+        return {'width': width.numerator / width.denominator,
+                'width_fractional': {'numerator': width.numerator, 'denominator': width.denominator},
+                'decomposition': ftd, 'z3_wall': wall, 'enc_wall': 0, 'subsolver': subsolver}
+
     ######[ENCODING]######
     # fix ordering between twin vertices; twin vertices have same primal neighbourhood
     def twin_vertices(self):
@@ -286,4 +822,4 @@ class FractionalHypertreeDecomposer:
 
     # do something with hyperedge circles?
 
-    # do something where we exploit (up to 13 nodes :P) that fhtw = max(fhtw(N[v]), fhtw(G-v)) where fruitful..
+    # fhtw = max(fhtw(N[v]), fhtw(G-v)) for clique separators, see Preprocessor.split_vertices
@@ -0,0 +1 @@
+from fhtd.dp.subset_dp import FractionalHypertreeDecompositionDP
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+import time
+from fractions import Fraction
+
+from fhtd.heuristics.acyclic import decomposition_from_ordering
+from fhtd.heuristics.cover import FractionalCoverCache
+from fhtd.heuristics.orderings import BitsetEliminationGraph
+from fhtd.heuristics.upper_bound import heuristic_ordering
+
+
+# Exact dynamic programming over elimination orderings (subsets of eliminated vertices),
+# drop-in replacement for FractionalHypertreeDecompositionCommandline on small components.
+#   w(S) = min_{v in S} max(w(S - v), fhec({v} u Q(S - v, v)))
+# where Q(S, v) are the vertices outside S u {v} that are reachable from v via paths inside S.
+class FractionalHypertreeDecompositionDP(object):
+    def __init__(self, hypergraph, wprecision=20, timeout=0, stream=None, checker_epsilon=None, ghtd=False,
+                 solver_bin=None, debug=False, odebug=None, skip_edges=None, adj=None, covers=None):
+        # skip_edges (dominated hyperedges) need no handling, the covers only use maximal traces anyway
+        if not checker_epsilon:
+            checker_epsilon = Fraction(0.001)
+        self.__checker_epsilon = Fraction(checker_epsilon)
+        self.hypergraph = hypergraph
+        self.timeout = timeout
+        self.ghtd = ghtd
+        self._debug = debug
+        # set by solve (timeout in seconds, 0 ... none), cancel() stops the dp from another thread
+        self._deadline = None
+        self._cancelled = False
+
+        # neighbourhoods as bitsets, adj restricted to some vertices yields the dp of the induced hypergraph
+        self._graph = BitsetEliminationGraph(hypergraph, adj=adj)
+        self.vertices = self._graph.vertices
+        self.index = self._graph.index
+        self.covers = FractionalCoverCache(hypergraph, ghtd=ghtd) if covers is None else covers
+        self._covers = {}
+
+    def cover(self, mask):
+        try:
+            return self._covers[mask]
+        except KeyError:
+            res = self.covers.cover(self._graph.members(mask))
+            self._covers[mask] = res
+            return res
+
+    def q_set(self, eliminated, v):
+        return self._graph.q_set(eliminated, v)
+
+    # width of an ordering (given by vertex indices), the bag of v is v and Q(eliminated, v)
+    def width(self, ordering, weights=False):
+        width = 0
+        ret = {}
+        eliminated = 0
+        for v in ordering:
+            value, ret[self.vertices[v]] = self.cover(self.q_set(eliminated, v) | 1 << v)
+            width = max(width, value)
+            eliminated |= 1 << v
+        return (width, ret) if weights else width
+
+    def cancel(self):
+        self._cancelled = True
+
+    # raises a RuntimeError like the smt solver, the decomposer then solves the component by the smt encoding
+    def _check_deadline(self):
+        if self._cancelled:
+            raise RuntimeError("DP cancelled")
+        if self._deadline is not None and time.time() > self._deadline:
+            raise RuntimeError("DP timeout after {0} seconds".format(self.timeout))
+
+    def _run(self, free, ubound):
+        # layered dp, states that do not improve on the upper bound are dropped
+        layer = {0: Fraction(0)}
+        pred = [{0: None}]
+        for _ in range(bin(free).count("1")):
+            self._check_deadline()
+            nxt = {}
+            back = {}
+            for i, (s, val) in enumerate(layer.items()):
+                # layers get large in the middle, check within as well
+                if i & 1023 == 1023:
+                    self._check_deadline()
+                rest = free & ~s
+                while rest:
+                    low = rest & -rest
+                    rest ^= low
+                    v = low.bit_length() - 1
+                    cost = self.cover(self.q_set(s, v) | low)[0]
+                    nval = max(val, cost)
+                    if ubound is not None and nval >= ubound:
+                        continue
+                    t = s | low
+                    if t not in nxt or nval < nxt[t]:
+                        nxt[t] = nval
+                        back[t] = v
+            layer = nxt
+            pred.append(back)
+            if len(layer) == 0:
+                return None, None
+        (s, val), = layer.items()
+        # reconstruct the ordering backwards
+        ordering = []
+        for back in reversed(pred[1:]):
+            v = back[s]
+            ordering.append(v)
+            s &= ~(1 << v)
+        ordering.reverse()
+        return val, ordering
+
+    # optimal ordering of the given vertices when all other vertices are eliminated afterwards (e.g., a clique)
+    # returns (width, [(vertex, bag, cover value)]) for the given vertices only
+    def eliminate_first(self, vertices):
+        _, ordering = self._run(self._graph.mask(vertices), None)
+        width = 0
+        bags = []
+        eliminated = 0
+        for v in ordering:
+            bag = self.q_set(eliminated, v) | 1 << v
+            value = self.cover(bag)[0]
+            width = max(width, value)
+            bags.append((self.vertices[v], self._graph.members(bag), value))
+            eliminated |= 1 << v
+        return width, bags
+
+    def solve(self, m=None, lbound=1, ubound=None, clique=None, topsort=0, twins=None, symmetries=None,
+              symmetry_clauses=1000, implied=False):
+        enc_wall = time.time()
+        self._deadline = enc_wall + self.timeout if self.timeout else None
+        n = len(self.vertices)
+        full = (1 << n) - 1
+
+        # there is always an optimal ordering that eliminates a given clique last
+        last = []
+        if clique is not None and len(clique) > 0:
+            last = [self.index[v] for v in clique if v in self.index]
+        free = full
+        for v in last:
+            free &= ~(1 << v)
+
+        # upper bound by greedy orderings, prunes the dp
+        heur, heur_ordering, _, _ = heuristic_ordering(self.hypergraph, ghtd=self.ghtd, adj=self._graph.adj,
+                                                       covers=self.covers)
+        heur_ordering = [self.index[v] for v in heur_ordering]
+        enc_wall = time.time() - enc_wall
+
+        val = None
+        matched = heur <= max(lbound, 1)
+        if matched:
+            logging.info("Heuristic ordering matches the lower bound, skipping the DP.")
+        elif ubound is not None and ubound < heur:
+            val, ordering = self._run(free, ubound + self.__checker_epsilon)
+            if val is None:
+                logging.warning("DP found no ordering within upper bound {0}, ignoring it.".format(ubound))
+                val, ordering = self._run(free, heur)
+        else:
+            val, ordering = self._run(free, heur)
+        if val is None:
+            # nothing better than the heuristic ordering
+            ordering, last = heur_ordering, []
+
+        ordering.extend(last)
+        width, weights = self.width(ordering, weights=True)
+        ordering = [self.vertices[v] for v in ordering]
+        # capped integral covers (ghtd) are upper bounds only, so is the optimum of the dp over them
+        exact = matched or self.covers.exact() or \
+            all(self.covers.exact(self._graph.members(mask)) for mask in self._covers)
+        logging.info("DP width {0}, {1} memoized covers{2}".format(width, len(self._covers),
+                                                                   "" if exact else ", capped integral covers"))
+
+        ftd = decomposition_from_ordering(self.hypergraph, ordering, weights, checker_epsilon=self.__checker_epsilon)
+        if not width - self.__checker_epsilon <= ftd.width() <= width + self.__checker_epsilon:
+            raise ValueError("fhtw should be {0}, but actually is {1}".format(width, ftd.width()))
+        return {"objective": ftd.width(), "decomposition": ftd, "enc_wall": enc_wall, "smt_solver_stats": None,
+                "smt_objective": "nan", "exact": exact}
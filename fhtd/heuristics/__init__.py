@@ -0,0 +1,8 @@
+from fhtd.heuristics.acyclic import gyo_reduction, is_alpha_acyclic, join_tree_decomposition
+from fhtd.heuristics.chordal import perfect_elimination_ordering, is_chordal, chordal_decomposition
+from fhtd.heuristics.cover import fractional_edge_cover, fractional_edge_covers, integral_edge_cover, \
+    FractionalCoverCache
+from fhtd.heuristics.upper_bound import ordering_width, heuristic_ordering, heuristic_decomposition
+from fhtd.heuristics.local_search import OrderingLocalSearch, local_search_ordering, local_search_decomposition
+from fhtd.heuristics.multilevel import coarsen, multilevel_ordering, multilevel_decomposition
+from fhtd.heuristics.lower_bound import degeneracy_lower_bound, contraction_lower_bound, heuristic_lower_bound
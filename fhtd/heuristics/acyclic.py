@@ -0,0 +1,105 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+from collections import deque
+
+# noinspection PyUnresolvedReferences
+from htd_validate.decompositions import FractionalHypertreeDecomposition
+
+
+######[GYO]######
+# Graham/Yu-Ozsoyoglu reduction (ear removal):
+#  (a) remove vertices that occur in exactly one hyperedge,
+#  (b) remove hyperedges that are contained in some other hyperedge.
+# The hypergraph is alpha-acyclic iff the reduction ends with the empty hypergraph.
+# The order in which vertices are removed in (a) is a perfect elimination ordering of the primal graph and
+# the (shrunken) hyperedge a vertex is removed from covers its bag, i.e., it yields a join tree of width 1.
+def gyo_reduction(hypergraph):
+    edges = {e: set(vs) for e, vs in hypergraph.edges().items()}
+    if len(edges) == 0:
+        return None
+
+    inc = {v: set() for v in hypergraph.nodes()}
+    for e, vs in edges.items():
+        for v in vs:
+            inc[v].add(e)
+    # isolated vertices are not defined for fhtds
+    if any(len(es) == 0 for es in inc.values()):
+        return None
+
+    ordering = []
+    witness = {}
+    vqueue = deque(v for v, es in inc.items() if len(es) == 1)
+    equeue = deque(edges.keys())
+
+    def remove_edge(e):
+        for v in edges.pop(e):
+            inc[v].discard(e)
+            if len(inc[v]) == 1:
+                vqueue.append(v)
+
+    while vqueue or equeue:
+        while vqueue:
+            v = vqueue.popleft()
+            # vertices might be queued twice, or lost their last edge already
+            if v not in inc or len(inc[v]) != 1:
+                continue
+            e = next(iter(inc.pop(v)))
+            edges[e].discard(v)
+            ordering.append(v)
+            witness[v] = e
+            equeue.append(e)
+
+        while equeue and not vqueue:
+            e = equeue.popleft()
+            if e not in edges:
+                continue
+            vs = edges[e]
+            if len(vs) == 0:
+                del edges[e]
+                continue
+            # a superset of e has to contain every vertex of e, so looking at one vertex suffices
+            u = min(vs, key=lambda x: len(inc[x]))
+            for f in inc[u]:
+                if f != e and vs.issubset(edges[f]):
+                    remove_edge(e)
+                    break
+
+    if len(inc) > 0 or len(edges) > 0:
+        logging.debug("GYO reduction stopped with {0} vertices and {1} hyperedges left".format(len(inc), len(edges)))
+        return None
+    return ordering, witness
+
+
+def is_alpha_acyclic(hypergraph):
+    return gyo_reduction(hypergraph) is not None
+
+
+def decomposition_from_ordering(hypergraph, ordering, weights, checker_epsilon=None):
+    return FractionalHypertreeDecomposition.from_ordering(hypergraph=hypergraph, ordering=ordering, weights=weights,
+                                                          checker_epsilon=checker_epsilon)
+
+
+# join tree (as fractional hypertree decomposition of width 1) for alpha-acyclic hypergraphs, None otherwise
+def join_tree_decomposition(hypergraph, checker_epsilon=None):
+    res = gyo_reduction(hypergraph)
+    if res is None:
+        return None
+    ordering, witness = res
+    weights = {v: {witness[v]: 1} for v in ordering}
+    return decomposition_from_ordering(hypergraph, ordering, weights, checker_epsilon=checker_epsilon)
@@ -0,0 +1,62 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+
+from fhtd.heuristics.acyclic import decomposition_from_ordering
+from fhtd.heuristics.cover import FractionalCoverCache
+from fhtd.heuristics.orderings import primal_adjacency, max_cardinality_ordering, later_neighbors, \
+    is_perfect_elimination_ordering
+
+
+# perfect elimination ordering of the primal graph (by mcs), None if the primal graph is not chordal
+def perfect_elimination_ordering(hypergraph, adj=None):
+    if adj is None:
+        adj = primal_adjacency(hypergraph)
+    ordering = max_cardinality_ordering(adj)
+    return ordering if is_perfect_elimination_ordering(adj, ordering) else None
+
+
+def is_chordal(hypergraph):
+    return perfect_elimination_ordering(hypergraph) is not None
+
+
+######[CHORDAL]######
+# for a chordal primal graph, eliminating along a peo yields exactly the maximal cliques as (maximal) bags
+# every td has to contain each clique in some bag, so covering the bags optimally yields an optimal fhtd
+# returns (width, decomposition, exact), None if the primal graph is not chordal; exact is False if some integral
+# cover search (ghtd) was capped, the width is an upper bound then
+def chordal_decomposition(hypergraph, checker_epsilon=None, ghtd=False, covers=None):
+    adj = primal_adjacency(hypergraph)
+    ordering = perfect_elimination_ordering(hypergraph, adj=adj)
+    if ordering is None:
+        return None
+    if covers is None:
+        covers = FractionalCoverCache(hypergraph, ghtd=ghtd)
+
+    bags = later_neighbors(adj, ordering)
+    for v, later in bags.items():
+        later.add(v)
+    vertices = list(bags.keys())
+    weights = {}
+    width = 0
+    for v, (value, weights[v]) in zip(vertices, covers.covers(bags[v] for v in vertices)):
+        width = max(width, value)
+    exact = all(covers.exact(bags[v]) for v in vertices)
+    logging.info("Chordal primal graph, width of peo decomposition is {0}{1}".format(
+        width, "" if exact else " (capped integral covers)"))
+    return width, decomposition_from_ordering(hypergraph, ordering, weights, checker_epsilon=checker_epsilon), exact
@@ -0,0 +1,343 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+from collections import OrderedDict
+from fractions import Fraction
+from math import gcd
+
+
+######[LP]######
+# fractional edge cover of a set of vertices bag:
+#   min sum_e x_e  s.t.  sum_{e ni v} x_e >= 1 for every v in bag, x_e >= 0
+# we run a simplex with Bland's rule on the dual
+#   max sum_v y_v  s.t.  sum_{v in e} y_v <= 1 for every hyperedge e, y_v >= 0
+# whose slack basis is feasible right away; the optimal x_e are the reduced costs of the slack variables.
+# The simplex runs in floating point first, the rounded solution is certified exactly (primal and dual feasible
+# with equal objective); only if that fails we redo the simplex in rationals.
+# Hypergraph.fractional_cover of htd_validate solves the same LP (tests compare both), but it returns the value only;
+# the replay and the DP need the edge weights and exact rational values.
+# returns (value, {edge id: weight}) for the edges with positive weight
+def fractional_edge_cover(hypergraph, bag, ghtd=False):
+    return _edge_cover(hypergraph, bag, ghtd)[:2]
+
+
+# (value, weights, exact), exact is False if the integral cover search (ghtd) was capped, the value is an upper bound
+def _edge_cover(hypergraph, bag, ghtd):
+    bag = list(bag)
+    if len(bag) == 0:
+        return 0, {}, True
+    pos = {v: i for i, v in enumerate(bag)}
+    traces = {}
+    for e, vs in hypergraph.edges().items():
+        r = frozenset(pos[v] for v in vs if v in pos)
+        if len(r) > 0 and r not in traces:
+            traces[r] = e
+    return _cover_traces(len(bag), traces, ghtd)
+
+
+# several bags at once, the hyperedges are traced on all bags in a single pass. Bags with the same (maximal) traces
+# pose the same LP, it is solved once and its weights are mapped back to the edges of every such bag. The distinct
+# LPs are still solved one after another, not as a single (block diagonal) LP.
+def fractional_edge_covers(hypergraph, bags, ghtd=False):
+    return [res[:2] for res in _edge_covers(hypergraph, bags, ghtd)]
+
+
+def _edge_covers(hypergraph, bags, ghtd):
+    bags = [list(bag) for bag in bags]
+    pos = [{v: i for i, v in enumerate(bag)} for bag in bags]
+    member = {}
+    for k, bag in enumerate(bags):
+        for v in bag:
+            member.setdefault(v, []).append(k)
+    traces = [{} for _ in bags]
+    for e, vs in hypergraph.edges().items():
+        hit = {}
+        for v in vs:
+            for k in member.get(v, ()):
+                hit.setdefault(k, set()).add(pos[k][v])
+        for k, r in hit.items():
+            r = frozenset(r)
+            if r not in traces[k]:
+                traces[k][r] = e
+    ret = []
+    solved = {}
+    for bag, t in zip(bags, traces):
+        if len(bag) == 0:
+            ret.append((0, {}, True))
+            continue
+        rows = _maximal_rows(t.keys())
+        key = (len(bag), frozenset(rows))
+        if key not in solved:
+            solved[key] = _cover_rows(len(bag), rows, ghtd)
+        value, weights, exact = solved[key]
+        ret.append((value, {t[r]: w for r, w in weights.items()}, exact))
+    logging.debug("Solved {0} distinct covers for {1} bags.".format(len(solved), len(bags)))
+    return ret
+
+
+# traces maps the hyperedges restricted to the bag (sets of indices in range(n)) to an edge id
+def _cover_traces(n, traces, ghtd):
+    value, weights, exact = _cover_rows(n, _maximal_rows(traces.keys()), ghtd)
+    return value, {traces[r]: w for r, w in weights.items()}, exact
+
+
+# only inclusion-maximal traces matter (the dual constraint of a subset is implied), largest first
+def _maximal_rows(rows):
+    maximal = []
+    for r in sorted(rows, key=len, reverse=True):
+        if not any(r <= q for q in maximal):
+            maximal.append(r)
+    return maximal
+
+
+# returns (value, {row: weight}, exact) for the rows with positive weight
+def _cover_rows(n, rows, ghtd):
+    if len(rows[0]) == n:
+        return 1, {rows[0]: 1}, True
+    if ghtd:
+        return integral_edge_cover(n, rows, rows)
+    value, x = solve_cover_lp(n, rows)
+    return value, {rows[i]: w for i, w in enumerate(x) if w > 0}, True
+
+
+# rows are the (maximal) hyperedges restricted to the bag, given as sets of indices in range(n)
+def solve_cover_lp(n, rows):
+    _, x, y = _simplex(n, rows, float, 1e-9)
+    x = [Fraction(w).limit_denominator(1 << 24) for w in x]
+    y = [Fraction(w).limit_denominator(1 << 24) for w in y]
+    if _certify(n, rows, x, y):
+        return sum(x), x
+    logging.debug("Could not certify floating point cover LP, solving exactly.")
+    value, x, _ = _simplex(n, rows, Fraction, 0)
+    return value, x
+
+
+def _certify(n, rows, x, y):
+    # scale to a common denominator, integers are way faster than fractions
+    den = 1
+    for w in x + y:
+        den = den * w.denominator // gcd(den, w.denominator)
+    x = [w.numerator * (den // w.denominator) for w in x]
+    y = [w.numerator * (den // w.denominator) for w in y]
+    if any(w < 0 for w in x) or any(w < 0 for w in y) or sum(x) != sum(y):
+        return False
+    covered = [0] * n
+    for i, r in enumerate(rows):
+        if sum(y[j] for j in r) > den:
+            return False
+        for j in r:
+            covered[j] += x[i]
+    return all(c >= den for c in covered)
+
+
+def _simplex(n, rows, num, eps):
+    m = len(rows)
+    ncols = n + m
+    zero = num(0)
+    one = num(1)
+    # tableau: m constraint rows, objective row last, rhs in the last column
+    tab = []
+    for i, r in enumerate(rows):
+        t = [zero] * (ncols + 1)
+        for j in r:
+            t[j] = one
+        t[n + i] = one
+        t[ncols] = one
+        tab.append(t)
+    z = [-one] * n + [zero] * (m + 1)
+    basis = [n + i for i in range(m)]
+
+    while True:
+        # Bland's rule: smallest improving column
+        col = next((j for j in range(ncols) if z[j] < -eps), None)
+        if col is None:
+            break
+        row = None
+        for i in range(m):
+            a = tab[i][col]
+            if a > eps:
+                ratio = tab[i][ncols] / a
+                if row is None or ratio < best - eps or (ratio <= best + eps and basis[i] < basis[row]):
+                    row, best = i, ratio
+        # every variable occurs in some bounded row (bag vertices are covered by some edge)
+        if row is None:
+            raise ValueError("Unbounded cover LP, some vertex is not covered by any hyperedge.")
+        piv = tab[row]
+        p = piv[col]
+        if p != 1:
+            piv = [a / p if a else a for a in piv]
+            tab[row] = piv
+        nz = [j for j in range(ncols + 1) if piv[j]]
+        for t in tab + [z]:
+            if t is piv:
+                continue
+            f = t[col]
+            if f:
+                for j in nz:
+                    t[j] -= f * piv[j]
+        basis[row] = col
+
+    y = [zero] * n
+    for i, b in enumerate(basis):
+        if b < n:
+            y[b] = tab[i][ncols]
+    return z[ncols], z[n:ncols], y
+
+
+######[ILP]######
+# integral edge cover (ghtd) by a simple branch and bound over the rows. The first branch is greedy, so a cover is
+# found right away; after max_nodes search nodes the best cover so far is returned. It is a valid cover, but possibly
+# not minimal, hence integral covers serve as upper bounds only (lower bounds use the fractional cover).
+# returns (value, {eid: 1}, exact), exact is False if the search was stopped
+def integral_edge_cover(n, rows, eids, max_nodes=1 << 14):
+    covers = rows
+    if len(frozenset().union(*covers)) < n:
+        raise ValueError("Some vertex is not covered by any hyperedge.")
+    best = [n + 1, None]
+    nodes = [0]
+    largest = max(len(r) for r in covers)
+
+    def rec(uncovered, chosen):
+        # every further row covers at most largest vertices
+        if len(chosen) + -(-len(uncovered) // largest) >= best[0] or (nodes[0] >= max_nodes and best[1] is not None):
+            return
+        nodes[0] += 1
+        if not uncovered:
+            best[0], best[1] = len(chosen), list(chosen)
+            return
+        v = next(iter(uncovered))
+        for i in sorted((i for i in range(len(covers)) if v in covers[i]), key=lambda i: -len(covers[i] & uncovered)):
+            chosen.append(i)
+            rec(uncovered - covers[i], chosen)
+            chosen.pop()
+
+    rec(frozenset(range(n)), [])
+    exact = nodes[0] < max_nodes
+    if not exact:
+        logging.warning("Integral edge cover search stopped after {0} nodes, cover {1} might not be minimal.".format(
+            max_nodes, best[0]))
+    return best[0], {eids[i]: 1 for i in best[1]}, exact
+
+
+######[SERVICE]######
+# memoized covers of vertex sets (LRU eviction) with hit/miss counters, shared by the preprocessing and the heuristics.
+# The cover of a set only depends on the hyperedges restricted to it, so entries stay valid when vertices outside are
+# deleted from the hypergraph; after contractions clear() is required. Deletions might drop hyperedges (emptied or
+# subsumed ones, by the primal view), entries and shortcuts referring to a dropped edge id are not used.
+# Integral covers (ghtd) of a capped search are remembered until clear(), see exact().
+class FractionalCoverCache(object):
+    def __init__(self, hypergraph, ghtd=False, maxsize=1 << 16):
+        self.hypergraph = hypergraph
+        self.ghtd = ghtd
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._incidence = None
+        # keys whose integral cover search was capped, not subject to the LRU eviction
+        self._inexact = set()
+        self.hits = 0
+        self.misses = 0
+        self.shortcuts = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    def _lookup(self, key):
+        res = self._cache.get(key)
+        if res is not None:
+            edges = self.hypergraph.edges()
+            if not all(e in edges for e in res[1]):
+                del self._cache[key]
+                self._inexact.discard(key)
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+        return res
+
+    def _store(self, key, res):
+        value, weights, exact = res
+        if not exact:
+            self._inexact.add(key)
+        res = value, weights
+        self.misses += 1
+        self._cache[key] = res
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return res
+
+    # closed form, a set inside a single hyperedge has cover 1 (checks only the edges of its rarest vertex)
+    def _within_edge(self, key):
+        if self._incidence is None:
+            self._incidence = {}
+            for e, vs in self.hypergraph.edges().items():
+                vs = frozenset(vs)
+                for v in vs:
+                    self._incidence.setdefault(v, []).append((e, vs))
+        edges = self.hypergraph.edges()
+        v = min(key, key=lambda u: len(self._incidence.get(u, ())))
+        for e, vs in self._incidence.get(v, ()):
+            if key <= vs and e in edges:
+                self.shortcuts += 1
+                return 1, {e: 1}
+        return None
+
+    # returns (value, {edge id: weight})
+    def cover(self, bag):
+        key = frozenset(bag)
+        if len(key) == 0:
+            return 0, {}
+        res = self._lookup(key)
+        if res is None:
+            res = self._within_edge(key)
+        if res is None:
+            res = self._store(key, _edge_cover(self.hypergraph, key, self.ghtd))
+        return res
+
+    def value(self, bag):
+        return self.cover(bag)[0]
+
+    # covers of several sets, the missing ones go through fractional_edge_covers (one pass, each distinct LP once)
+    def covers(self, bags):
+        keys = [frozenset(bag) for bag in bags]
+        found = {}
+        missing = []
+        for key in keys:
+            if key in found:
+                continue
+            res = (0, {}) if len(key) == 0 else self._lookup(key) or self._within_edge(key)
+            if res is None:
+                missing.append(key)
+            found[key] = res
+        for key, res in zip(missing, _edge_covers(self.hypergraph, missing, self.ghtd)):
+            found[key] = self._store(key, res)
+        return [found[key] for key in keys]
+
+    # whether the cover of bag is minimal, i.e., its value is not only an upper bound (only integral covers can be
+    # capped); False as long as some capped cover is cached if bag is None
+    def exact(self, bag=None):
+        if bag is None:
+            return len(self._inexact) == 0
+        return frozenset(bag) not in self._inexact
+
+    def clear(self):
+        self._cache.clear()
+        self._incidence = None
+        self._inexact.clear()
+
+    @property
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'shortcuts': self.shortcuts, 'size': len(self._cache)}
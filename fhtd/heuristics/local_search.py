@@ -0,0 +1,174 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+import math
+import random
+import time
+
+from fhtd.heuristics.acyclic import decomposition_from_ordering
+from fhtd.heuristics.cover import FractionalCoverCache
+from fhtd.heuristics.orderings import BitsetEliminationGraph
+from fhtd.heuristics.upper_bound import heuristic_ordering
+
+
+######[LOCAL SEARCH]######
+# anytime simulated annealing over elimination orderings, a move swaps two vertices at positions i < j.
+# The bag at position k only depends on the set of vertices in front of k, hence a swap changes the bags at the
+# positions i..j only, these are recomputed (by reachability on bitsets) while all other bags are kept.
+# The energy is the width with the number of bags attaining the width as tie breaker.
+# For a coarsened hypergraph, groups maps each (coarse) vertex to the vertices of original it represents; the bags are
+# then expanded and covered in original. Covers are memoized by the (shared, LRU) cover service only, annealing
+# visits too many bags for an unbounded memo.
+class OrderingLocalSearch(object):
+    def __init__(self, hypergraph, ghtd=False, window=8, adj=None, original=None, groups=None, covers=None):
+        self.hypergraph = hypergraph
+        self.ghtd = ghtd
+        self.window = window
+        self.original = hypergraph if original is None else original
+        self.groups = groups
+        self.covers = FractionalCoverCache(self.original, ghtd=ghtd) if covers is None else covers
+        self._graph = BitsetEliminationGraph(hypergraph, adj=adj)
+
+    def cover(self, mask):
+        bag = self._graph.members(mask)
+        if self.groups is not None:
+            bag = [u for v in bag for u in self.groups[v]]
+        return self.covers.cover(bag)
+
+    def _evaluate(self, order):
+        # prefix[k] are the vertices eliminated in front of position k
+        prefix = [0] * len(order)
+        costs = [0] * len(order)
+        eliminated = 0
+        for k, v in enumerate(order):
+            prefix[k] = eliminated
+            costs[k] = self.cover(self._graph.bag(eliminated, v))[0]
+            eliminated |= 1 << v
+        return prefix, costs
+
+    # width of an ordering (vertex names)
+    def width(self, ordering):
+        return max(self._evaluate([self._graph.index[v] for v in ordering])[1])
+
+    @staticmethod
+    def _energy(costs):
+        width = max(costs)
+        return width, costs.count(width)
+
+    def _swap(self, order, prefix, costs, i, j):
+        order[i], order[j] = order[j], order[i]
+        eliminated = prefix[i]
+        for k in range(i, j + 1):
+            prefix[k] = eliminated
+            costs[k] = self.cover(self._graph.bag(eliminated, order[k]))[0]
+            eliminated |= 1 << order[k]
+
+    def _move(self, rnd, order, costs, width):
+        n = len(order)
+        # focus on positions whose bag attains the width
+        if rnd.random() < 0.5:
+            critical = [k for k in range(n) if costs[k] == width]
+            i = rnd.choice(critical)
+        else:
+            i = rnd.randrange(n)
+        j = i + rnd.randint(1, self.window) * (1 if rnd.random() < 0.5 else -1)
+        j = min(max(j, 0), n - 1)
+        if i == j:
+            j = i + 1 if i + 1 < n else i - 1
+        return min(i, j), max(i, j)
+
+    # runs annealing from ordering (vertex names) until deadline or lbound is reached
+    # returns (width, ordering)
+    def anneal(self, ordering, deadline, seed=0, lbound=0, temperature=0.5, cooling=0.999):
+        rnd = random.Random(seed)
+        order = [self._graph.index[v] for v in ordering]
+        prefix, costs = self._evaluate(order)
+        energy = self._energy(costs)
+        best = (energy[0], list(order))
+        if len(order) < 2:
+            return best[0], list(ordering)
+        n = len(order)
+        steps = 0
+        while best[0] > lbound and time.time() < deadline:
+            steps += 1
+            i, j = self._move(rnd, order, costs, energy[0])
+            old = (list(prefix[i:j + 1]), list(costs[i:j + 1]))
+            self._swap(order, prefix, costs, i, j)
+            new = self._energy(costs)
+            delta = float(new[0] - energy[0]) + float(new[1] - energy[1]) / n
+            if delta <= 0 or rnd.random() < math.exp(-delta / temperature):
+                energy = new
+                if energy[0] < best[0]:
+                    best = (energy[0], list(order))
+                    logging.debug("Local search improved to {0} after {1} steps".format(best[0], steps))
+            else:
+                order[i], order[j] = order[j], order[i]
+                prefix[i:j + 1], costs[i:j + 1] = old
+            temperature = max(temperature * cooling, 1e-3)
+        logging.debug("Local search (seed {0}) stopped after {1} steps".format(seed, steps))
+        return best[0], [self._graph.vertices[v] for v in best[1]]
+
+    # restarts for the given seeds sharing the time budget, later restarts continue from a shuffled window of the
+    # best ordering found so far
+    # returns (width, ordering, weights)
+    def search(self, ordering, budget, seeds=(0,), lbound=0):
+        start = time.time()
+        best = (self.width(ordering), list(ordering))
+        for k, seed in enumerate(seeds):
+            if best[0] <= lbound:
+                break
+            deadline = start + budget * (k + 1) / len(seeds)
+            initial = list(best[1])
+            if k > 0:
+                rnd = random.Random(seed)
+                i = rnd.randrange(len(initial))
+                part = initial[i:i + 2 * self.window]
+                rnd.shuffle(part)
+                initial[i:i + 2 * self.window] = part
+            res = self.anneal(initial, deadline, seed=seed, lbound=lbound)
+            if res[0] < best[0]:
+                best = res
+        weights = {}
+        eliminated = 0
+        for v in best[1]:
+            i = self._graph.index[v]
+            weights[v] = self.cover(self._graph.bag(eliminated, i))[1]
+            eliminated |= 1 << i
+        logging.info("Local search width {0}".format(best[0]))
+        return best[0], best[1], weights
+
+
+# local search seeded with the best greedy ordering (unless an ordering is given)
+# returns (width, ordering, weights)
+def local_search_ordering(hypergraph, budget, seed=0, seeds=1, ordering=None, ghtd=False, lbound=0, covers=None):
+    if len(hypergraph.nodes()) == 0:
+        return 0, [], {}
+    if covers is None:
+        covers = FractionalCoverCache(hypergraph, ghtd=ghtd)
+    if ordering is None:
+        ordering = heuristic_ordering(hypergraph, ghtd=ghtd, covers=covers)[1]
+    ls = OrderingLocalSearch(hypergraph, ghtd=ghtd, covers=covers)
+    return ls.search(ordering, budget, seeds=[seed + k for k in range(max(seeds, 1))], lbound=lbound)
+
+
+# returns (width, decomposition)
+def local_search_decomposition(hypergraph, budget, seed=0, seeds=1, ordering=None, checker_epsilon=None, ghtd=False,
+                               lbound=0, covers=None):
+    width, ordering, weights = local_search_ordering(hypergraph, budget, seed=seed, seeds=seeds, ordering=ordering,
+                                                     ghtd=ghtd, lbound=lbound, covers=covers)
+    return width, decomposition_from_ordering(hypergraph, ordering, weights, checker_epsilon=checker_epsilon)
@@ -0,0 +1,136 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import heapq
+import logging
+import math
+import time
+
+from fhtd.heuristics.cover import _cover_traces
+
+
+# fractional cover of bag in the minor given by its hyperedges (edge id: vertex set) and incidences
+# for ghtd we round the fractional cover up, the integral cover search is capped and would not be a sound bound
+def _cover_value(edges, incident, bag, ghtd):
+    pos = {v: i for i, v in enumerate(bag)}
+    traces = {}
+    seen = set()
+    for v in bag:
+        for e in incident[v]:
+            if e in seen:
+                continue
+            seen.add(e)
+            r = frozenset(pos[u] for u in edges[e] if u in pos)
+            if r not in traces:
+                traces[r] = e
+    value = _cover_traces(len(bag), traces, False)[0]
+    return math.ceil(value) if ghtd else value
+
+
+######[MINOR MIN WIDTH]######
+# Deleting a vertex and contracting two vertices of a common hyperedge do not increase the fractional (generalized)
+# hypertree width, and the vertex eliminated first by an optimal ordering of a minor has its closed neighbourhood
+# in a bag. Hence every minor bounds the width from below by the smallest cover of a closed neighbourhood.
+# We repeatedly take the vertex v of smallest cover and delete it (degeneracy) or contract it into the neighbour
+# sharing the fewest neighbours with v (least-c of minor-min-width, Gogate and Dechter).
+# Every step is a valid bound, we stop at the deadline, as soon as the bound reaches cutoff or stop() holds.
+# Improvements are reported to on_bound (if given).
+def _elimination_bound(hypergraph, contract, ghtd=False, deadline=None, cutoff=None, on_bound=None, stop=None):
+    edges = {e: set(vs) for e, vs in hypergraph.edges().items()}
+    incident = {v: set() for v in hypergraph.nodes()}
+    for e, vs in edges.items():
+        for v in vs:
+            incident[v].add(e)
+
+    def closed_nbh(v):
+        ret = {v}
+        for e in incident[v]:
+            ret.update(edges[e])
+        return ret
+
+    value = {}
+    for v in incident:
+        # only the minimum over all vertices is a bound
+        if (deadline is not None and time.time() > deadline) or (stop is not None and stop()):
+            return 0
+        value[v] = _cover_value(edges, incident, list(closed_nbh(v)), ghtd)
+    heap = [(w, v) for v, w in value.items()]
+    heapq.heapify(heap)
+
+    bound = 0
+    while len(heap) > 0:
+        w, v = heapq.heappop(heap)
+        if value.get(v) != w:
+            continue
+        if w > bound:
+            bound = w
+            if on_bound is not None:
+                on_bound(bound)
+        if (cutoff is not None and bound >= cutoff) or (deadline is not None and time.time() > deadline) or \
+                (stop is not None and stop()):
+            break
+        del value[v]
+        nbh = closed_nbh(v)
+        nbh.discard(v)
+        if contract and len(nbh) > 0:
+            u = min(nbh, key=lambda x: (len(closed_nbh(x) & nbh), len(incident[x]), x))
+            for e in incident.pop(v):
+                edges[e].discard(v)
+                edges[e].add(u)
+                incident[u].add(e)
+            # N[u] now contains N(v), the neighbourhoods of all other vertices are unchanged
+            changed = closed_nbh(u)
+        else:
+            for e in incident.pop(v):
+                edges[e].discard(v)
+            changed = nbh
+        for x in changed:
+            value[x] = _cover_value(edges, incident, list(closed_nbh(x)), ghtd)
+            heapq.heappush(heap, (value[x], x))
+    return bound
+
+
+def degeneracy_lower_bound(hypergraph, ghtd=False, deadline=None, cutoff=None, on_bound=None, stop=None):
+    return _elimination_bound(hypergraph, False, ghtd=ghtd, deadline=deadline, cutoff=cutoff, on_bound=on_bound,
+                              stop=stop)
+
+
+def contraction_lower_bound(hypergraph, ghtd=False, deadline=None, cutoff=None, on_bound=None, stop=None):
+    return _elimination_bound(hypergraph, True, ghtd=ghtd, deadline=deadline, cutoff=cutoff, on_bound=on_bound,
+                              stop=stop)
+
+
+######[LOWER BOUND]######
+LOWER_BOUNDS = (('degeneracy', degeneracy_lower_bound), ('contraction', contraction_lower_bound))
+
+
+# best bound of the engines within timeout seconds, cutoff is an upper bound (no engine has to go beyond)
+# on_bound and stop are passed to the engines (see fhtd.utils.race)
+# returns (bound, name of the engine)
+def heuristic_lower_bound(hypergraph, timeout=5, ghtd=False, cutoff=None, engines=LOWER_BOUNDS, on_bound=None,
+                          stop=None):
+    deadline = time.time() + timeout
+    best = (0, None)
+    for name, engine in engines:
+        bound = engine(hypergraph, ghtd=ghtd, deadline=deadline, cutoff=cutoff, on_bound=on_bound, stop=stop)
+        logging.debug("Lower bound {0}: {1}".format(name, bound))
+        if bound > best[0]:
+            best = (bound, name)
+        if (cutoff is not None and best[0] >= cutoff) or time.time() > deadline or (stop is not None and stop()):
+            break
+    logging.info("Heuristic lower bound {0} ({1})".format(best[0], best[1]))
+    return best
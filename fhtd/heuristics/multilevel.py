@@ -0,0 +1,118 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+import random
+import time
+
+from fhtd.heuristics.acyclic import decomposition_from_ordering
+from fhtd.heuristics.cover import FractionalCoverCache
+from fhtd.heuristics.local_search import OrderingLocalSearch
+from fhtd.heuristics.orderings import primal_adjacency
+from fhtd.heuristics.upper_bound import ORDERINGS
+
+
+######[COARSENING]######
+# contracts a matching of heavily connected vertex pairs, a hyperedge e contributes 1/(|e|-1) to each of its pairs
+# and pairs of small groups are preferred (keeps the levels balanced)
+# returns (coarse hypergraph, {representative: (representative, partner)}), None if nothing can be contracted
+def coarsen(hypergraph, groups, rnd):
+    incidence = {v: [] for v in hypergraph.nodes()}
+    for vs in hypergraph.edges().values():
+        for v in vs:
+            incidence[v].append(vs)
+    vertices = list(incidence.keys())
+    rnd.shuffle(vertices)
+    matched = set()
+    pairs = {}
+    for u in vertices:
+        if u in matched:
+            continue
+        score = {}
+        for vs in incidence[u]:
+            if len(vs) < 2:
+                continue
+            w = 1.0 / (len(vs) - 1)
+            for v in vs:
+                if v != u and v not in matched:
+                    score[v] = score.get(v, 0) + w
+        if len(score) == 0:
+            continue
+        v = max(score, key=lambda x: score[x] / (len(groups[u]) + len(groups[x])))
+        matched.update((u, v))
+        pairs[u] = (u, v)
+    if len(pairs) == 0:
+        return None
+    coarse = hypergraph.copy()
+    for e in pairs.values():
+        coarse.contract_edge(e, e[0])
+    return coarse, pairs
+
+
+######[MULTILEVEL]######
+# coarsens until at most coarse_size vertices remain (or a level shrinks by less than min_shrink),
+# starts on the coarsest level and uncoarsens: every vertex is replaced by the pair it was contracted from and the
+# ordering is refined by local search. On each level the projected ordering competes with the greedy orderings of that
+# level, hence the result is never worse than the greedy upper bound. Bags of coarse levels are expanded to the
+# original vertices and covered in the original hypergraph.
+# returns (width, ordering, weights)
+def multilevel_ordering(hypergraph, budget, seed=0, ghtd=False, coarse_size=64, min_shrink=0.05, lbound=0,
+                        covers=None):
+    start = time.time()
+    if len(hypergraph.nodes()) == 0:
+        return 0, [], {}
+    if covers is None:
+        covers = FractionalCoverCache(hypergraph, ghtd=ghtd)
+    rnd = random.Random(seed)
+    levels = [(hypergraph, {v: (v,) for v in hypergraph.nodes()})]
+    merges = []
+    while len(levels[-1][1]) > coarse_size:
+        hg, groups = levels[-1]
+        res = coarsen(hg, groups, rnd)
+        if res is None or len(res[1]) < min_shrink * len(groups):
+            break
+        coarse, pairs = res
+        cgroups = dict(groups)
+        for u, v in pairs.values():
+            cgroups[u] = groups[u] + groups[v]
+            del cgroups[v]
+        levels.append((coarse, cgroups))
+        merges.append(pairs)
+    logging.info("Multilevel: {0} levels, coarsest has {1} vertices".format(len(levels), len(levels[-1][1])))
+
+    ordering = None
+    width = weights = None
+    for k in range(len(levels) - 1, -1, -1):
+        hg, groups = levels[k]
+        ls = OrderingLocalSearch(hg, ghtd=ghtd, original=hypergraph, groups=None if k == 0 else groups, covers=covers)
+        adj = primal_adjacency(hg)
+        candidates = [] if ordering is None else [[u for v in ordering for u in merges[k].get(v, (v,))]]
+        candidates.extend(heur(adj) for _, heur in ORDERINGS)
+        ordering = min(candidates, key=ls.width)
+        # unused time is passed on to the finer levels
+        level_budget = max(0, start + budget * (len(levels) - k) / len(levels) - time.time())
+        width, ordering, weights = ls.search(ordering, level_budget, seeds=(seed + k,), lbound=lbound)
+        logging.debug("Multilevel: level {0} ({1} vertices) width {2}".format(k, len(groups), width))
+    return width, ordering, weights
+
+
+# returns (width, decomposition)
+def multilevel_decomposition(hypergraph, budget, seed=0, checker_epsilon=None, ghtd=False, coarse_size=64, lbound=0,
+                             covers=None):
+    width, ordering, weights = multilevel_ordering(hypergraph, budget, seed=seed, ghtd=ghtd, coarse_size=coarse_size,
+                                                   lbound=lbound, covers=covers)
+    return width, decomposition_from_ordering(hypergraph, ordering, weights, checker_epsilon=checker_epsilon)
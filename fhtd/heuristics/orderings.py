@@ -0,0 +1,197 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import heapq
+from itertools import combinations
+
+
+# adjacency sets of the primal graph
+def primal_adjacency(hypergraph):
+    adj = {v: set() for v in hypergraph.nodes()}
+    for vs in hypergraph.edges().values():
+        for v in vs:
+            adj[v].update(vs)
+    for v in adj:
+        adj[v].discard(v)
+    return adj
+
+
+######[MCS]######
+# maximum cardinality search (Tarjan, Yannakakis), linear time by means of buckets
+# returns an elimination ordering, i.e., the reverse of the visiting order
+def max_cardinality_ordering(adj):
+    weight = {v: 0 for v in adj}
+    buckets = [set(adj.keys())]
+    top = 0
+    visited = []
+    while len(weight) > 0:
+        while top >= 0 and len(buckets[top]) == 0:
+            top -= 1
+        v = buckets[top].pop()
+        del weight[v]
+        visited.append(v)
+        for u in adj[v]:
+            w = weight.get(u)
+            if w is None:
+                continue
+            buckets[w].discard(u)
+            w += 1
+            weight[u] = w
+            if w == len(buckets):
+                buckets.append(set())
+            buckets[w].add(u)
+            if w > top:
+                top = w
+    visited.reverse()
+    return visited
+
+
+def _fill_in(adj, v):
+    return sum(1 for a, b in combinations(adj[v], 2) if b not in adj[a])
+
+
+# greedy elimination by smallest key, keys are maintained lazily in a heap and only recomputed for vertices
+# whose key might have changed by eliminating v, i.e., vertices within distance affected of v
+def _greedy_ordering(adj, key, affected):
+    adj = {v: set(ngbs) for v, ngbs in adj.items()}
+    cur = {v: key(adj, v) for v in adj}
+    heap = [(k, v) for v, k in cur.items()]
+    heapq.heapify(heap)
+    ordering = []
+    while heap:
+        k, v = heapq.heappop(heap)
+        if v not in cur or cur[v] != k:
+            continue
+        del cur[v]
+        ordering.append(v)
+        ngbs = adj.pop(v)
+        for u in ngbs:
+            adj[u].discard(v)
+            adj[u].update(ngbs)
+            adj[u].discard(u)
+        dirty = set(ngbs)
+        if affected > 1:
+            for u in ngbs:
+                dirty.update(adj[u])
+        for u in dirty:
+            k = key(adj, u)
+            if cur[u] != k:
+                cur[u] = k
+                heapq.heappush(heap, (k, u))
+    return ordering
+
+
+######[MIN-FILL]######
+def min_fill_ordering(adj):
+    return _greedy_ordering(adj, _fill_in, 2)
+
+
+######[MIN-DEGREE]######
+def min_degree_ordering(adj):
+    return _greedy_ordering(adj, lambda a, v: len(a[v]), 1)
+
+
+# vertex v together with its neighbours that are eliminated later than v
+def later_neighbors(adj, ordering):
+    pos = {v: i for i, v in enumerate(ordering)}
+    return {v: {u for u in adj[v] if pos[u] > pos[v]} for v in ordering}
+
+
+######[PEO]######
+# checks whether ordering is a perfect elimination ordering, i.e., eliminating along ordering adds no fill-in
+def is_perfect_elimination_ordering(adj, ordering):
+    pos = {v: i for i, v in enumerate(ordering)}
+    for v in ordering:
+        later = [u for u in adj[v] if pos[u] > pos[v]]
+        if len(later) <= 1:
+            continue
+        parent = min(later, key=lambda u: pos[u])
+        if not all(u == parent or u in adj[parent] for u in later):
+            return False
+    return True
+
+
+# bags obtained by eliminating the vertices along ordering (including fill-in edges)
+# returns a dict vertex -> bag (vertex and its neighbours at the time of elimination)
+def elimination_bags(adj, ordering):
+    adj = {v: set(ngbs) for v, ngbs in adj.items()}
+    bags = {}
+    for v in ordering:
+        ngbs = adj.pop(v)
+        for u in ngbs:
+            adj[u].discard(v)
+            adj[u].update(ngbs)
+            adj[u].discard(u)
+        ngbs.add(v)
+        bags[v] = ngbs
+    return bags
+
+
+######[BITSETS]######
+# primal graph with neighbourhoods as bitsets (python ints) over vertex indices
+# bags of an elimination ordering only depend on the set of vertices eliminated before, not on their order:
+# the bag of v after eliminating S is v together with Q(S, v), the vertices outside S reachable from v through S
+class BitsetEliminationGraph(object):
+    def __init__(self, hypergraph, adj=None):
+        if adj is None:
+            adj = primal_adjacency(hypergraph)
+        self.adj = adj
+        # adj might be restricted to a part of the hypergraph
+        self.vertices = list(adj)
+        self.index = {v: i for i, v in enumerate(self.vertices)}
+        self.nmask = [0] * len(self.vertices)
+        for v, ngbs in adj.items():
+            i = self.index[v]
+            for u in ngbs:
+                self.nmask[i] |= 1 << self.index[u]
+
+    def __len__(self):
+        return len(self.vertices)
+
+    def mask(self, vertices):
+        m = 0
+        for v in vertices:
+            m |= 1 << self.index[v]
+        return m
+
+    def members(self, mask):
+        ret = []
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            ret.append(self.vertices[low.bit_length() - 1])
+        return ret
+
+    # vertices outside eliminated u {v} reachable from v (an index) through eliminated vertices
+    def q_set(self, eliminated, v):
+        nmask = self.nmask
+        out = nmask[v]
+        stack = out & eliminated
+        seen = stack
+        while stack:
+            low = stack & -stack
+            stack ^= low
+            ngbs = nmask[low.bit_length() - 1]
+            out |= ngbs
+            new = ngbs & eliminated & ~seen
+            seen |= new
+            stack |= new
+        return out & ~eliminated & ~(1 << v)
+
+    # bag (as bitset) of v (an index) when eliminated after the vertices in eliminated
+    def bag(self, eliminated, v):
+        return self.q_set(eliminated, v) | 1 << v
@@ -0,0 +1,75 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+
+from fhtd.heuristics.acyclic import decomposition_from_ordering
+from fhtd.heuristics.cover import FractionalCoverCache
+from fhtd.heuristics.orderings import primal_adjacency, min_fill_ordering, min_degree_ordering, \
+    max_cardinality_ordering, elimination_bags
+
+ORDERINGS = (('min_fill', min_fill_ordering), ('min_degree', min_degree_ordering),
+             ('mcs', max_cardinality_ordering))
+
+
+# width of an elimination ordering, i.e., largest (fractional) cover of its bags
+# stops as soon as some bag reaches cutoff (returns None then), covers is a FractionalCoverCache
+def ordering_width(hypergraph, ordering, adj=None, ghtd=False, cutoff=None, covers=None):
+    if adj is None:
+        adj = primal_adjacency(hypergraph)
+    if covers is None:
+        covers = FractionalCoverCache(hypergraph, ghtd=ghtd)
+    width = 0
+    weights = {}
+    bags = elimination_bags(adj, ordering)
+    if cutoff is None:
+        # no early exit, all bags in one batch
+        vertices = list(bags.keys())
+        for v, (value, weights[v]) in zip(vertices, covers.covers(bags[v] for v in vertices)):
+            width = max(width, value)
+        return width, weights
+    for v, bag in bags.items():
+        value, weights[v] = covers.cover(bag)
+        if value >= cutoff:
+            return None, None
+        width = max(width, value)
+    return width, weights
+
+
+######[UPPER BOUND]######
+# best of the greedy orderings evaluated by covering their bags
+# returns (width, ordering, weights, name of the heuristic)
+def heuristic_ordering(hypergraph, ghtd=False, adj=None, orderings=ORDERINGS, covers=None):
+    if adj is None:
+        adj = primal_adjacency(hypergraph)
+    if covers is None:
+        covers = FractionalCoverCache(hypergraph, ghtd=ghtd)
+    best = (None, None, None, None)
+    for name, heur in orderings:
+        ordering = heur(adj)
+        width, weights = ordering_width(hypergraph, ordering, adj=adj, ghtd=ghtd, cutoff=best[0], covers=covers)
+        logging.debug("Heuristic {0} width {1}".format(name, width))
+        if width is not None:
+            best = (width, ordering, weights, name)
+    logging.info("Heuristic upper bound {0} ({1})".format(best[0], best[3]))
+    return best
+
+
+# returns (width, decomposition) of the best heuristic ordering
+def heuristic_decomposition(hypergraph, checker_epsilon=None, ghtd=False, covers=None):
+    width, ordering, weights, _ = heuristic_ordering(hypergraph, ghtd=ghtd, covers=covers)
+    return width, decomposition_from_ordering(hypergraph, ordering, weights, checker_epsilon=checker_epsilon)
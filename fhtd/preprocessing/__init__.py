@@ -1 +1,6 @@
-from fhtd.preprocessing.preprocessing import FractionalHyperTreeDecomposition_Preprocessor
\ No newline at end of file
+from fhtd.preprocessing.preprocessing import FractionalHyperTreeDecomposition_Preprocessor
+from fhtd.preprocessing.dominated import dominated_hyperedges
+from fhtd.preprocessing.twins import twin_classes, quotient_twins, expand_twins
+from fhtd.preprocessing.primal import BitsetPrimalGraph
+from fhtd.preprocessing.replay import ReplayLog, replay_decomposition
+from fhtd.preprocessing.symmetry import automorphism_generators
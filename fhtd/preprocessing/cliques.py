@@ -0,0 +1,153 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+import threading
+
+# facts and primal adjacency, grounded once per component
+BASE = """
+adj(X,Y) :- e(E,X), e(E,Y), X != Y.
+"""
+
+# k-hyperclique: a clique of the primal graph with less than k vertices in every hyperedge
+HYPERCLIQUE = """
+#program hyperclique(k).
+#external hyperclique(k).
+{ a(k,X) : v(X) } :- hyperclique(k).
+:- a(k,X), a(k,Y), X < Y, not adj(X,Y).
+:- e(E,_), #count{ X : a(k,X), e(E,X) } >= k.
+#maximize{ 1@k,X : a(k,X) }.
+"""
+
+# largest clique of the primal graph of size at least lb
+CLIQUE = """
+#program clique(lb).
+#external clique(lb).
+{ c(lb,X) : v(X) } :- clique(lb).
+:- c(lb,X), c(lb,Y), X < Y, not adj(X,Y).
+:- clique(lb), #count{ X : c(lb,X) } < lb.
+#maximize{ 1@0,X : c(lb,X) }.
+"""
+
+
+# clingo is optional (see environment_full.yml), it is imported by the session only
+def clingo_available():
+    try:
+        import clingo
+    except ImportError:
+        return False
+    return True
+
+
+######[CLIQUES]######
+# multi-shot clingo session for the clique computations of a component: the hypergraph facts are grounded once,
+# every query adds its program part (guarded by an external atom) and is solved with all other parts switched off.
+# Optimal answers are kept, the size of a clique found before serves as lower bound for largest_clique.
+# The parts answer the queries of encoder_k_hyperclique and encoder_largest_clique of htd_validate (tests compare the
+# clique sizes), each with its own guard and predicate such that the parts can be switched within one control.
+class CliqueSession(object):
+    def __init__(self, hypergraph):
+        import clingo
+        self.clingo = clingo
+        self.ctl = clingo.Control(['--opt-mode=opt'])
+        facts = ["v({0}).".format(v) for v in hypergraph.nodes()]
+        for e, vs in hypergraph.edges().items():
+            facts.extend("e({0},{1}).".format(e, v) for v in vs)
+        self.ctl.add('base', [], BASE + "\n".join(facts))
+        self.ctl.add('base', [], HYPERCLIQUE)
+        self.ctl.add('base', [], CLIQUE)
+        self.ctl.ground([('base', [])])
+        self.parts = []
+        self.optimal = {}
+        self.lb = 0
+        self.cancelled = False
+
+    def _solve(self, part, args, predicate, timeout):
+        key = (part, tuple(args))
+        if key in self.optimal or self.cancelled:
+            return self.optimal.get(key, [])
+        clingo = self.clingo
+        external = clingo.Function(part, [clingo.Number(a) for a in args])
+        if key not in self.parts:
+            self.ctl.ground([(part, [clingo.Number(a) for a in args])])
+            self.parts.append(key)
+        for p, a in self.parts:
+            self.ctl.assign_external(clingo.Function(p, [clingo.Number(x) for x in a]), (p, a) == key)
+        best = []
+
+        def on_model(model):
+            best[:] = [[s.arguments[1].number for s in model.symbols(atoms=True)
+                        if s.name == predicate and s.arguments[0] == external.arguments[0]]]
+
+        with self.ctl.solve(on_model=on_model, async_=True) as handle:
+            finished = handle.wait(timeout)
+            if not finished:
+                handle.cancel()
+            exhausted = handle.get().exhausted
+        if finished and exhausted:
+            self.optimal[key] = best
+        if len(best) > 0:
+            self.lb = max(self.lb, len(best[0]))
+        logging.info("Clique part {0}{1}: {2} (optimal: {3})".format(part, args, best, key in self.optimal))
+        return best
+
+    # stops the running query (from another thread), it returns the best clique found so far
+    def cancel(self):
+        self.cancelled = True
+        self.ctl.interrupt()
+
+    # [largest clique with less than k vertices in each hyperedge], empty on timeout without model
+    def largest_hyperclique(self, k, timeout=60):
+        return self._solve('hyperclique', [k], 'a', timeout)
+
+    # [largest clique], cliques found earlier in this session bound its size from below
+    def largest_clique(self, lb=0, timeout=60):
+        return self._solve('clique', [max(lb, self.lb)], 'c', timeout)
+
+
+######[BACKGROUND]######
+# clique computation in a worker thread, clingo and the native solvers release the GIL while searching.
+# result(timeout) is None while the computation is running, cancel() stops it and keeps the anytime result
+# (computations without cancel are abandoned, None).
+class BackgroundClique(object):
+    def __init__(self, compute, cancel=None):
+        self.__compute = compute
+        self.__cancel = cancel
+        self.__result = None
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def __run(self):
+        try:
+            self.__result = self.__compute()
+        except RuntimeError as e:
+            logging.error("Background clique computation failed: {0}".format(e))
+            self.__result = []
+
+    def done(self):
+        return not self.__thread.is_alive()
+
+    def result(self, timeout=None):
+        self.__thread.join(timeout)
+        return None if self.__thread.is_alive() else self.__result
+
+    def cancel(self):
+        if self.__cancel is None:
+            return self.result(0)
+        if self.__thread.is_alive():
+            self.__cancel()
+        return self.result()
@@ -0,0 +1,53 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+
+
+######[DOMINATED EDGES]######
+# a hyperedge e that is subsumed by (or identical to) another hyperedge f never needs weight: moving the weight of e to
+# f keeps every vertex covered, for fractional and for integral covers, and the primal graph does not change.
+# Edges are processed by decreasing size (signature: size, sorted vertices, id), so identical edges keep the smallest
+# id. An edge is only checked against kept edges containing its rarest vertex, every kept edge is at least as large.
+# returns {dominated edge id: id of the kept edge that subsumes it}
+def dominated_hyperedges(hypergraph):
+    edges = [(e, frozenset(vs)) for e, vs in hypergraph.edges().items() if len(vs) > 0]
+    edges.sort(key=lambda x: (-len(x[1]), sorted(x[1]), x[0]))
+    frequency = {}
+    for _, vs in edges:
+        for v in vs:
+            frequency[v] = frequency.get(v, 0) + 1
+
+    dominated = {}
+    signatures = {}
+    kept = {}
+    for e, vs in edges:
+        f = signatures.get(vs)
+        if f is None:
+            rarest = min(vs, key=lambda v: frequency[v])
+            for g, ws in kept.get(rarest, ()):
+                if vs <= ws:
+                    f = g
+                    break
+        if f is not None:
+            dominated[e] = f
+            continue
+        signatures[vs] = e
+        for v in vs:
+            kept.setdefault(v, []).append((e, vs))
+    logging.info("Dominated hyperedges: {0} of {1}".format(len(dominated), len(edges)))
+    return dominated
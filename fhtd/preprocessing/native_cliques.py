@@ -0,0 +1,121 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+import os
+import subprocess
+import tempfile
+
+from pathlib import Path
+
+LIB = Path(__file__).parent.parent.parent.absolute().joinpath('lib', 'clique')
+
+
+# primal graph in MatrixMarket format (vertices 1..n, lower triangle), returns the vertices by index
+def write_mtx(hypergraph, f):
+    vertices = sorted(hypergraph.nodes())
+    index = {v: i + 1 for i, v in enumerate(vertices)}
+    edges = set()
+    for vs in hypergraph.edges().values():
+        for u in vs:
+            for v in vs:
+                if index[u] > index[v]:
+                    edges.add((index[u], index[v]))
+    f.write("%%MatrixMarket matrix coordinate pattern symmetric\n")
+    f.write("{0} {0} {1}\n".format(len(vertices), len(edges)))
+    for i, j in sorted(edges):
+        f.write("{0} {1}\n".format(i, j))
+    return vertices
+
+
+# clique of the line "Maximum clique: 3 1 7 ..." (1-based indices), None if there is none
+def parse_clique(output, vertices):
+    for line in output.splitlines():
+        if line.startswith("Maximum clique:"):
+            return [vertices[int(i) - 1] for i in line.split(':', 1)[1].split()]
+    return None
+
+
+def is_clique(hypergraph, clique):
+    adj = {v: set() for v in clique}
+    for vs in hypergraph.edges().values():
+        for v in vs:
+            if v in adj:
+                adj[v].update(vs)
+    return all(set(clique) <= adj[v] for v in clique)
+
+
+######[CLIQUE PROVIDERS]######
+# maximum cliques of the primal graph by an external solver. The decomposer takes any clique_provider with
+# - name, used in log messages
+# - largest_clique(hypergraph, timeout), returns [clique] or [] (timeout, failure), raises a RuntimeError if the
+#   solver is not available
+# - cancel(), stops a running largest_clique (from another thread)
+# PMCCliqueProvider is the default one.
+#
+# multithreaded branch and bound of lib/clique/pmc (https://github.com/ryanrossi/pmc), the binary is built at install
+# time (make -C lib/clique/pmc, see README.md)
+class PMCCliqueProvider(object):
+    name = 'pmc'
+
+    def __init__(self, path=None, threads=None):
+        self.path = str(LIB.joinpath('pmc')) if path is None else path
+        self.threads = os.cpu_count() if threads is None else threads
+        self.process = None
+
+    # raises a RuntimeError if pmc was not built
+    def binary(self):
+        binary = os.path.join(self.path, 'pmc')
+        if not os.access(binary, os.X_OK):
+            raise RuntimeError("pmc binary {0} is missing, build it by 'make -C {1}' (after git submodule update "
+                               "--init {1})".format(binary, self.path))
+        return binary
+
+    # options of pmc_input.h: -a 0 full exact search, -t threads, -w time limit in seconds (pmc reports the best
+    # clique found when it expires); note that -k would ask for a clique of the given size instead
+    def command(self, binary, filename, timeout):
+        return [binary, '-f', filename, '-a', '0', '-t', str(self.threads), '-w', str(timeout)]
+
+    def largest_clique(self, hypergraph, timeout=60):
+        if hypergraph.number_of_nodes() == 0:
+            return []
+        binary = self.binary()
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.mtx') as f:
+            vertices = write_mtx(hypergraph, f)
+            f.flush()
+            self.process = subprocess.Popen(self.command(binary, f.name, timeout), stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL)
+            try:
+                output = self.process.communicate(timeout=timeout + 10)[0].decode()
+            except subprocess.TimeoutExpired:
+                logging.warning("pmc did not stop after {0}s.".format(timeout))
+                self.process.kill()
+                self.process.communicate()
+                return []
+            finally:
+                self.process = None
+        clique = parse_clique(output, vertices)
+        if clique is None or not is_clique(hypergraph, clique):
+            logging.error("pmc returned no (valid) clique: {0}".format(clique))
+            return []
+        return [clique]
+
+    # stops a running largest_clique (from another thread)
+    def cancel(self):
+        process = self.process
+        if process is not None:
+            process.kill()
@@ -19,18 +19,43 @@
 from __future__ import absolute_import
 
 import logging
+from collections import deque
+
+from fhtd.dp.subset_dp import FractionalHypertreeDecompositionDP
+from fhtd.heuristics.cover import FractionalCoverCache
+from fhtd.preprocessing.primal import BitsetPrimalGraph
+from fhtd.preprocessing.replay import ReplayLog
 
 
 class FractionalHyperTreeDecomposition_Preprocessor:
     # suggested order [1], ..., [k]
-    def __init__(self, hgprimview, replay=True, lb=1):
+    def __init__(self, hgprimview, replay=True, lb=1, edge_contr=True, split_size=10):
         self.__lb = lb  # initial lower bound 1
+        self.edge_contr = edge_contr
+        # largest closed neighbourhood that is solved exactly by split_vertices, 0 disables the rule
+        self.split_size = split_size
         self.init(hgprimview, replay)
 
     def init(self, hgprimview, replay=True):
         self.__hgp = hgprimview
-        self.__replay = [] if replay else None
+        # bitset primal graph, updated by _delete and contract
+        self.__primal = BitsetPrimalGraph(hgprimview.hg)
+        # covers stay valid under vertex deletions, cleared on contraction
+        self.__covers = FractionalCoverCache(hgprimview.hg)
+        self.__replay = ReplayLog() if replay else None
+        # worklist state (hyper-degree incidence, dirty vertices), built by preprocess() and kept in sync by _delete
+        # and contract, such that later rounds only re-check vertices whose neighbourhood changed
+        self.__incident = None
+        self.__dirty = deque()
+        self.__queued = set()
+        # finished cliques [clique, vertex] and inverted indices vertex -> positions in __cliques_finished
+        # (__cliques_touching for clique members and vertex, __cliques_by_vertex for the vertex only)
         self.__cliques_finished = [] if replay else None
+        self.__cliques_touching = {}
+        self.__cliques_by_vertex = {}
+        # pending operations: contraction candidates (required lower bound, vertex) that are not safe yet
+        self.__pending = set()
+        self.__stats = {'contractions': 0, 'queued': 0, 'fired': 0, 'splits': 0}
 
     @property
     def lb(self):
@@ -49,57 +74,193 @@ class FractionalHyperTreeDecomposition_Preprocessor:
     def hgp(self):
         return self.__hgp
 
+    @property
+    def primal(self):
+        return self.__primal
+
+    @property
+    def covers(self):
+        return self.__covers
+
+    # the hypergraph was relabeled in place (relabel_consecutively): the primal graph and the covers are keyed by
+    # the old labels and are rebuilt, covers (of the relabeled hypergraph) is shared if given
+    def relabeled(self, covers=None):
+        self.__primal = BitsetPrimalGraph(self.__hgp.hg)
+        self.__covers = FractionalCoverCache(self.__hgp.hg) if covers is None else covers
+        self.__incident = None
+
+    @property
+    def stats(self):
+        return dict(self.__stats, pending=len(self.__pending))
+
+    # state of a finished preprocess() run on the (already reduced) hypergraph of init, e.g., loaded from a cache
+    def restore(self, replay, lb, stats):
+        self.__replay = replay
+        self.consider_lb(lb)
+        self.__stats = {k: v for k, v in stats.items() if k != 'pending'}
+
     def __debug_step(self, state):
         logging.info("{0} {1},{2},{3}".format(state, self.__replay, self.__hgp.nodes(), self.__hgp.hg.edges()))
         # print("{0}\n{1}\n{2}\n{3}".format(state, self.__replay, self.__hgp.nodes(), self.__hgp.hg.edges()))
 
     def preprocess(self):
         #return (self.__replay, self.__lb)  # , self.__hgp.hg.get_nsymtab().id2name)
+        # degree and simplicial reductions, re-checking only vertices whose neighbourhood changed (also by the rules
+        # below, which still sweep the whole graph)
+        self._init_worklist()
         run = True
         while run:
             run = False
-            while self.remove_hyper_degree_vertex():
-                run = True
-            self.__debug_step("post-degree")
-            while self.almost_simplicial_hypergraph():
+            self._drain_worklist(clique_prevent_he_up_to=10)
+            self.__debug_step("post-worklist")
+            # a single sweep of the rules below is usually enough to confirm the fixpoint (and yields the clique bounds)
+            while self.almost_simplicial_hypergraph(edge_contr=self.edge_contr):
                 run = True
             self.__debug_step("post-almost-simplicial")
             while self.simplicial_primalgraph(clique_prevent_he_up_to=10):
                 run = True
             self.__debug_step("post-simplicial-primal")
-            while self.almost_simplicial_primalgraph(clique_prevent_he_up_to=10):
+            while self.almost_simplicial_primalgraph(clique_prevent_he_up_to=10, edge_contr=self.edge_contr):
                 run = True
             self.__debug_step("post-almost-simplicial-primal")
+            if self.split_vertices(self.split_size):
+                run = True
+            self.__debug_step("post-split")
+            # the lower bound might have grown during this round, another round fires the pending contractions
+            if self.fire_pending():
+                run = True
+        logging.info("fractional covers: {0}, contractions: {1}".format(self.__covers.stats, self.stats))
         return (self.__replay, self.__lb)  # , self.__hgp.hg.get_nsymtab().id2name)
 
+    ######[WORKLIST]######
+    # incidence (hyper-degree) and the bitset primal graph are maintained incrementally while reducing;
+    # removing or contracting a vertex only changes the neighbourhoods of its neighbours, hence only those are queued
+    # again. Incidences may keep ids of hyperedges the primal view dropped (emptied or subsumed), they are filtered
+    # when the vertex is checked.
+    def _init_worklist(self):
+        self.__incident = {v: set() for v in self.__hgp.hg.nodes()}
+        for e, vs in self.__hgp.hg.edges().items():
+            for v in vs:
+                self.__incident[v].add(e)
+        self.__dirty = deque(self.__incident)
+        self.__queued = set(self.__incident)
+
+    def _mark_dirty(self, v):
+        if v not in self.__queued:
+            self.__queued.add(v)
+            self.__dirty.append(v)
+
+    # as for simplicial_primalgraph, closed neighbourhoods larger than clique_prevent_he_up_to are left to the sweeps
+    def _drain_worklist(self, clique_prevent_he_up_to=10):
+        checks = removed = 0
+        while self.__dirty:
+            v = self.__dirty.popleft()
+            self.__queued.discard(v)
+            if v not in self.__incident:
+                continue
+            checks += 1
+            edges = self.__hgp.hg.edges()
+            incident = self.__incident[v] = {e for e in self.__incident[v] if e in edges}
+            if len(incident) <= 1:
+                # hyper-degree 0 or 1, the bag is (at most) one hyperedge
+                weight, cover = 1.0, {e: 1 for e in incident} or None
+            elif self.__primal.degree(v) < clique_prevent_he_up_to and self.__primal.is_simplicial(v):
+                # simplicial, the closed neighbourhood is a clique and hence a lower bound
+                weight, cover = self.__covers.cover(self.__primal.members(self.__primal.closed(v)))
+                self.consider_lb(weight)
+            else:
+                continue
+            self._remove_vertex(v, weight, cover)
+            removed += 1
+        logging.info("worklist: {0} checks, {1} vertices removed".format(checks, removed))
+        return removed > 0
+
+    def _remove_vertex(self, v, weight, cover=None):
+        ngbs = self.__primal.members(self.__primal.neighbours(v))
+        self._delete(v)
+        self.addReplay((v,), parent_bag_required=tuple(ngbs), weight=weight, cover=cover)
+
+    # every vertex deletion of the preprocessor goes through here, keeps the bitset primal graph and the worklist
+    # in sync
+    def _delete(self, v):
+        if self.__incident is not None:
+            self.__incident.pop(v, None)
+            if v in self.__primal:
+                for u in self.__primal.members(self.__primal.neighbours(v)):
+                    self._mark_dirty(u)
+        del self.__hgp[v]
+        self.__primal.remove(v)
+
+    # hyperedges of erepr (and its neighbours) changed by a contraction, their incidences are recomputed
+    def _contracted(self, contr, erepr):
+        if self.__incident is None:
+            return
+        for v in contr:
+            self.__incident.pop(v, None)
+        touched = set(self.__primal.members(self.__primal.closed(erepr))) if erepr in self.__primal else {erepr}
+        for v in touched:
+            self.__incident[v] = set()
+            self._mark_dirty(v)
+        for e, vs in self.__hgp.hg.edges().items():
+            for v in vs:
+                if v in touched:
+                    self.__incident[v].add(e)
+
+    # only the finished cliques touching contracted vertices are rewritten
+    ######[PENDING]######
+    # contraction candidates wait until the lower bound proves them safe
+    def add_pending(self, required_lb, v):
+        if (required_lb, v) not in self.__pending:
+            self.__pending.add((required_lb, v))
+            self.__stats['queued'] += 1
+
+    # releases the candidates that are safe by now, the rules re-check them on the current graph
+    def fire_pending(self):
+        ready = {p for p in self.__pending if p[0] <= self.__lb}
+        if len(ready) == 0:
+            return False
+        self.__pending.difference_update(ready)
+        self.__stats['fired'] += len(ready)
+        return True
+
     def update_finished_cliques(self, contr, erepr):
-        for x in self.__cliques_finished:
-            if x[1] in contr:
-                x[1] = erepr
-            x[0] = {xi if xi not in contr else erepr for xi in x[0]}
+        for xi in contr:
+            for i in self.__cliques_touching.pop(xi, ()):
+                x = self.__cliques_finished[i]
+                if x[1] == xi:
+                    x[1] = erepr
+                    self.__cliques_by_vertex[xi].discard(i)
+                    self.__cliques_by_vertex.setdefault(erepr, set()).add(i)
+                if xi in x[0]:
+                    x[0].discard(xi)
+                    x[0].add(erepr)
+                self.__cliques_touching.setdefault(erepr, set()).add(i)
 
     def clique_finished(self, clnew, vnew, autoAdd=True):
         # return False
         clnew = {ei for ei in clnew if ei != vnew}
         # print "REQUEST ", self.__cliques_finished, clnew, vnew
-        for cl, vertex in self.__cliques_finished:
-            if not cl.isdisjoint(clnew) and vertex in clnew:
-                # print "reject ", clnew, vnew, " because of ", cl, vertex
-                return True
+        for v in clnew:
+            for i in self.__cliques_by_vertex.get(v, ()):
+                if not self.__cliques_finished[i][0].isdisjoint(clnew):
+                    # print "reject ", clnew, vnew, " because of ", cl, vertex
+                    return True
         if autoAdd:
+            i = len(self.__cliques_finished)
             self.__cliques_finished.append([set(clnew), vnew])
+            self.__cliques_by_vertex.setdefault(vnew, set()).add(i)
+            for v in clnew.union((vnew,)):
+                self.__cliques_touching.setdefault(v, set()).add(i)
         return False
 
-    def addReplay(self, bag, parent_bag_required=tuple(), weight=1.0):
-        assert (len(set(bag).intersection(parent_bag_required)) == 0)
-        assert (len(bag) == 1)  # required for next assert, not necessarily required in general tough
-        assert (len(set(parent_bag_required).intersection(b[0] for _, b, _ in self.__replay)) == 0)
+    def addReplay(self, bag, parent_bag_required=tuple(), weight=1.0, contraction=False, cover=None):
         if self.__replay is None:
             return
-        # print parent_bag_required, bag
-        # if parent_bag_required not in self.__replay:
-        #    self.__replay[parent_bag_required] = []
-        self.__replay.append((parent_bag_required, bag, weight))
+        # only O(|bag| + |parent|) checks by the vertex index of the log
+        assert (len(set(bag).intersection(parent_bag_required)) == 0)
+        assert (len(bag) == 1)  # required for next assert, not necessarily required in general tough
+        assert (not any(v in self.__replay for v in parent_bag_required))
+        self.__replay.append(parent_bag_required, bag, weight, contraction=contraction, cover=cover)
         return True
 
     ######[0]######
@@ -120,16 +281,15 @@ class FractionalHyperTreeDecomposition_Preprocessor:
             if dd <= d_up_to:
                 dl.append((n, ngbs, dd))
         # self.__hgp.remove_nodes_from(dl) #obsolete
-        pos = 0
+        removed = set()
         for n, ngbs, dd in dl:
-            del self.__hgp[n]
-            pos += 1
-            # self.addReplay(n, parent_bag_required=((ni for ni in nb if ni not in map(lambda x: x[0], dl[:pos])) for nb in ngbs))
+            self._delete(n)
+            removed.add(n)
             # print ngbs
             parent_bag = []
             for nb in ngbs.values():
                 # print nb
-                parent_bag.extend(ni for ni in nb if ni not in map(lambda x: x[0], dl[:pos]))
+                parent_bag.extend(ni for ni in nb if ni not in removed)
             if log_deg0_replay or dd > 1:  # otherwise does not make sense for fhtd
                 self.addReplay((n,), parent_bag_required=parent_bag, weight=1.0)
 
@@ -141,9 +301,12 @@ class FractionalHyperTreeDecomposition_Preprocessor:
     # only works savely, without increasing the fhtw, up to rank 2!
     # otherwise it might increase fhtw by at most one
     def almost_simplicial_hypergraph(self, contract_up_to_rank=2, clique_rank_at_least=3, edge_contr=False):
-        if self.__lb < 2 or not edge_contr:  # todo: implement pending operations that fire if lower bound is high enough
+        if not edge_contr:
             return False
+        # below lower bound 2 the candidates become pending operations
+        gated = self.__lb < 2
         edge_contr = []
+        edge_cands = set()
         for n, dd, _ in self.__hgp.hyper_degree_iter():
             if dd == 2:
                 adj = tuple(self.__hgp.hg.edge_rank(n))
@@ -153,7 +316,7 @@ class FractionalHyperTreeDecomposition_Preprocessor:
                 edge_cand = None
                 for (e, r) in adj:
                     #print(e,r)
-                    if r > contract_up_to_rank or e not in map(lambda x: x[0], edge_contr):
+                    if r > contract_up_to_rank or e not in edge_cands:
                         # either we have a small rank (or both adjacent vertice have and edge_cand to be contracted not set)
                         if r <= contract_up_to_rank and edge_cand is None:
                             edge_cand = e
@@ -169,10 +332,16 @@ class FractionalHyperTreeDecomposition_Preprocessor:
                             ngb_cand.update(e)
 
                             # ng_bcand.difference_update((n,))
-                if edge_cand is not None and ngb_edge is not None and not self.clique_finished(ngb_edge, n[0]):
+                if edge_cand is not None and ngb_edge is not None and \
+                        not self.clique_finished(ngb_edge, n[0], autoAdd=not gated):
                     # TODO: add weight function
                     # edge_contr.append((edge_cand, ngb_cand, ((edge_cand, 1.0), (ngb_edge, 1.0))))
                     edge_contr.append((edge_cand, n[1], ngb_cand, 1.0 + 1.0))
+                    edge_cands.add(edge_cand)
+        if gated:
+            for contr in edge_contr:
+                self.add_pending(2, contr[0][0])
+            return False
         self.contract(edge_contr)
 
         return len(edge_contr) > 0
@@ -180,13 +349,23 @@ class FractionalHyperTreeDecomposition_Preprocessor:
     def contract(self, edge_contr):
         # print edge_contr
         # print self.__hgp.hg.nodes(), self.__hgp.hg.edges(), edge_contr
+        self.__stats['contractions'] += len(edge_contr)
+        # union-find over the contracted vertices, the representative is the root
         repl = {}
 
         def respect_repl(v):
-            return v if v not in repl else repl[v]
+            root = v
+            while root in repl:
+                root = repl[root]
+            while v != root:
+                nxt = repl[v]
+                repl[v] = root
+                v = nxt
+            return root
 
         for (e, erepr, ngbs, w) in edge_contr:
             # print e, ngbs, w
+            erepr = respect_repl(erepr)
             ex = {respect_repl(v) for v in e}
             ngbs = {respect_repl(v) for v in ngbs}
             # new representative
@@ -198,14 +377,14 @@ class FractionalHyperTreeDecomposition_Preprocessor:
             ngbs.difference_update(contr)
             logging.debug("contracting {0}: {1}, {2}".format(e, self.__hgp.hg.nodes(), self.__hgp.hg.edges()))
             self.__hgp.hg.contract_edge(e, erepr)
+            self.__primal.contract(contr, erepr)
+            self._contracted(contr, erepr)
+            self.__covers.clear()
             logging.debug("post-contracting {0}: {1}, {2}".format(e, self.__hgp.hg.nodes(), self.__hgp.hg.edges()))
-            self.addReplay(tuple(contr), parent_bag_required=tuple(ngbs), weight=w)
+            self.addReplay(tuple(contr), parent_bag_required=tuple(ngbs), weight=w, contraction=True)
             self.update_finished_cliques(contr, erepr)
             # self.addReplay(e[1:], parent_bag_required=(e[0:1],))
             # print ngbs, e
-            for (k, v) in repl.items():
-                if v in contr:
-                    repl[k] = erepr
             for v in contr:
                 repl[v] = erepr
         # print self.__hgp.hg.nodes(), self.__hgp.hg.edges()
@@ -218,7 +397,7 @@ class FractionalHyperTreeDecomposition_Preprocessor:
         if max_clique:
             self.consider_lb(maxcl / 2.0)
         elif not self.__hgp.hg.isSubsumed(set(cl)):
-            self.consider_lb(self.__hgp.hg.fractional_cover(cl))
+            self.consider_lb(self.__covers.value(cl))
 
     ######[3]###### then maybe [2] again
     # simplicial vertices based on fhe cover, which is polynomial time computable
@@ -239,19 +418,19 @@ class FractionalHyperTreeDecomposition_Preprocessor:
                 dl.append((k, cl, maxcl / 2 if kmax <= 3 else 0))
         pos = 1
         for e, cl, fhec in dl:
+            cover = None
             if fhec == 0:  # kmax > 3
-                # TODO: weight function
-                fhec = self.__hgp.hg.fractional_cover(self.__hgp.neighbors(e, False))  # solution=sol)
+                fhec, cover = self.__covers.cover(self.__hgp.neighbors(e, False))  # solution=sol)
                 self.consider_lb(fhec)
             assert (fhec >= 1)
             cl = set(cl)
             # there could be double occurrences
             if e in self.__hgp.nodes():
-                del self.__hgp[e]
+                self._delete(e)
                 cl.remove(e)
                 assert (len(cl) >= 1)
                 cl.difference_update((e for e, _, _ in dl[:pos]))
-                self.addReplay((e,), parent_bag_required=cl, weight=fhec)  # TODO: weight function
+                self.addReplay((e,), parent_bag_required=cl, weight=fhec, cover=cover)
             # print edge_contr
             pos += 1
         return len(dl) > 0
@@ -260,6 +439,7 @@ class FractionalHyperTreeDecomposition_Preprocessor:
                                       edge_contr=False):
         assert (clique_prevent_he_up_to >= clique_prevent_he_at_least >= 3)
         edge_contr = [] if edge_contr else None
+        edge_cands = set()
         for (simpl, cl, (kmax, maxcl)) in self.__hgp.simplicial_iter(simplicial_diff, clique_prevent_he_at_least,
                                                                      clique_prevent_he_up_to):
             # print cl, kmax
@@ -267,11 +447,10 @@ class FractionalHyperTreeDecomposition_Preprocessor:
             self.update_lb(cl, maxcl, kmax == 3)
             for (k, s) in simpl:
                 # print "SIMPL, ", cl, k, s
-                fhec = self.__hgp.hg.fractional_cover(self.__hgp.neighbors(k, False))
+                fhec = self.__covers.value(self.__hgp.neighbors(k, False))
 
                 # print k,s,fhec
                 assert (0 < s <= simplicial_diff)
-                # todo: pending operations
                 if edge_contr is not None and self.__lb >= fhec + 1:
                     if 1 == s <= simplicial_diff:
                         # assert(self.__lb > 1)
@@ -284,12 +463,14 @@ class FractionalHyperTreeDecomposition_Preprocessor:
                         if not self.clique_finished(cl, contr[0]):
                             # print ngb, k, ngbs
                             # print ngb
-                            m = list(map(lambda x: x[0], edge_contr))
-                            if contr not in m and (contr[1], contr[0]) not in m:
+                            if contr not in edge_cands and (contr[1], contr[0]) not in edge_cands:
                                 edge_contr.append((contr, k, ngbs, fhec + 1))  # TODO: weight function
+                                edge_cands.add(contr)
                             # self.__hgp.hg.contract_edge([k, ngbs[0]])
                     else:
                         raise NotImplementedError()
+                elif edge_contr is not None and 1 == s:
+                    self.add_pending(fhec + 1, k)
                 self.consider_lb(fhec)
 
         # print "meat"
@@ -304,4 +485,39 @@ class FractionalHyperTreeDecomposition_Preprocessor:
 
     # do something with hyperedge circles?
 
-    # do something where we exploit (up to 13 nodes :P) that fhtw = max(fhtw(N[v]), fhtw(G-v)) where fruitful..
+    ######[SPLIT]######
+    # fhtw = max(fhtw(H[C u S]), fhtw(H - C)) if S = N(C) is a clique of the primal graph: every decomposition of H - C
+    # has a bag containing S, where the decomposition of the small side is glued (by replay).
+    # For a vertex v with small N[v], C are the vertices of N[v] whose neighbourhood stays within N[v] and S = N[v] - C.
+    # C is solved exactly (S eliminated afterwards), its bags are replayed, H - C remains.
+    def split_vertices(self, max_size=10):
+        if max_size <= 0 or self.__replay is None:
+            return False
+        g = self.__primal
+        done = False
+        for v in sorted(g.ngb, key=g.degree):
+            if v not in g or g.degree(v) + 1 > max_size:
+                continue
+            part = g.closed(v)
+            inner = 0
+            for u in g.members(part):
+                if g.ngb[u] & ~part == 0:
+                    inner |= g.bit(u)
+            sep = part & ~inner
+            # a single vertex is simplicial (handled above), no separator means part is the whole component
+            if inner & (inner - 1) == 0 or sep == 0 or not g.is_clique(sep):
+                continue
+            inner = g.members(inner)
+            adj = {u: set(g.members(g.ngb[u] & part)) for u in g.members(part)}
+            dp = FractionalHypertreeDecompositionDP(self.__hgp.hg, adj=adj, covers=self.__covers)
+            width, bags = dp.eliminate_first(inner)
+            logging.info("Split {0} off at clique separator {1}, width {2}".format(inner, g.members(sep), width))
+            self.consider_lb(width)
+            for u, bag, value in bags:
+                self._delete(u)
+                # the DP covered the bag by the shared cache already
+                self.addReplay((u,), parent_bag_required=tuple(w for w in bag if w != u), weight=value,
+                               cover=self.__covers.cover(bag)[1])
+            self.__stats['splits'] += 1
+            done = True
+        return done
@@ -0,0 +1,110 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+
+######[BITSETS]######
+# primal graph with neighbourhoods as bitsets (python ints), kept next to the primal view and updated on vertex
+# deletion and edge contraction. Bits are fixed when constructed, deleted vertices keep their (unused) bit.
+# Clique, simplicial and twin checks are word-parallel subset tests on the masks.
+class BitsetPrimalGraph(object):
+    def __init__(self, hypergraph):
+        self.vertices = list(hypergraph.nodes())
+        self.index = {v: i for i, v in enumerate(self.vertices)}
+        self.ngb = {v: 0 for v in self.vertices}
+        for vs in hypergraph.edges().values():
+            m = self.mask(vs)
+            for v in vs:
+                self.ngb[v] |= m
+        for v in self.vertices:
+            self.ngb[v] &= ~self.bit(v)
+
+    def __len__(self):
+        return len(self.ngb)
+
+    def __contains__(self, v):
+        return v in self.ngb
+
+    def bit(self, v):
+        return 1 << self.index[v]
+
+    def mask(self, vertices):
+        m = 0
+        for v in vertices:
+            m |= 1 << self.index[v]
+        return m
+
+    def members(self, mask):
+        ret = []
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            ret.append(self.vertices[low.bit_length() - 1])
+        return ret
+
+    def neighbours(self, v):
+        return self.ngb[v]
+
+    def closed(self, v):
+        return self.ngb[v] | self.bit(v)
+
+    def degree(self, v):
+        return bin(self.ngb[v]).count("1")
+
+    # every member is adjacent to all other members
+    def is_clique(self, mask):
+        rest = mask
+        while rest:
+            low = rest & -rest
+            rest ^= low
+            if mask & ~self.ngb[self.vertices[low.bit_length() - 1]] & ~low:
+                return False
+        return True
+
+    def is_simplicial(self, v):
+        return self.is_clique(self.ngb[v])
+
+    # vertices with the same closed neighbourhood, classes of size at least 2
+    def twin_classes(self):
+        groups = {}
+        for v in self.vertices:
+            if v in self.ngb:
+                groups.setdefault(self.closed(v), []).append(v)
+        return [vs for vs in groups.values() if len(vs) > 1]
+
+    # vertices unknown to the graph (added to the hypergraph later) are ignored
+    def remove(self, v):
+        if v not in self.ngb:
+            return
+        b = self.bit(v)
+        for u in self.members(self.ngb.pop(v)):
+            self.ngb[u] &= ~b
+
+    # vertices are merged into erepr
+    def contract(self, vertices, erepr):
+        if erepr not in self.ngb:
+            return
+        r = self.bit(erepr)
+        gone = 0
+        merged = self.ngb[erepr]
+        for v in vertices:
+            if v in self.ngb and v != erepr:
+                gone |= self.bit(v)
+                merged |= self.ngb.pop(v)
+        merged &= ~(gone | r)
+        self.ngb[erepr] = merged
+        for u in self.members(merged):
+            self.ngb[u] = (self.ngb[u] & ~gone) | r
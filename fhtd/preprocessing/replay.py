@@ -0,0 +1,134 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+from array import array
+
+from fhtd.heuristics.acyclic import decomposition_from_ordering
+from fhtd.heuristics.cover import FractionalCoverCache
+from fhtd.heuristics.orderings import primal_adjacency, elimination_bags
+from fhtd.preprocessing.twins import decomposition_ordering
+
+
+######[REPLAY LOG]######
+# columnar log of the reductions (parent_bag_required, bag, weight): bags and parents are flattened into arrays with
+# offsets, index maps every removed vertex to its entry. Entries are still (parent, bag, weight) tuples when iterated.
+# contractions counts the entries of edge contractions, their bags can not be replayed as an ordering.
+# covers keeps the edge weights of an entry ({edge id: weight}) if the reduction computed them, None otherwise.
+class ReplayLog(object):
+    def __init__(self):
+        self.bags = array('q')
+        self.bag_offsets = array('q', [0])
+        self.parents = array('q')
+        self.parent_offsets = array('q', [0])
+        self.weights = []
+        self.covers = []
+        self.index = {}
+        self.contractions = 0
+
+    def append(self, parent_bag_required, bag, weight, contraction=False, cover=None):
+        k = len(self.weights)
+        self.bags.extend(bag)
+        self.bag_offsets.append(len(self.bags))
+        self.parents.extend(parent_bag_required)
+        self.parent_offsets.append(len(self.parents))
+        self.weights.append(weight)
+        self.covers.append(cover)
+        self.contractions += int(contraction)
+        for v in bag:
+            self.index[v] = k
+
+    def __len__(self):
+        return len(self.weights)
+
+    def __contains__(self, v):
+        return v in self.index
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += len(self.weights)
+        return (tuple(self.parents[self.parent_offsets[k]:self.parent_offsets[k + 1]]),
+                tuple(self.bags[self.bag_offsets[k]:self.bag_offsets[k + 1]]), self.weights[k])
+
+    def __iter__(self):
+        for k in range(len(self.weights)):
+            yield self[k]
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def entry(self, v):
+        return self[self.index[v]]
+
+    def cover(self, v):
+        return self.covers[self.index[v]]
+
+    # removed vertices in the order of removal
+    def ordering(self):
+        return list(self.bags)
+
+
+######[REPLAY]######
+# every entry removed its bag when the parent was a clique of the remaining graph (simplicial, degree, split),
+# hence eliminating the logged vertices in the order of the log yields exactly the logged bags and leaves the
+# primal graph of the reduced hypergraph. The decomposition of the reduced hypergraph is turned into an ordering
+# (twins are expanded, see expand_twins) that is appended.
+# Only the bags that changed are covered again: logged bags keep the weights of the log, the bag of a vertex of ftd
+# keeps the weights of the node it is eliminated at if it did not grow (twins). Edge ids are the ones of the
+# unreduced hypergraph, whose edges are supersets, reused weights are checked to cover the bag nevertheless.
+# Not for logs with contractions: a contracted hyperedge covers its representative, the original one does not.
+# returns (width, decomposition of hypergraph)
+def replay_decomposition(hypergraph, ftd, log, classes=None, checker_epsilon=None, ghtd=False, covers=None):
+    assert (log.contractions == 0)
+    nodes = {}
+    ordering = decomposition_ordering(ftd, nodes=nodes)
+    if classes:
+        ordering = [w for v in ordering for w in classes.get(v, []) + [v]]
+    ordering = log.ordering() + ordering
+    # vertices that were dropped without entry (isolated ones) go first
+    seen = set(ordering)
+    ordering = [v for v in hypergraph.nodes() if v not in seen] + ordering
+    bags = elimination_bags(primal_adjacency(hypergraph), ordering)
+
+    edges = hypergraph.edges()
+    tolerance = 1 - (checker_epsilon or 0)
+
+    def is_cover(bag, cover):
+        if cover is None or any(e not in edges for e in cover) or (ghtd and any(w != 1 for w in cover.values())):
+            return False
+        return all(sum(w for e, w in cover.items() if v in edges[e]) >= tolerance for v in bag)
+
+    weights = {}
+    missing = []
+    for v in ordering:
+        if v in log:
+            cover = log.cover(v)
+        elif v in nodes and bags[v] <= set(ftd.chi[nodes[v]]):
+            cover = ftd.weights[nodes[v]]
+        else:
+            cover = None
+        if is_cover(bags[v], cover):
+            weights[v] = cover
+        else:
+            missing.append(v)
+    logging.info("Replay reuses {0} of {1} bag covers".format(len(ordering) - len(missing), len(ordering)))
+    if covers is None:
+        covers = FractionalCoverCache(hypergraph, ghtd=ghtd)
+    for v, (_, cover) in zip(missing, covers.covers(bags[v] for v in missing)):
+        weights[v] = cover
+    width = max([sum(w.values()) for w in weights.values()] + [0])
+    return width, decomposition_from_ordering(hypergraph, ordering, weights, checker_epsilon=checker_epsilon)
@@ -0,0 +1,123 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+from collections import Counter
+
+
+######[COLOUR REFINEMENT]######
+# 1-dimensional Weisfeiler-Lehman on the incidence graph (nodes ('v', vertex) and ('e', hyperedge)).
+# New colours are the ranks of the sorted signatures, hence canonical: refinements of two individualized copies can be
+# compared colour by colour.
+def colour_refinement(nbrs, colours):
+    k = len(set(colours.values()))
+    while True:
+        sigs = {x: (colours[x], tuple(sorted(colours[y] for y in nbrs[x]))) for x in nbrs}
+        ranks = {s: i for i, s in enumerate(sorted(set(sigs.values())))}
+        colours = {x: ranks[sigs[x]] for x in nbrs}
+        if len(ranks) == k:
+            return colours
+        k = len(ranks)
+
+
+def incidence_graph(hypergraph, fixed=()):
+    nbrs = {('v', v): [] for v in hypergraph.nodes()}
+    for e, vs in hypergraph.edges().items():
+        nbrs[('e', e)] = [('v', v) for v in vs]
+        for v in vs:
+            nbrs[('v', v)].append(('e', e))
+    # fixed vertices get colours of their own, they are mapped to themselves
+    colours = {x: 0 if x[0] == 'v' else 1 for x in nbrs}
+    for i, v in enumerate(sorted(fixed)):
+        colours[('v', v)] = 2 + i
+    return nbrs, colours
+
+
+def _individualize(nbrs, colours, x):
+    colours = dict(colours)
+    colours[x] = max(colours.values()) + 1
+    return colour_refinement(nbrs, colours)
+
+
+def _vertex_cells(colours):
+    cells = {}
+    for x, c in colours.items():
+        if x[0] == 'v':
+            cells.setdefault(c, []).append(x[1])
+    return cells
+
+
+# individualizes the smallest vertex of the first non-singleton cell until all vertices have colours of their own
+def _discrete(nbrs, colours):
+    while True:
+        cells = _vertex_cells(colours)
+        open_cells = [c for c in sorted(cells) if len(cells[c]) > 1]
+        if len(open_cells) == 0:
+            return {c: vs[0] for c, vs in cells.items()}
+        colours = _individualize(nbrs, colours, ('v', min(cells[open_cells[0]])))
+
+
+def is_automorphism(hypergraph, perm):
+    edges = Counter(frozenset(vs) for vs in hypergraph.edges().values())
+    return edges == Counter(frozenset(perm.get(v, v) for v in vs) for vs in hypergraph.edges().values())
+
+
+######[AUTOMORPHISMS]######
+# generators of (a subgroup of) the automorphisms of the hypergraph that fix the vertices in fixed pointwise.
+# For each cell of the stable colouring, its smallest vertex u and every vertex w outside the orbit of u found so far
+# are individualized and refined to discrete colourings; matching colours yields a candidate u -> w that is kept if it
+# maps hyperedges to hyperedges. Incomplete (no backtracking), but every returned permutation is an automorphism.
+# returns [{vertex: image}] (moved vertices only)
+def automorphism_generators(hypergraph, fixed=(), max_generators=20):
+    nbrs, colours = incidence_graph(hypergraph, fixed)
+    base = colour_refinement(nbrs, colours)
+    orbit = {v: v for v in hypergraph.nodes()}
+
+    def find(v):
+        while orbit[v] != v:
+            orbit[v] = orbit[orbit[v]]
+            v = orbit[v]
+        return v
+
+    generators = []
+    cells = _vertex_cells(base)
+    for c in sorted(cells):
+        cell = sorted(cells[c])
+        if len(cell) < 2:
+            continue
+        u, images_u = cell[0], None
+        for w in cell[1:]:
+            if find(w) == find(u):
+                continue
+            if images_u is None:
+                images_u = _discrete(nbrs, _individualize(nbrs, base, ('v', u)))
+            images_w = _discrete(nbrs, _individualize(nbrs, base, ('v', w)))
+            if set(images_u) != set(images_w):
+                continue
+            perm = {images_u[k]: images_w[k] for k in images_u if images_u[k] != images_w[k]}
+            if not is_automorphism(hypergraph, perm):
+                continue
+            generators.append(perm)
+            for a, b in perm.items():
+                orbit[find(a)] = find(b)
+            if len(generators) >= max_generators:
+                break
+        if len(generators) >= max_generators:
+            break
+    logging.info("Automorphism generators: {0} (orbits: {1})".format(
+        len(generators), len(set(find(v) for v in orbit))))
+    return generators
@@ -0,0 +1,86 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+
+from fhtd.heuristics.acyclic import decomposition_from_ordering
+from fhtd.heuristics.upper_bound import ordering_width
+
+
+######[TWIN QUOTIENT]######
+# vertices contained in exactly the same hyperedges are twins. Keeping one representative per class does not change
+# fhtw (nor ghtw): a twin can be added to every bag of its representative and is covered by the same weights.
+# Twins of the primal graph (or modules) that differ in their hyperedges are not collapsed, this is not safe for covers.
+# returns {representative: [removed twins]}, representative is the smallest vertex of its class
+def twin_classes(hypergraph):
+    classes = {}
+    for e, vs in hypergraph.edges().items():
+        for v in vs:
+            classes.setdefault(v, set()).add(e)
+    groups = {}
+    for v in sorted(classes):
+        groups.setdefault(frozenset(classes[v]), []).append(v)
+    return {vs[0]: vs[1:] for vs in groups.values() if len(vs) > 1}
+
+
+# removes the twins of each class from the hypergraph (primal view)
+def quotient_twins(hgp, classes):
+    for twins in classes.values():
+        for v in twins:
+            del hgp[v]
+    logging.info("Twin quotient removed {0} vertices ({1} classes)".format(sum(map(len, classes.values())),
+                                                                          len(classes)))
+
+
+# elimination ordering of a tree decomposition: peel leaves, eliminating the vertices that do not occur in the parent.
+# The bag of each vertex is a subset of the node it is eliminated at, hence the width does not increase.
+# nodes (if given) maps every vertex to the node it is eliminated at.
+def decomposition_ordering(ftd, nodes=None):
+    nbrs = {t: set() for t in ftd.chi}
+    for s, t in ftd.T.edges():
+        nbrs[s].add(t)
+        nbrs[t].add(s)
+    remaining = set(nbrs)
+    stack = [t for t in nbrs if len(nbrs[t]) <= 1]
+    ordering = []
+    eliminated = set()
+    while len(stack) > 0:
+        t = stack.pop()
+        if t not in remaining:
+            continue
+        remaining.discard(t)
+        keep = set()
+        for p in nbrs[t]:
+            keep.update(ftd.chi[p])
+            nbrs[p].discard(t)
+            if len(nbrs[p]) <= 1:
+                stack.append(p)
+        for v in sorted(set(ftd.chi[t]) - keep - eliminated):
+            ordering.append(v)
+            eliminated.add(v)
+            if nodes is not None:
+                nodes[v] = t
+    return ordering
+
+
+# decomposition of hypergraph (before the quotient) from a decomposition of the quotient: every twin is eliminated
+# right before its representative, its bag is the bag of the representative plus the twin
+# returns (width, decomposition)
+def expand_twins(hypergraph, ftd, classes, checker_epsilon=None, ghtd=False, covers=None):
+    ordering = [w for v in decomposition_ordering(ftd) for w in classes.get(v, []) + [v]]
+    width, weights = ordering_width(hypergraph, ordering, ghtd=ghtd, covers=covers)
+    return width, decomposition_from_ordering(hypergraph, ordering, weights, checker_epsilon=checker_epsilon)
@@ -24,10 +24,13 @@ import subprocess
 import tempfile
 import time
 from fractions import Fraction
+from math import floor
 # import htd_validate
 from io import StringIO
 from itertools import combinations
 
+import psutil
+
 # noinspection PyUnresolvedReferences
 from htd_validate.decompositions import FractionalHypertreeDecomposition
 
@@ -37,7 +40,7 @@ from lib.htd_validate.htd_validate.decompositions import FractionalHypertreeDeco
 # TODO: make more general so that we can call multiple solvers
 class FractionalHypertreeDecompositionCommandline(object):
     def __init__(self, hypergraph, wprecision=20, timeout=0, stream=None, checker_epsilon=None, ghtd=False,
-                 solver_bin=None, debug=False, odebug=None):
+                 solver_bin=None, debug=False, odebug=None, skip_edges=None):
         if stream is None:
             stream = StringIO()
         self._debug = debug
@@ -83,6 +86,11 @@ class FractionalHypertreeDecompositionCommandline(object):
         self.wprecision = wprecision
         self.stream.write('(set-logic QF_LRA)\n(set-option :print-success true)\n(set-option :produce-models true)\n')
         self.ghtd = ghtd
+        # dominated hyperedges (see fhtd.preprocessing.dominated_hyperedges) get no weight variables, their weight is 0
+        self.skip_edges = frozenset() if skip_edges is None else frozenset(skip_edges)
+        # solver process, see cancel
+        self._process = None
+        self._cancelled = False
 
     def prepare_vars(self, topsort=0, clique=None):
         n = self.hypergraph.number_of_nodes()
@@ -123,6 +131,8 @@ class FractionalHypertreeDecompositionCommandline(object):
 
         for j in range(1, n + 1):
             for ej in range(1, m + 1):
+                if ej in self.skip_edges:
+                    continue
                 # (declare-const weight_j_e Real)
                 self.weight[j][ej] = self.add_var(name='weight_%s_e%s' % (j, ej))
                 if self.ghtd:
@@ -212,6 +222,8 @@ class FractionalHypertreeDecompositionCommandline(object):
             weights = []
             for e in self.hypergraph.edges():
                 assert (e > 0)
+                if e in self.skip_edges:
+                    continue
                 C0.append(self.weight[j][e])
                 weights.append("weight_{j}_e{e}".format(j=j, e=e))
 
@@ -260,6 +272,9 @@ class FractionalHypertreeDecompositionCommandline(object):
         #             self.add_clause([-self.ord[i][j], self.arc[i][j]])
         #             self.add_clause([self.ord[i][j], self.arc[j][i]])
         for e in self.hypergraph.edges():
+            # a dominated edge adds no arcs beyond the ones of its dominating edge
+            if e in self.skip_edges:
+                continue
             # PRIMAL GRAPH CONSTRUCTION
             for i, j in combinations(self.hypergraph.get_edge(e), 2):
                 if i > j:
@@ -309,6 +324,8 @@ class FractionalHypertreeDecompositionCommandline(object):
                 weights = []
                 C = []
                 for e in self.hypergraph.incident_edges(j):
+                    if e in self.skip_edges:
+                        continue
                     logging.debug(" i=%s, j=%s, e=%s" % (i, j, e))
                     C.append(self.weight[i][e])
                     weights.append(f"weight_{i}_e{e}")
@@ -324,6 +341,8 @@ class FractionalHypertreeDecompositionCommandline(object):
                 weights = []
                 C = []
                 for e in self.hypergraph.incident_edges(i):
+                    if e in self.skip_edges:
+                        continue
                     logging.debug(" i=%s, j=%s, e=%s" % (i, j, e))
                     C.append(self.weight[i][e])
                     weights.append(f"weight_{i}_e{e}")
@@ -429,13 +448,65 @@ class FractionalHypertreeDecompositionCommandline(object):
                             #     self.add_clause([-self.ord[j][i]])
                             #     self.stream.write("(assert (-ord_{j}{i}))\n".format(i=i, j=j))
 
-    def encode(self, clique=None, topsort=0, twins=None):
+    # lex-leader constraints ord <=_lex ord o g for automorphisms g ({vertex: image}, see
+    # fhtd.preprocessing.automorphism_generators) that fix the clique and the twins pointwise, hence are compatible
+    # with break_clique and encode_twins. eq_* holds while the prefix is equal, at most budget clauses in total.
+    def break_symmetries(self, generators, budget=1000):
+        n = self.hypergraph.number_of_nodes()
+        for k, g in enumerate(generators):
+            eq = []
+            for i, j in ((i, j) for i in range(1, n + 1) for j in range(i + 1, n + 1)):
+                x, y = self.ord[i][j], self.ord[g.get(i, i)][g.get(j, j)]
+                if x == y:
+                    continue
+                if budget < 3:
+                    return
+                if x == -y:
+                    # the prefix can not stay equal
+                    self.add_clause(eq + [-x])
+                    budget -= 1
+                    break
+                self.add_clause(eq + [-x, y])
+                e = self.add_var(name=f'eq_{k}_{i}_{j}')
+                self.stream.write(f"(declare-const eq_{k}_{i}_{j} Bool)\n")
+                self.add_clause(eq + [-x, -y, e])
+                self.add_clause(eq + [x, y, e])
+                eq = [-e]
+                budget -= 3
+
+    # implied by an upper bound ub on the width: a bag is covered by weight at most ub on hyperedges of size at most
+    # rank, hence has at most ub * rank vertices, which bounds the out-degree in arc. Weights on hyperedges that do not
+    # meet the bag can be set to 0 without loss.
+    def implied_constraints(self, ubound):
+        n = self.hypergraph.number_of_nodes()
+        edges = [e for e in self.hypergraph.edges() if e not in self.skip_edges]
+        rank = max([len(self.hypergraph.get_edge(e)) for e in edges] + [0])
+        added = 0
+        k = floor(Fraction(ubound) * rank) - 1
+        if 0 <= k < n - 1:
+            for i in range(1, n + 1):
+                arcs = " ".join(f"(ite arc_{i}_{j} 1 0)" for j in range(1, n + 1) if i != j)
+                self.stream.write(f"(assert (<= (+ {arcs}) {k}))\n")
+                added += 1
+        for i in range(1, n + 1):
+            for e in edges:
+                vs = self.hypergraph.get_edge(e)
+                if i in vs:
+                    continue
+                self.stream.write(f"(assert (or {self.literal_list([self.arc[i][j] for j in vs])} "
+                                  f"(= weight_{i}_e{e} 0)))\n")
+                added += 1
+        logging.info(f"Implied constraints: {added} (bag size <= {k + 1})")
+
+    def encode(self, clique=None, topsort=0, twins=None, symmetries=None, symmetry_clauses=1000):
         n = self.hypergraph.number_of_nodes()
 
         self.elimination_ordering(n)
         self.cover(n)
         self.break_clique(clique=clique)
         self.encode_twins(twin_iter=twins, clique=clique, topsort=topsort)
+        if symmetries:
+            self.break_symmetries(symmetries, budget=symmetry_clauses)
         if topsort > 0:
             self.topsort(topsort=topsort)
 
@@ -513,7 +584,8 @@ class FractionalHypertreeDecompositionCommandline(object):
 
         return ordering
 
-    def solve(self, m=None, lbound=1, ubound=None, clique=None, topsort=0, twins=None):
+    def solve(self, m=None, lbound=1, ubound=None, clique=None, topsort=0, twins=None, symmetries=None,
+              symmetry_clauses=1000, implied=False):
         opt = False
         if not m:
             opt = True
@@ -525,7 +597,10 @@ class FractionalHypertreeDecompositionCommandline(object):
         self.configration()
 
         enc_wall = time.time()
-        self.encode(clique=clique, topsort=topsort, twins=twins)
+        self.encode(clique=clique, topsort=topsort, twins=twins, symmetries=symmetries,
+                    symmetry_clauses=symmetry_clauses)
+        if implied:
+            self.implied_constraints(ubound)
         enc_wall = time.time() - enc_wall
         logging.warning("Encoding time %s" % enc_wall)
 
@@ -557,14 +632,21 @@ class FractionalHypertreeDecompositionCommandline(object):
         else:
             raise NotImplementedError
 
+    @staticmethod
+    def smt_number(x):
+        # bounds might be rationals (e.g., from heuristics), which SMT-LIB writes as division
+        if isinstance(x, Fraction) and x.denominator != 1:
+            return f"(/ {x.numerator} {x.denominator})"
+        return f"{x.numerator}" if isinstance(x, Fraction) else f"{x}"
+
     def encode_opt(self, opt, lbound=None, ubound=None):
         if opt:
             self.stream.write("(assert (>= m 1))\n")
             self.stream.write("(minimize m)\n")
             if ubound:
-                self.stream.write(f"(assert (<= m {ubound}))\n")
+                self.stream.write(f"(assert (<= m {self.smt_number(ubound)}))\n")
             if lbound:
-                self.stream.write(f"(assert (>= m {lbound}))\n")
+                self.stream.write(f"(assert (>= m {self.smt_number(lbound)}))\n")
 
     def decode(self, output, is_z3, lbound, htd=False, repair=True):
         ret = {"objective": "nan", "decomposition": None, "arcs": None, "ord": None, "weights": None}
@@ -664,6 +746,9 @@ class FractionalHypertreeDecompositionCommandline(object):
             ret[i] = {}
             for e in self.hypergraph.edges():
                 assert (e > 0)
+                if e in self.skip_edges:
+                    ret[i][e] = 0
+                    continue
                 ret[i][e] = model["weight_{}_e{}".format(i, e)]
                 val = model[self.literal(self.weight[i][e])]
                 logging.debug(" Mod weight_{i}_e{j}={val}".format(i=i, j=e, val=val))
@@ -721,6 +806,20 @@ class FractionalHypertreeDecompositionCommandline(object):
 
         return ret
 
+    # kills the solver (from another thread), solve raises a RuntimeError then
+    def cancel(self):
+        self._cancelled = True
+        process = self._process
+        if process is None or process.poll() is not None:
+            return
+        try:
+            # MathSAT runs in a shell
+            for child in psutil.Process(process.pid).children(recursive=True):
+                child.kill()
+            process.kill()
+        except (psutil.NoSuchProcess, OSError):
+            pass
+
     def run_solver(self, inp_stream, modelf, errorf, lbound, odebug=None):
         if self._debug:
             with open('myfile.txt', 'w') as myf:
@@ -744,7 +843,14 @@ class FractionalHypertreeDecompositionCommandline(object):
             logging.error(f"Unknown solver {solver_name}")
             raise RuntimeError
 
+        self._process = p1
+        if self._cancelled:
+            self.cancel()
         p1.communicate(input=inp_stream.getvalue().encode())
+        self._process = None
+        if self._cancelled:
+            logging.info("Solver cancelled")
+            raise RuntimeError("Solver cancelled")
         if p1.returncode != 0:
             logging.error("Solver-Process terminated with returncode {}".format(p1.returncode))
             raise RuntimeError
@@ -0,0 +1 @@
+from fhtd.tw_sat.twsolver import GraphSatTw, primal_graph, treewidth_bounds
@@ -13,245 +13,215 @@
 # details.  You should have received a copy of the GNU General Public
 # License along with vc_clasp.py.  If not, see
 # <http://www.gnu.org/licenses/>.
-import argparse
-import clingo
-import fileinput
 import logging
-from copy import deepcopy
-from itertools import izip, ifilter
-from operator import neg
-
-import networkx as nx
-import numpy as np
-import os
-import sys
 import time
+from itertools import combinations
 
-from os.path import dirname
+import networkx as nx
+from networkx.algorithms.approximation import treewidth_min_degree
 
-# from preprocessing import simplify
 
+# primal graph of a hypergraph, vertices relabeled to 1..n
+def primal_graph(hypergraph):
+    G = nx.Graph()
+    G.add_nodes_from(hypergraph.nodes())
+    for vs in hypergraph.edges().values():
+        G.add_edges_from(combinations(vs, 2))
+    return nx.convert_node_labels_to_integers(G, first_label=1)
 
 
+# SAT encoding of treewidth (Samer and Veith): tw(G) <= m iff there is an ordering (ord) whose triangulation (arc)
+# has out-degree at most m. Clauses are added to clingo by its backend, variables are free choices. The cardinality
+# constraints of each bound m are guarded by an assumption, hence bounds can be tried incrementally (see treewidth).
 class GraphSatTw(object):
-    def __init__(self, G, ubound = -1, timeout=0, stream=sys.stdout):
+    def __init__(self, G, ubound=-1, timeout=0):
+        # clingo is optional (see environment_full.yml)
+        import clingo
         self.G = G
-        # self.ctl = clingo.Control()
-        # self.backend = self.ctl.backend
-        self.num_vars = 1
+        self.ctl = clingo.Control()
+        self.num_vars = 0
         self.num_cls = 0
         self.timeout = timeout
         self.ord = None
         self.arc = None
         self.cards = []
         self.ubound = ubound
-        self.stream = stream
+        self.clauses = []
+        self.atoms = None
+        self.cancelled = False
 
         self.prepare_vars()
-        # self.configration()
+        self.configration()
 
-    # store and access is slightly faster
-    # def my_ord(i,j,offset=0):
-    #    return (n*(n-1)/2) - ((n-i)*((n-i)+1)/2) + (j-i)
+    # ord[i][j] for i < j, i is eliminated before j
+    def o(self, i, j):
+        return self.ord[i][j] if i < j else -self.ord[j][i]
 
     def prepare_vars(self):
         n = self.G.number_of_nodes()
 
-        self.ord = np.zeros((n + 1, n + 1), dtype=int)
+        self.ord = [[None for j in range(n + 1)] for i in range(n + 1)]
         # ordering
-        for i in xrange(1, n + 1):
-            for j in xrange(i + 1, n + 1):
+        for i in range(1, n + 1):
+            for j in range(i + 1, n + 1):
                 self.ord[i][j] = self.add_var()
 
         # arcs
-        self.arc = np.zeros((n + 1, n + 1), dtype=int)
-        for i in xrange(1, n + 1):
-            for j in xrange(1, n + 1):
+        self.arc = [[None for j in range(n + 1)] for i in range(n + 1)]
+        for i in range(1, n + 1):
+            for j in range(1, n + 1):
                 self.arc[i][j] = self.add_var()
 
         # cards
-        for i in self.G.nodes_iter():
-            C = set()
-            for j in xrange(1, n + 1):
-                C.add(self.arc[i][j])
-            self.add_cards(list(C))
+        for i in self.G.nodes():
+            self.add_cards([self.arc[i][j] for j in range(1, n + 1)])
 
     def add_var(self):
-        # self.num_vars = self.backend.add_atom()
-        self.num_vars+=1
-        return self.num_vars-1
+        self.num_vars += 1
+        return self.num_vars
 
     def add_clause(self, C):
-        # C = map(neg, C)
-        # self.backend.add_rule(head=[], body=C, choice=False)
-        self.stream.write("%s 0\n" %" ".join(list(map(str,C))))
+        self.clauses.append(list(C))
         self.num_cls += 1
 
     def add_cards(self, C):
         self.cards.append(C)
 
-    def add_at_most(self, C, m):
-        # self.backend.add_weight_rule(head=[], lower=m + 1, body=[(x, 1) for x in C], choice=False)
-        self.stream.write("%s <= %i 0\n" % (" ".join(list(map(lambda x: str(int(x)),C)),m)))
-
     def add_bin_at_most_(self, C, curr, k, pos):
         # subset complete cls
         if k == 0:
             self.add_clause(curr)
+            return
         # end
         if pos == len(C):
             return
         # add vars
-        for i in xrange(pos, len(C)):
+        for i in range(pos, len(C)):
             curr.append(-C[i])
             self.add_bin_at_most_(C, curr, k - 1, i + 1)
-            curr.pop()  # len(curr)-1)
+            curr.pop()
 
     def add_bin_at_most(self, C, k):
         self.add_bin_at_most_(C, [], k + 1, 0)
 
     # Sinz encoding
     def add_seq_at_most(self, C, k):
-        old_num_vars = self.num_vars
         n = len(C)
-        # TODO: crappy fix due to index error
-        C.insert(0, 0)
-        R = np.zeros((n + 1, k + 1), dtype=int)
-        for i in xrange(1, n + 1):
-            for j in xrange(1, k + 1):
+        C = [0] + list(C)
+        R = [[None for j in range(k + 1)] for i in range(n + 1)]
+        for i in range(1, n + 1):
+            for j in range(1, k + 1):
                 R[i][j] = self.add_var()
 
-        self.add_choice(range(old_num_vars + 1, self.num_vars + 1))
-
-        for i in xrange(1, n):
+        for i in range(1, n):
             self.add_clause([-C[i], R[i][1]])
 
         # eqn 2
-        for j in xrange(2, k + 1):
+        for j in range(2, k + 1):
             self.add_clause([-R[1][j]])
 
         # eqn 3
-        for i in xrange(2, n):
-            for j in xrange(1, k + 1):
+        for i in range(2, n):
+            for j in range(1, k + 1):
                 self.add_clause([-R[i - 1][j], R[i][j]])
 
         # eqn 4
-        for i in xrange(2, n):
-            for j in xrange(2, k + 1):
+        for i in range(2, n):
+            for j in range(2, k + 1):
                 self.add_clause([-C[i], -R[i - 1][j - 1], R[i][j]])
 
         # eqn 5
-        for i in xrange(2, n + 1):
+        for i in range(2, n + 1):
             self.add_clause([-C[i], -R[i - 1][k]])
 
-        # TODO: see above index error
-        C.pop(0)
-
-        ##mark aux vars
-        ##for i in xrange(1, len(C)+1):
-        ##   for j in xrange(1, k+1):
-        ##       mark_aux(R[i][j])
-
-    # prepare variables
+    # clauses (and variables) collected so far are passed to clingo
+    def flush(self):
+        with self.ctl.backend() as backend:
+            if self.atoms is None:
+                self.atoms = [None]
+            new = [backend.add_atom() for _ in range(len(self.atoms), self.num_vars + 1)]
+            if len(new) > 0:
+                backend.add_rule(new, choice=True)
+            self.atoms.extend(new)
+            for C in self.clauses:
+                backend.add_rule([], [-self.atoms[x] if x > 0 else self.atoms[-x] for x in C])
+        self.clauses = []
+
+    # at most m arcs per vertex, guarded by the returned assumption literal
     def add_all_at_most(self, m):
-        for C in self.cards:
-            # self.add_at_most(C, m)
-            self.add_seq_at_most(C,m)
-            # add_bin_at_most(C,m)
-
-    def add_at_least(self, m):
-        for card in izip(self.cards, xrange(len(self.cards))):
-            at = self.backend.add_atom()
-            # print card, m
-            self.backend.add_weight_rule(head=[at], lower=m, body=[(x, 1) for x in card[0]], choice=False)
-            # backend.add_rule(head=[], body=[-at],choice=False)
-
-    def add_choice(self, ats):
-        return
-        for a in ats:
-            self.backend.add_rule(head=[a], body=[], choice=True)
+        self.flush()
+        with self.ctl.backend() as backend:
+            act = backend.add_atom()
+            backend.add_rule([act], choice=True)
+            for C in self.cards:
+                over = backend.add_atom()
+                backend.add_weight_rule([over], m + 1, [(self.atoms[x], 1) for x in C])
+                backend.add_rule([], [over, act])
+        return act
 
     def improved(self, n):
         # the order has to be transitive (3)
-        # ADD CLAUSES
-        # transitive
-        for i in xrange(1, n + 1):
-            for j in xrange(1, n + 1):
+        for i in range(1, n + 1):
+            for j in range(1, n + 1):
                 if i == j:
                     continue
-                for l in xrange(1, n + 1):
+                for l in range(1, n + 1):
                     if i == l or j == l:
                         continue
-                    C = []
-                    C.append(-self.ord[i][j] if i < j else self.ord[j][i])
-                    C.append(-self.ord[j][l] if j < l else self.ord[l][j])
-                    C.append(self.ord[i][l] if i < l else -self.ord[l][i])
-                    self.add_clause(C)
+                    self.add_clause([-self.o(i, j), -self.o(j, l), self.o(i, l)])
 
-        # edges
         # edges uv in E have to be in the triangluation (4)
         for i, j in self.G.edges():
-            if i < j:
-                # improved version
-                # add_clause([-self.ord[i][j], self.arc[i][j]])
-                self.add_clause([self.ord[i][j], self.arc[j][i]])
+            if i > j:
+                i, j = j, i
+            self.add_clause([self.ord[i][j], self.arc[j][i]])
 
         # if u and v have a common predecessor then the graph contains the edge {u,v} (5)
-        for i in xrange(1, n + 1):
-            for j in xrange(1, n + 1):
+        for i in range(1, n + 1):
+            for j in range(1, n + 1):
                 if i == j:
                     continue
-                for k in xrange(1, n + 1):
+                for k in range(1, n + 1):
                     if i == k or j == k:
                         continue
                     self.add_clause([-self.arc[k][i], -self.arc[k][j], self.arc[i][j], self.arc[j][i]])
 
         # uv \in E_T, choice of (u,v) or (v,u) depends on ord (6)
-        for i in xrange(1, n + 1):
-            for j in xrange(1, n + 1):
-                if i == j:
-                    continue
-                if i < j:
-                    self.add_clause([-self.ord[i][j], -self.arc[j][i]])
-                else:
-                    self.add_clause([self.ord[j][i], -self.arc[j][i]])
+        for i in range(1, n + 1):
+            for j in range(1, n + 1):
+                if i != j:
+                    self.add_clause([-self.o(i, j), -self.arc[j][i]])
 
         # domain specific redundant clauses (7)
-        for i in xrange(1, n + 1):
-            for j in xrange(1, n + 1):
-                if i == j:
-                    continue
-                self.add_clause([-self.arc[j][i], -self.arc[i][j]])
+        for i in range(1, n + 1):
+            for j in range(1, n + 1):
+                if i != j:
+                    self.add_clause([-self.arc[j][i], -self.arc[i][j]])
 
     def sv(self, n):
         logging.info('Ordering')
-        for i in xrange(1, n + 1):
-            for j in xrange(1, n + 1):
+        for i in range(1, n + 1):
+            for j in range(1, n + 1):
                 if i == j:
                     continue
-                for l in xrange(1, n + 1):
+                for l in range(1, n + 1):
                     if i == l or j == l:
                         continue
-                    C = []
-                    C.append(-self.ord[i][j] if i < j else self.ord[j][i])
-                    C.append(-self.ord[j][l] if j < l else self.ord[l][j])
-                    C.append(self.ord[i][l] if i < l else -self.ord[l][i])
-                    self.add_clause(C)
+                    self.add_clause([-self.o(i, j), -self.o(j, l), self.o(i, l)])
 
         logging.info('Edges')
         for i, j in self.G.edges():
-            print(i,j)
-            if i < j:
-                print("i=", i, "j=", j)
-                self.add_clause([-self.ord[i][j], self.arc[i][j]])
-                self.add_clause([self.ord[i][j], self.arc[j][i]])
+            if i > j:
+                i, j = j, i
+            self.add_clause([-self.ord[i][j], self.arc[i][j]])
+            self.add_clause([self.ord[i][j], self.arc[j][i]])
 
         logging.info('Edges Elimintation')
-        for i in xrange(1, n + 1):
-            for j in xrange(1, n + 1):
+        for i in range(1, n + 1):
+            for j in range(1, n + 1):
                 if i == j:
                     continue
-                for l in xrange(j + 1, n + 1):
+                for l in range(j + 1, n + 1):
                     if i == l:
                         continue
                     self.add_clause([-self.arc[i][j], -self.arc[i][l], -self.ord[j][l], self.arc[j][l]])
@@ -261,56 +231,35 @@ class GraphSatTw(object):
 
         logging.info('Forbid Self Loops')
         # forbid self loops
-        for i in xrange(1, n + 1):
+        for i in range(1, n + 1):
             self.add_clause([-self.arc[i][i]])
 
     def break_clique(self, clique):
-        if clique:
-            for i in self.G.nodes_iter():
-                if i in clique:
-                    continue
-                for j in clique:
-                    if (i < j):
-                        self.add_clause([self.ord[i][j]])
-                    else:
-                        self.add_clause([-self.ord[j][i]])
+        # vertices not in the clique are eliminated before the clique
+        for i in self.G.nodes():
+            if i in clique:
+                continue
+            for j in clique:
+                self.add_clause([self.o(i, j)])
 
         # vertices of the clique are order lexicographically
         for i in clique:
             for j in clique:
                 if i < j:
-                    if i < j:
-                        self.add_clause([self.ord[i][j]])
-                    else:
-                        self.add_clause(-self.ord[j][i])
+                    self.add_clause([self.ord[i][j]])
 
     def encode(self):
         n = self.G.number_of_nodes()
         self.sv(n)
 
-        # encode clique
-        # TODO: set timeout
-        # from networkx.algorithms import approximation
-        # clique = approximation.max_clique(G)
-
-        try:
-            clique = next(nx.find_cliques(self.G))
-            print('clique', clique)
-            self.break_clique(clique)
-        except StopIteration:
-            print('no clique')
-            pass
-
-        # for clique in nx.find_cliques(G):
-        # TODO: twin decomposition
-        self.add_choice(range(1, self.num_vars + 1))
+        # some maximal clique is eliminated last
+        clique = next(nx.find_cliques(self.G), [])
+        logging.debug('clique %s' % clique)
+        self.break_clique(clique)
+        self.flush()
 
     def configration(self):
-        # print ctl.configuration.solver.keys, ctl.configuration.keys, ctl.configuration.solve.keys, ctl.configuration.asp.trans_ext
-        # self.ctl.configuration.asp.trans_ext = 'weight'
-        # self.ctl.configuration.solver.acyc_prop
         self.ctl.configuration.asp.trans_ext = 'all'
-
         self.ctl.configuration.configuration = 'trendy'  # 23
         # self.ctl.configuration.configuration='handy' #48
         # self.ctl.configuration.configuration='crafty' #39
@@ -318,142 +267,72 @@ class GraphSatTw(object):
         # self.ctl.configuration.configuration='frumpy' #39
         # self.ctl.configuration.configuration='tweety' #38
 
-    def solve(self, m):
-        self.encode()
-        self.add_all_at_most(m)
-        print('m=%s, timeout=%s' % (m, self.timeout))
-        # f = self.ctl.solve_async()  # on_model, on_finish)
-        # done = f.wait(self.timeout)
-        # if not done:
-        #     return None
-        # return f.get().satisfiable
-
-    # print G.number_of_nodes(), G.number_of_edges()
-    # G=contract(G,5)
-    # print G.number_of_nodes(), G.number_of_edges()
-
+    # tw(G) <= m? None on timeout (timeout 0 ... no limit)
+    def solve(self, m, timeout=None):
+        if self.atoms is None:
+            self.encode()
+        timeout = self.timeout if timeout is None else timeout
+        act = self.add_all_at_most(m)
+        with self.ctl.solve(assumptions=[act], async_=True) as handle:
+            done = handle.wait(timeout) if timeout > 0 else handle.wait()
+            if not done:
+                handle.cancel()
+                return None
+            return handle.get().satisfiable
+
+    # stops treewidth (from another thread), the bounds found so far are returned
+    def cancel(self):
+        self.cancelled = True
+        self.ctl.interrupt()
 
     def contract(self, G, c):
         # Contract edges uv as long as d(u)+d(v)\leq c.
         while True:
-            try:
-                u, v = next(ifilter(lambda x: x[0] != x[1] and G.degree(x[0]) + G.degree(x[1]) <= c, G.edges_iter()))
-                G = nx.contracted_edge(G, (u, v), self_loops=False)
-            except StopIteration:
+            e = next((x for x in G.edges() if x[0] != x[1] and G.degree(x[0]) + G.degree(x[1]) <= c), None)
+            if e is None:
                 break
+            G = nx.contracted_edge(G, e, self_loops=False)
         return G
 
-    def minor_lbound(self, c, k):
-        # Assume we believe that tw(G)> k since we hit a timeout for k.
+    # tw(G) > k, as the minor obtained by contracting edges uv with d(u)+d(v) <= c has no ordering of width k
+    # (True, False, None on timeout). For c=4 this is just the preprocessing rule for degree 1 and degree 2 vertices.
+    def minor_lbound(self, c, k, timeout=None):
         G = nx.convert_node_labels_to_integers(self.contract(self.G.copy(), c), first_label=1)
-
-        # Then check for unsatisfiability; if it is unsatisfiable,
-        lbound_solver = GraphSatTw(G)
-        return lbound_solver.solve(k)
-        # solve()
-
-        # then we have confirmed tw(G)> k as by contraction of edges we obtained a minor of G.
-
-        # For c=4 this is just the preprocessing rule for degree 1 and degree 2 vertices.
-        # It would be interesting to check the behaviour for, say, c=5 and c=6.
-
-    def minor_lbound_num(self, k, timeout, l=1):
-        for u, v in self.G.edges_iter():
-            G1 = nx.convert_node_labels_to_integers(nx.contracted_edge(self.G, (u, v), self_loops=False))
-            # sanity check
-            # G1 = self.G.copy()
-            lbound_solver = GraphSatTw(G1, timeout=timeout)
-
-            print('u = %s, v = %s' % (u, v))
-            ret = lbound_solver.solve(k)
-            print('ret = %s' % ret)
-            if not ret:
-                return False
-
-        return True
-
-    def subgraph_lbound(self, k):
-        for n in self.G.nodes_iter():
-            G1 = self.G.copy()
-            G1.remove_node(n)
-            G1 = nx.convert_node_labels_to_integers(G1, first_label=1)
-            # print G1.edges()
-            lbound_solver = GraphSatTw(G1)
-            res = lbound_solver.solve(k)
-            print('node=%s, bound=%s, res=%s' % (n, k, res))
-
-    def extract_assignment(self,assignment):
-        pass
-
-    #TODO: static?
-    def set_assignment(self,assignment):
-        def on_model(model):
-            # print model.contains(clingo.Function("volatile", [9])).lower()
-
-            for x in model.symbols(atoms=True):
-                print('yyy')
-            print('model000=', str(model))
-            print('model=', dir(model))
-            print('cost=', model.cost)
-            assignment[0] = True
-            # assignment[0] = deepcopy(model)
-            #TODO: does not show any results here
-            print('symbols=', model.symbols(atoms=True,terms=True,shown=True,csp=True,extra=True))
-        return on_model
-
-
-    @property
-    def treewidth(self):
-        start = time.time()
-        print('encode')
-        self.encode()
-        elapsed = time.time() - start
-        print('encode finished')
-        print('encoding time = %s' % elapsed)
-        # timeout = self.timeout
-        timeout = 0
-
-        assignment = [None]
-        for m in xrange(self.ubound, 0, -1):
-            timeout = np.ceil(timeout)
-            start = time.time()
-            print('=' * 80)
-            print('m=%s, timeout=%s' % (m, timeout))
-            self.add_all_at_most(m)
-            # print 'signatures', self.ctl.symbolic_atoms.signatures
-
-            future = self.ctl.solve_async(on_model=self.set_assignment(assignment))  # on_model, on_finish)
-            print('assignment=', assignment)
-            done = future.wait(timeout)
-            diff = time.time() - start
-            if timeout != 0 and not done:
-                future.cancel()
-                if timeout < diff:
-                    timeout = timeout / 0.97
-
-                #print '-' * 20, 'minor', '-' * 20
-                # TODO:
-                # self.minor_lbound(6, m)
-                res = self.minor_lbound_num(m, timeout)
-                if not res is None and res == False:
-                    print('solution found=%i' % (m + 1))
-                    return m + 1
-
-                    # self.subgraph_lbound(m)
-                    # print 'solve=', self.solve(5)
-            if timeout == 0:
-                timeout = diff
-            if timeout < diff:
-                timeout = timeout / 0.97
-
-            print(future.get().satisfiable)
-            if not future.get().satisfiable:
-                print('solution found=',)
-                print(m + 1)
-                return m + 1
-            else:
-                print('assignment=', assignment)
-                pass
-                # assignment = self.extract_assignment()
+        if G.number_of_nodes() <= k + 1:
+            return False
+        ret = GraphSatTw(G).solve(k, timeout=self.timeout if timeout is None else timeout)
+        return None if ret is None else not ret
+
+    # (lower, upper) bound on tw(G): degeneracy and min-degree heuristic, then bound descent until the time is up.
+    # A timeout on bound m is followed by a minor check of the same bound.
+    def treewidth(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        if self.G.number_of_nodes() <= 1:
+            return 0, 0
+        lower = max(nx.core_number(self.G).values())
+        upper = treewidth_min_degree(self.G)[0]
+        if 0 <= self.ubound < upper:
+            upper = self.ubound
+        for m in range(upper - 1, lower - 1, -1):
+            remaining = deadline - time.time()
+            if remaining <= 0 or self.cancelled:
+                break
+            res = self.solve(m, timeout=remaining)
+            logging.info("tw <= {0}: {1}".format(m, res))
+            if res is None and self.cancelled:
+                break
+            if res is None:
+                if self.minor_lbound(max(4, m), m, timeout=max(1, deadline - time.time())):
+                    lower = m + 1
+                break
+            if not res:
+                lower = m + 1
+                break
+            upper = m
+        return lower, upper
 
 
+# (lower, upper) bound on the treewidth of the primal graph within timeout seconds
+def treewidth_bounds(hypergraph, timeout=10):
+    return GraphSatTw(primal_graph(hypergraph), timeout=timeout).treewidth()
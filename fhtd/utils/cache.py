@@ -0,0 +1,96 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+
+# bump whenever the layout of the cached objects changes
+CACHE_VERSION = 1
+
+
+######[CACHE]######
+# on-disk cache of preprocessing results, one pickle per (instance hash, parameters).
+# Writes go to a temporary file in the same directory that is renamed (atomic), loading touches the file, eviction
+# removes the least recently used files until the directory is below max_bytes.
+class PreprocessingCache(object):
+    def __init__(self, directory, instance_hash, max_bytes=1 << 30):
+        self.directory = os.path.expanduser(directory)
+        self.instance_hash = instance_hash
+        self.max_bytes = max_bytes
+
+    def path(self, params):
+        key = json.dumps([CACHE_VERSION, self.instance_hash, sorted(params.items())], default=str)
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.pkl')
+
+    def load(self, params):
+        path = self.path(params)
+        try:
+            with open(path, 'rb') as f:
+                obj = pickle.load(f)
+        except (IOError, OSError):
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            logging.warning("Ignoring broken cache file {0} ({1}).".format(path, e))
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        logging.info("Loaded preprocessing results from cache {0}".format(path))
+        return obj
+
+    def store(self, params, obj):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        path = self.path(params)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp', suffix='.pkl')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except (pickle.PicklingError, TypeError, AttributeError, IOError, OSError) as e:
+            logging.warning("Could not write cache file {0} ({1}).".format(path, e))
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+        self.evict()
+        return True
+
+    def evict(self):
+        files = []
+        for p in glob.glob(os.path.join(self.directory, '*.pkl')):
+            try:
+                files.append((os.path.getmtime(p), os.path.getsize(p), p))
+            except OSError:
+                pass
+        total = sum(size for _, size, _ in files)
+        for _, size, p in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(p)
+                total -= size
+                logging.info("Evicted cache file {0}".format(p))
+            except OSError:
+                pass
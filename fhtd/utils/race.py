@@ -0,0 +1,137 @@
+#!/usr/bin/env false
+#
+# Copyright 2018, 2019, 2020
+#
+# fhtd is free software: you can redistribute it
+# and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+# fhtd is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.  You should have received a
+# copy of the GNU General Public License along with
+# fhtd.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+
+
+class _Engine(object):
+    def __init__(self, name, compute, cancel, race):
+        self.name = name
+        self.cancel = cancel
+        self.result = None
+        self.error = None
+        self.done = False
+        self.wall = None
+        self.__compute = compute
+        self.__race = race
+        self.thread = threading.Thread(target=self.__run, name=name, daemon=True)
+
+    def __run(self):
+        start = time.time()
+        try:
+            self.result = self.__compute()
+        except Exception as e:
+            # re-raised by BoundRace.result in the coordinating thread
+            self.error = e
+        finally:
+            self.wall = time.time() - start
+            self.__race.finished(self)
+
+
+######[RACE]######
+# bounds of one component shared by engines that run in worker threads (the exact solvers run as separate processes
+# or in clingo and the cover LPs are short, so the threads mostly do not compete for the GIL).
+# Lower bound engines report by raise_lb, upper bound engines by lower_ub; the bounds meet as soon as
+# lb * (1 + gap) >= ub, engines poll stopped() and wait returns. cancel() stops all engines that are still running,
+# engines without cancel function have to poll stopped() or are abandoned (daemon threads).
+class BoundRace(object):
+    def __init__(self, lb=0, ub=None, gap=0):
+        self.lb = lb
+        self.ub = ub
+        self.gap = gap
+        self.__engines = {}
+        self.__changed = threading.Condition()
+        self.__cancelled = threading.Event()
+
+    def met(self):
+        return self.ub is not None and self.lb * (1 + self.gap) >= self.ub
+
+    def stopped(self):
+        return self.__cancelled.is_set() or self.met()
+
+    # returns whether the bounds met, i.e., the reporting engine can stop
+    def raise_lb(self, bound):
+        with self.__changed:
+            if bound > self.lb:
+                logging.info("Race: lower bound {0} (upper bound {1})".format(bound, self.ub))
+                self.lb = bound
+                self.__changed.notify_all()
+        return self.met()
+
+    def lower_ub(self, bound):
+        with self.__changed:
+            if self.ub is None or bound < self.ub:
+                logging.info("Race: upper bound {0} (lower bound {1})".format(bound, self.lb))
+                self.ub = bound
+                self.__changed.notify_all()
+        return self.met()
+
+    def start(self, name, compute, cancel=None):
+        engine = _Engine(name, compute, cancel, self)
+        self.__engines[name] = engine
+        engine.thread.start()
+        return engine
+
+    def finished(self, engine):
+        with self.__changed:
+            engine.done = True
+            self.__changed.notify_all()
+
+    # blocks until the bounds meet or the engine until (all engines if None) has finished, timeout in seconds
+    # returns whether the bounds met
+    def wait(self, until=None, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        engines = list(self.__engines.values()) if until is None else [self.__engines[until]]
+        with self.__changed:
+            while not self.met() and not all(e.done for e in engines):
+                remaining = 1 if deadline is None else min(1, deadline - time.time())
+                if remaining <= 0:
+                    break
+                # short waits, signals (timeouts of the whole run) are handled by the main thread
+                self.__changed.wait(remaining)
+        return self.met()
+
+    def cancel(self, timeout=10):
+        self.__cancelled.set()
+        running = [e for e in self.__engines.values() if not e.done]
+        for e in running:
+            if e.cancel is not None:
+                logging.info("Race: cancelling {0}".format(e.name))
+                e.cancel()
+        deadline = time.time() + timeout
+        for e in running:
+            e.thread.join(max(0, deadline - time.time()))
+            if not e.done:
+                logging.warning("Race: abandoning {0}".format(e.name))
+
+    def done(self, name):
+        engine = self.__engines.get(name)
+        return engine is not None and engine.done and engine.error is None
+
+    # result of a finished engine (None while it is running), errors of the engine are raised here
+    def result(self, name):
+        engine = self.__engines[name]
+        if engine.error is not None:
+            raise engine.error
+        return engine.result
+
+    @property
+    def stats(self):
+        return {'lb': float(self.lb), 'ub': None if self.ub is None else float(self.ub), 'met': self.met(),
+                'engines': {e.name: e.wall for e in self.__engines.values()}}
@@ -0,0 +1,89 @@
+#!/usr/bin/env false
+from __future__ import absolute_import
+
+import os
+import sys
+import inspect
+from io import StringIO
+
+
+# TODO: fixme
+src_path = os.path.abspath(os.path.realpath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.realpath(os.path.join(src_path, '../../..')))
+
+src_path = os.path.realpath(os.path.join(src_path, '../../../lib'))
+
+libs = ['htd_validate']
+
+if src_path not in sys.path:
+    for lib in libs:
+        sys.path.insert(0, os.path.join(src_path, lib))
+
+import htd_validate.utils.hypergraph
+import htd_validate_tests.tests.utils.validateGraph_testcase as vtd
+
+from fhtd import FractionalHypertreeDecomposer
+from fhtd.dp import FractionalHypertreeDecompositionDP
+from fhtd.smt import FractionalHypertreeDecompositionCommandline as FractionalHypertreeDecomposition
+
+
+class TestFHTDDP(vtd.ValidateGraphTestCase):
+    _gr_classname = htd_validate.Hypergraph.__name__
+    _type = "Hypergraph"
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def testDP(self):
+        path = os.path.join(os.path.realpath(os.path.dirname(__file__)), "../graphs/")
+        for file in ("easy/triangle.hg", "easy/c4.hg", "easy/flw3.hg", "easy/dq6.hg", "medium/tpch-manual-q10-min.hg"):
+            fname = os.path.join(path, file)
+            with open("%s.opt" % os.path.splitext(fname)[0]) as f:
+                exp_width = float(f.readlines()[0])
+            hypergraph = htd_validate.Hypergraph.from_file(fname, fischl_format=True)
+            hypergraph.relabel_consecutively()
+
+            res = FractionalHypertreeDecompositionDP(hypergraph).solve()
+            self.assertEqual(exp_width, res['objective'],
+                             "td validation result wrong, should be: %s in: %s" % (exp_width, res['objective']))
+            self.assertTrue(res['decomposition'].validate(hypergraph))
+
+    def testDPClique(self):
+        fname = os.path.join(os.path.realpath(os.path.dirname(__file__)), "../graphs/twins/MaxCSP-connell.xml.hg")
+        hypergraph = htd_validate.Hypergraph.from_file(fname, fischl_format=True)
+        hypergraph.relabel_consecutively()
+        width = FractionalHypertreeDecompositionDP(hypergraph).solve()['objective']
+        clique = hypergraph.largest_hyperedge()
+        self.assertEqual(width, FractionalHypertreeDecompositionDP(hypergraph).solve(clique=clique)['objective'])
+
+    def testDPMatchesSMT(self):
+        path = os.path.join(os.path.realpath(os.path.dirname(__file__)), "../graphs/")
+        for file in ("easy/dq6.hg", "easy/Pi-20-10-20-30-22.xml.hg"):
+            fname = os.path.join(path, file)
+            hypergraph = htd_validate.Hypergraph.from_file(fname, fischl_format=True)
+            hypergraph.relabel_consecutively()
+            smt = FractionalHypertreeDecomposition(hypergraph, timeout=20, stream=StringIO(),
+                                                   solver_bin='../lib/z3-4.8.7-x64-ubuntu-16.04/bin/z3',
+                                                   checker_epsilon=None, ghtd=False, odebug=None).solve()
+            res = FractionalHypertreeDecompositionDP(hypergraph).solve()
+            self.assertEqual(smt['objective'], res['objective'], file)
+            self.assertTrue(res['decomposition'].validate(hypergraph))
+
+    def testDPTimeout(self):
+        fname = os.path.join(os.path.realpath(os.path.dirname(__file__)), "../graphs/rand-25-10-25-87-27.xml.hg")
+        hypergraph = htd_validate.Hypergraph.from_file(fname, fischl_format=True)
+        hypergraph.relabel_consecutively()
+        self.assertRaises(RuntimeError, FractionalHypertreeDecompositionDP(hypergraph, timeout=1e-9).solve)
+
+    def testDPTimeoutFallsBackToSMT(self):
+        fname = os.path.join(os.path.realpath(os.path.dirname(__file__)), "../graphs/easy/Pi-20-10-20-30-22.xml.hg")
+        hypergraph = htd_validate.Hypergraph.from_file(fname, fischl_format=True)
+        # without heuristic upper bound there is no fallback decomposition, the smt solver takes over
+        ret = FractionalHypertreeDecomposer(hypergraph, timeout=1e-9,
+                                            solver_bin='../lib/z3-4.8.7-x64-ubuntu-16.04/bin/z3').solve(
+            dp_threshold=30, heuristic_ub=False)
+        self.assertEqual(4, ret['objective'])
+        self.assertTrue(ret['optimal'])
@@ -78,3 +78,18 @@ class TestFHTDPreprocessor(vtd.ValidateGraphTestCase):
                              "td validation result wrong, should be: %s in: %s" % (width, exp_width))
 
         pass
+
+    def testEncodingImpliedConstraints(self):
+        # bag sizes and zero weights implied by the upper bound do not change the width
+        path = os.path.join(os.path.realpath(os.path.dirname(__file__)), "../graphs/")
+        for file in ['Pi-20-10-20-30-26.xml.hg', 'rand-25-10-25-87-27.xml.hg']:
+            with open(os.path.join(path, "%s.opt" % os.path.splitext(file)[0])) as f:
+                exp_width = float(f.readlines()[0])
+            hypergraph = htd_validate.Hypergraph.from_file(os.path.join(path, file), fischl_format=True)
+            stream = StringIO()
+            decomposer = FractionalHypertreeDecomposition(hypergraph, timeout=20, stream=stream,
+                                                          solver_bin='../lib/z3-4.8.7-x64-ubuntu-16.04/bin/z3',
+                                                          checker_epsilon=None, ghtd=False, odebug=None)
+            res = decomposer.solve(ubound=exp_width, implied=True)
+            self.assertIn("(ite arc_1_2 1 0)", stream.getvalue())
+            self.assertEqual(res['objective'], exp_width)
@@ -0,0 +1,2 @@
+#!/usr/bin/evn false
+__all__ = ['']
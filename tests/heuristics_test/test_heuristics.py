@@ -0,0 +1,234 @@
+#!/usr/bin/env false
+from __future__ import absolute_import
+from __future__ import print_function
+
+import logging
+import os
+import sys
+import inspect
+
+# TODO: fixme
+src_path = os.path.abspath(os.path.realpath(inspect.getfile(inspect.currentframe())))
+sys.path.insert(0, os.path.realpath(os.path.join(src_path, '../../..')))
+
+src_path = os.path.realpath(os.path.join(src_path, '../../../lib'))
+
+libs = ['htd_validate']
+
+if src_path not in sys.path:
+    for lib in libs:
+        sys.path.insert(0, os.path.join(src_path, lib))
+
+import htd_validate.utils.hypergraph
+import htd_validate_tests.tests.utils.validateGraph_testcase as vtd
+
+import fhtd.heuristics as h
+import fhtd.tw_sat as tw
+
+
+class TestFHTDHeuristics(vtd.ValidateGraphTestCase):
+    _gr_classname = htd_validate.Hypergraph.__name__
+    _type = "Hypergraph"
+
+    def setUp(self):
+        logging.basicConfig(level=logging.INFO)
+
+    def tearDown(self):
+        pass
+
+    def filePathLocal(self, file):
+        return os.path.join(os.path.dirname(__file__), "../graphs/", file)
+
+    def loadLocal(self, file):
+        return self.loadFile(self.filePathLocal(file), fischl_format=True)
+
+    def testGYO(self):
+        for file in ("easy/dq6.hg", "easy/flw3.hg", "medium/tpch-manual-q10.hg", "medium/tpch-synthetic-q5.hg",
+                     "disconnected_components/tpch-synthetic-q2.hg"):
+            hg = self.loadLocal(file)
+            self.assertIsNotNone(hg)
+            res = h.gyo_reduction(hg)
+            self.assertIsNotNone(res, file)
+            ordering, witness = res
+            self.assertEqual(sorted(hg.nodes()), sorted(ordering))
+            for v in ordering:
+                self.assertIn(v, hg.get_edge(witness[v]))
+
+        for file in ("easy/triangle.hg", "easy/c4.hg", "medium/imdb-q13a.hg", "twins/MaxCSP-connell.xml.hg"):
+            hg = self.loadLocal(file)
+            self.assertIsNotNone(hg)
+            self.assertFalse(h.is_alpha_acyclic(hg), file)
+
+    def testJoinTree(self):
+        hg = self.loadLocal("medium/tpch-synthetic-q5.hg")
+        hg.relabel_consecutively()
+        ftd = h.join_tree_decomposition(hg)
+        self.assertIsNotNone(ftd)
+        self.assertTrue(ftd.validate(hg))
+        self.assertEqual(1, ftd.width())
+
+        self.assertIsNone(h.join_tree_decomposition(self.loadLocal("easy/triangle.hg")))
+
+    def testFractionalEdgeCover(self):
+        hg = self.loadLocal("easy/triangle.hg")
+        value, weights = h.fractional_edge_cover(hg, hg.nodes())
+        self.assertEqual(1.5, value)
+        self.assertEqual(1.5, sum(weights.values()))
+        value, weights = h.fractional_edge_cover(hg, hg.nodes(), ghtd=True)
+        self.assertEqual(2, value)
+
+    def testFractionalEdgeCoverChecker(self):
+        # the closed neighbourhoods agree with the cover LP of htd_validate (used by the checker)
+        for file in ("easy/dq6.hg", "easy/flw3.hg", "easy/adlerexample.hg", "easy/rand-8-20-5-18-800-01.xml.hg",
+                     "Pi-20-10-20-30-26.xml.hg", "rand-25-10-25-87-27.xml.hg"):
+            hg = self.loadLocal(file)
+            for v in hg.nodes():
+                bag = set()
+                for vs in hg.edges().values():
+                    if v in vs:
+                        bag.update(vs)
+                value, weights = h.fractional_edge_cover(hg, bag)
+                self.assertAlmostEqual(hg.fractional_cover(bag), float(value), places=5, msg=file)
+                self.assertEqual(value, sum(weights.values()))
+                for u in bag:
+                    self.assertGreaterEqual(sum(w for e, w in weights.items() if u in hg.get_edge(e)), 1)
+                integral, chosen = h.fractional_edge_cover(hg, bag, ghtd=True)
+                self.assertGreaterEqual(integral, value)
+                self.assertEqual(bag, set(u for e in chosen for u in hg.get_edge(e)) & bag)
+
+    def testFractionalEdgeCoverRandom(self):
+        # the simplex agrees with the cover LP of htd_validate on random hypergraphs
+        import random
+        rnd = random.Random(1)
+        for _ in range(200):
+            hg = self.loadLocal("easy/triangle.hg")
+            n = rnd.randint(4, 12)
+            for _ in range(rnd.randint(2, 14)):
+                hg.add_hyperedge(tuple(rnd.sample(range(1, n + 1), rnd.randint(2, min(n, 4)))))
+            nodes = sorted(hg.nodes())
+            bag = rnd.sample(nodes, rnd.randint(1, len(nodes)))
+            value, weights = h.fractional_edge_cover(hg, bag)
+            self.assertAlmostEqual(hg.fractional_cover(bag), float(value), places=5)
+            self.assertEqual(value, sum(weights.values()))
+
+    def testFractionalEdgeCovers(self):
+        hg = self.loadLocal("rand-25-10-25-87-27.xml.hg")
+        bags = [hg.nodes()] + [set(vs) for vs in hg.edges().values()]
+        for v in hg.nodes():
+            bags.append(set(u for vs in hg.edges().values() if v in vs for u in vs))
+            bags.append(set(bags[-1]) - {v})
+        for ghtd in (False, True):
+            for bag, (value, weights) in zip(bags, h.fractional_edge_covers(hg, bags, ghtd=ghtd)):
+                self.assertEqual(h.fractional_edge_cover(hg, bag, ghtd=ghtd)[0], value)
+                self.assertEqual(value, sum(weights.values()))
+                for u in bag:
+                    self.assertGreaterEqual(sum(w for e, w in weights.items() if u in hg.get_edge(e)), 1)
+
+    def testIntegralEdgeCoverCap(self):
+        rows = [frozenset((i, (i + 1) % 9)) for i in range(9)]
+        self.assertEqual((5, True), h.integral_edge_cover(9, rows, list(range(9)))[::2])
+        # out of nodes, the greedy cover is still a cover (but not proven minimal)
+        value, chosen, exact = h.integral_edge_cover(9, rows, list(range(9)), max_nodes=1)
+        self.assertGreaterEqual(value, 5)
+        self.assertFalse(exact)
+        self.assertEqual(set(range(9)), set(u for i in chosen for u in rows[i]))
+
+    def testChordal(self):
+        for file, width in (("easy/triangle.hg", 1.5), ("easy/c4.hg", 2), ("medium/tpch-synthetic-q5.hg", 1)):
+            hg = self.loadLocal(file)
+            hg.relabel_consecutively()
+            self.assertTrue(h.is_chordal(hg), file)
+            res = h.chordal_decomposition(hg)
+            self.assertIsNotNone(res)
+            self.assertEqual(width, res[0])
+            self.assertTrue(res[1].validate(hg))
+
+        for file in ("easy/adlerexample.hg", "medium/imdb-q13a.hg", "hard/dubois20.hg"):
+            hg = self.loadLocal(file)
+            self.assertIsNone(h.perfect_elimination_ordering(hg), file)
+            self.assertIsNone(h.chordal_decomposition(hg), file)
+
+    def testHeuristicUpperBound(self):
+        for file, width in (("easy/triangle.hg", 1.5), ("easy/c4.hg", 2), ("Pi-20-10-20-30-26.xml.hg", 3.5),
+                            ("rand-25-10-25-87-27.xml.hg", 5.5)):
+            hg = self.loadLocal(file)
+            hg.relabel_consecutively()
+            ub, ordering, weights, name = h.heuristic_ordering(hg)
+            self.assertGreaterEqual(ub, width)
+            self.assertEqual(sorted(hg.nodes()), sorted(ordering))
+            self.assertEqual(ub, h.ordering_width(hg, ordering)[0])
+            ub, ftd = h.heuristic_decomposition(hg)
+            self.assertTrue(ftd.validate(hg))
+            self.assertEqual(ub, ftd.width())
+
+    def testLocalSearch(self):
+        for file, width in (("easy/adlerexample.hg", 2), ("Pi-20-10-20-30-26.xml.hg", 3.5)):
+            hg = self.loadLocal(file)
+            hg.relabel_consecutively()
+            heur = h.heuristic_ordering(hg)[0]
+            ub, ordering, weights = h.local_search_ordering(hg, 2, seed=1, seeds=2)
+            self.assertGreaterEqual(ub, width)
+            self.assertLessEqual(ub, heur)
+            self.assertEqual(sorted(hg.nodes()), sorted(ordering))
+            self.assertEqual(ub, h.ordering_width(hg, ordering)[0])
+            ub, ftd = h.local_search_decomposition(hg, 1, lbound=width)
+            self.assertTrue(ftd.validate(hg))
+            self.assertEqual(ub, ftd.width())
+
+        hg = self.loadLocal("easy/adlerexample.hg")
+        self.assertEqual(2, h.local_search_ordering(hg, 5, lbound=2)[0])
+
+    def testMultilevel(self):
+        hg = self.loadLocal("ghtd/2bitcomp_5.hg")
+        hg.relabel_consecutively()
+        heur = h.heuristic_ordering(hg)[0]
+        ub, ordering, weights = h.multilevel_ordering(hg, 2, seed=1, coarse_size=16)
+        self.assertLessEqual(ub, heur)
+        self.assertEqual(sorted(hg.nodes()), sorted(ordering))
+        self.assertEqual(ub, h.ordering_width(hg, ordering)[0])
+        ub, ftd = h.multilevel_decomposition(hg, 1, coarse_size=16)
+        self.assertTrue(ftd.validate(hg))
+        self.assertEqual(ub, ftd.width())
+
+    def testCoverCache(self):
+        hg = self.loadLocal("Pi-20-10-20-30-26.xml.hg")
+        covers = h.FractionalCoverCache(hg, maxsize=4)
+        nodes = sorted(hg.nodes())
+        bags = [nodes[i:i + 5] for i in range(0, 15, 3)]
+        res = covers.covers(bags)
+        for bag, (value, weights) in zip(bags, res):
+            self.assertEqual(h.fractional_edge_cover(hg, bag)[0], value)
+        self.assertEqual(len(bags), covers.misses)
+        self.assertEqual(4, len(covers))
+        self.assertEqual(res[-1], covers.cover(bags[-1]))
+        self.assertEqual(1, covers.hits)
+        # evicted (least recently used)
+        covers.cover(bags[0])
+        self.assertEqual(len(bags) + 1, covers.misses)
+        # closed form for subsets of a hyperedge
+        self.assertEqual(1, covers.value(hg.get_edge(1)))
+        self.assertEqual(1, covers.shortcuts)
+
+    def testLowerBound(self):
+        for file, width in (("easy/triangle.hg", 1.5), ("easy/c4.hg", 2), ("Pi-20-10-20-30-26.xml.hg", 3.5),
+                            ("rand-25-10-25-87-27.xml.hg", 5.5)):
+            hg = self.loadLocal(file)
+            hg.relabel_consecutively()
+            degeneracy = h.degeneracy_lower_bound(hg)
+            contraction = h.contraction_lower_bound(hg)
+            self.assertLessEqual(degeneracy, width)
+            self.assertLessEqual(contraction, width)
+            self.assertEqual(max(degeneracy, contraction), h.heuristic_lower_bound(hg)[0])
+        # the engines stop at the cutoff
+        hg = self.loadLocal("Pi-20-10-20-30-26.xml.hg")
+        self.assertEqual(3, h.degeneracy_lower_bound(hg))
+        self.assertEqual((3, 'degeneracy'), h.heuristic_lower_bound(hg, cutoff=3))
+
+    def testTreewidthBounds(self):
+        for file, width in (("easy/triangle.hg", 2), ("easy/c4.hg", 3)):
+            self.assertEqual((width, width), tw.treewidth_bounds(self.loadLocal(file), timeout=10))
+        hg = self.loadLocal("Pi-20-10-20-30-26.xml.hg")
+        lower, upper = tw.treewidth_bounds(hg, timeout=5)
+        self.assertLessEqual(lower, upper)
+        # fhtw >= (tw + 1) / rank
+        self.assertLessEqual(float(lower + 1) / hg.size_largest_hyperedge(), 3.5)
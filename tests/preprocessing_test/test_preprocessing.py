@@ -24,6 +24,16 @@ import htd_validate.utils.hypergraph_primalview as hgpv
 import htd_validate_tests.tests.utils.validateGraph_testcase as vtd
 
 import fhtd.preprocessing.preprocessing as p
+import fhtd.preprocessing.dominated as dp
+import fhtd.preprocessing.twins as tw
+import fhtd.preprocessing.primal as pr
+import fhtd.preprocessing.replay as rp
+import fhtd.preprocessing.cliques as cl
+import fhtd.preprocessing.native_cliques as nc
+import fhtd.preprocessing.symmetry as sy
+import fhtd.utils.cache as ch
+import fhtd.utils.race as ra
+import fhtd.heuristics as h
 import fhtd as d
 
 
@@ -149,6 +159,65 @@ class TestFHTDPreprocessor(vtd.ValidateGraphTestCase):
                           # [[1], [2], [3], [4], [5], [6], [7], [8], [9], [10], [11], [12], [13]],
                           sorted(x for x in pp._pp.hgp.iter_twin_vertices()))
 
+    def testWorklist(self):
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        self.assertIsNotNone(hg)
+        hg.add_node(99)
+        hg.add_hyperedge((43, 13))
+        hg.add_hyperedge((22, 9, 2))
+        hg.add_hyperedge((23, 22))
+        pp = p.FractionalHyperTreeDecomposition_Preprocessor(hgpv.HypergraphPrimalView(hg))
+        pp._init_worklist()
+        pp._drain_worklist()
+        # the closed neighbourhoods of the circulant (its primal graph is K13) exceed the limit
+        self.assertEquals(13, hg.number_of_nodes())
+        self.assertEquals({99, 43, 22, 23}, set(b[0] for _, b, _ in pp.replay))
+        self.assertEquals(1, pp.lb)
+        # removed vertices are never part of a later parent bag
+        removed = set()
+        for parent, bag, _ in pp.replay:
+            self.assertTrue(removed.isdisjoint(parent))
+            removed.update(bag)
+
+        # without the limit the whole circulant is simplicial
+        pp._init_worklist()
+        pp._drain_worklist(clique_prevent_he_up_to=14)
+        self.assertEquals(0, hg.number_of_nodes())
+        self.assertEquals(17, len(pp.replay))
+        self.assertAlmostEqual(13 / 7.0, float(pp.lb))
+
+    def testUpdateLbAfterRelabel(self):
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        self.assertIsNotNone(hg)
+        for e in ((43, 53), (53, 63), (63, 43)):
+            hg.add_hyperedge(e)
+        pp = p.FractionalHyperTreeDecomposition_Preprocessor(hgpv.HypergraphPrimalView(hg))
+        self.assertEquals(1.5, pp.covers.value([43, 53, 63]))
+        revert_nodes, _ = hg.relabel_consecutively()
+        pp.relabeled()
+        # entries of the old labels are gone
+        self.assertEquals(0, len(pp.covers))
+        triangle = [v for v in hg.nodes() if revert_nodes[v] in (43, 53, 63)]
+        self.assertEquals(3, len(triangle))
+        pp.update_lb(triangle, len(triangle), max_clique=False)
+        self.assertEquals(1.5, pp.lb)
+
+    def testCoverCacheAfterDeletion(self):
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        self.assertIsNotNone(hg)
+        hg.add_hyperedge((41, 42, 43))
+        hg.add_hyperedge((41, 42, 44))
+        pp = p.FractionalHyperTreeDecomposition_Preprocessor(hgpv.HypergraphPrimalView(hg))
+        self.assertEquals(1, pp.covers.value([41, 42]))
+        self.assertEquals(2, pp.covers.value([41, 42, 43, 44]))
+        pp._delete(43)
+        # the first hyperedge might be dropped as subsumed, the covers only refer to existing edges
+        for bag in ([41, 42], [41, 42, 44]):
+            value, weights = pp.covers.cover(bag)
+            self.assertEquals(1, value)
+            for e in weights:
+                self.assertIn(e, hg.edges())
+
     def testAlmostSimplicialHypergraph(self):
         hg = self.loadFile(self.filePath("testHG/") + "C4+.edge")
         self.assertIsNotNone(hg)
@@ -173,6 +242,277 @@ class TestFHTDPreprocessor(vtd.ValidateGraphTestCase):
         self.assertEquals(list(tuple(pp.hgp.hg.edges().values())[0]), list(pp.hgp.hg.nodes_iter()))
         print(pp.hgp.hg.edges())
 
+    def testPendingContraction(self):
+        hg = self.loadFile(self.filePath("testHG/") + "C4+.edge")
+        self.assertIsNotNone(hg)
+        pp = p.FractionalHyperTreeDecomposition_Preprocessor(hgpv.HypergraphPrimalView(hg))
+        self.assertEquals(1, pp.lb)
+        # not safe yet, the candidate is queued
+        self.assertFalse(pp.almost_simplicial_hypergraph(edge_contr=True))
+        self.assertEquals(5, len(pp.hgp))
+        self.assertEquals(1, pp.stats['pending'])
+        self.assertFalse(pp.fire_pending())
+        # the lower bound proves it safe (e.g., by the result of another component)
+        pp.consider_lb(2)
+        self.assertTrue(pp.fire_pending())
+        self.assertTrue(pp.almost_simplicial_hypergraph(edge_contr=True))
+        self.assertEquals(4, len(pp.hgp))
+        self.assertEquals({'contractions': 1, 'queued': 1, 'fired': 1, 'splits': 0, 'pending': 0}, pp.stats)
+
+    def testBitsetPrimal(self):
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        self.assertIsNotNone(hg)
+        hg.add_hyperedge((100, 1))
+        hg.add_hyperedge((100, 2))
+        hg.add_hyperedge((101, 3))
+        g = pr.BitsetPrimalGraph(hg)
+        self.assertTrue(g.is_clique(g.mask(range(1, 14))))
+        self.assertTrue(g.is_simplicial(100))
+        self.assertFalse(g.is_simplicial(1))
+        self.assertEquals([], [c for c in g.twin_classes() if 100 in c or 101 in c])
+        g.contract([101], 3)
+        self.assertNotIn(101, g)
+        g.remove(1)
+        self.assertEquals([2], g.members(g.neighbours(100)))
+        self.assertEquals(11, g.degree(3))
+
+    def testReplayLog(self):
+        log = rp.ReplayLog()
+        log.append((2, 3), (1,), 1.0)
+        log.append((3,), (2,), 1.5)
+        log.append((4, 5), (3,), 2.0, contraction=True)
+        self.assertEquals(3, len(log))
+        self.assertEquals([((2, 3), (1,), 1.0), ((3,), (2,), 1.5), ((4, 5), (3,), 2.0)], list(log))
+        self.assertEquals(((3,), (2,), 1.5), log.entry(2))
+        self.assertIn(3, log)
+        self.assertNotIn(4, log)
+        self.assertEquals([1, 2, 3], log.ordering())
+        self.assertEquals(1, log.contractions)
+
+    def testReplayDecomposition(self):
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        self.assertIsNotNone(hg)
+        hg.add_hyperedge((43, 13))
+        hg.add_hyperedge((22, 9, 2))
+        hg.add_hyperedge((23, 22))
+        gcheck = hg.copy()
+        pp = p.FractionalHyperTreeDecomposition_Preprocessor(hgpv.HypergraphPrimalView(hg))
+        pp._init_worklist()
+        pp._drain_worklist()
+        self.assertEquals({43, 22, 23}, set(b[0] for _, b, _ in pp.replay))
+        # the edge weights of the removed (hyper-degree 1) vertices are logged and reused
+        for v in (43, 22, 23):
+            self.assertEquals(1, sum(pp.replay.cover(v).values()))
+        width, ftd = h.heuristic_decomposition(hg)
+        replayed, ftd = rp.replay_decomposition(gcheck, ftd, pp.replay)
+        self.assertLessEqual(replayed, max(width, 1))
+        ftd.set_graph(gcheck)
+        self.assertTrue(ftd.validate(gcheck))
+
+    def testPreprocessingCache(self):
+        import tempfile
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        self.assertIsNotNone(hg)
+        pp = p.FractionalHyperTreeDecomposition_Preprocessor(hgpv.HypergraphPrimalView(hg))
+        replay, lb = pp.preprocess()
+        directory = tempfile.mkdtemp()
+        cache = ch.PreprocessingCache(directory, 'C13_7')
+        params = {'split_size': 10}
+        self.assertIsNone(cache.load(params))
+        self.assertTrue(cache.store(params, [{'hg': hg, 'replay': replay, 'lb': lb, 'stats': pp.stats}]))
+        self.assertIsNone(cache.load({'split_size': 0}))
+        self.assertIsNone(ch.PreprocessingCache(directory, 'other').load(params))
+        record = cache.load(params)[0]
+        self.assertEquals(list(replay), list(record['replay']))
+        self.assertEquals(sorted(hg.nodes()), sorted(record['hg'].nodes()))
+        restored = p.FractionalHyperTreeDecomposition_Preprocessor(hgpv.HypergraphPrimalView(record['hg']))
+        restored.restore(record['replay'], record['lb'], record['stats'])
+        self.assertEquals(lb, restored.lb)
+        self.assertEquals(pp.stats, restored.stats)
+        # the least recently used entry goes first
+        os.utime(cache.path(params), (0, 0))
+        cache.max_bytes = os.path.getsize(cache.path(params))
+        cache.store({'split_size': 0}, [])
+        self.assertIsNone(cache.load(params))
+        self.assertEquals([], cache.load({'split_size': 0}))
+
+    def testCliqueSession(self):
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        self.assertIsNotNone(hg)
+        session = cl.CliqueSession(hg)
+        hyperclique = session.largest_hyperclique(3)[0]
+        for e, vs in hg.edges().items():
+            self.assertTrue(len(set(vs) & set(hyperclique)) < 3)
+        # optimum is reused, the second query is bounded by the first one
+        self.assertIs(session.largest_hyperclique(3), session.largest_hyperclique(3))
+        clique = session.largest_clique()[0]
+        self.assertTrue(len(clique) >= len(hyperclique))
+        adj = {v: set() for v in hg.nodes()}
+        for vs in hg.edges().values():
+            for v in vs:
+                adj[v].update(vs)
+        for v in clique:
+            self.assertTrue(set(clique) <= adj[v])
+        # the same queries as the standalone encodings of htd_validate
+        for encoding, found in ((htd_validate.Hypergraph.encoder_k_hyperclique(hg, 3), hyperclique),
+                                (htd_validate.Hypergraph.encoder_largest_clique(hg), clique)):
+            self.assertEquals(max(len(c) for c in hg.solve_asp(encoding, clingoctl=None, timeout=60)[2]), len(found))
+
+    def testAutomorphisms(self):
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        self.assertIsNotNone(hg)
+        # triangle, its rotations are automorphisms
+        hg.add_hyperedge((100, 101))
+        hg.add_hyperedge((101, 102))
+        hg.add_hyperedge((102, 100))
+        generators = sy.automorphism_generators(hg)
+        self.assertTrue(any(100 in g for g in generators))
+        for g in generators:
+            self.assertTrue(sy.is_automorphism(hg, g))
+        self.assertFalse(sy.is_automorphism(hg, {100: 1, 1: 100}))
+        for g in sy.automorphism_generators(hg, fixed={100, 101}):
+            self.assertTrue(sy.is_automorphism(hg, g))
+            self.assertTrue({100, 101, 102}.isdisjoint(g))
+
+    def testBackgroundClique(self):
+        import threading
+        stop = threading.Event()
+        background = cl.BackgroundClique(lambda: [[1, 2]] if stop.wait(60) else [], stop.set)
+        self.assertIsNone(background.result(0.01))
+        self.assertFalse(background.done())
+        self.assertEquals([[1, 2]], background.cancel())
+        self.assertTrue(background.done())
+        # without cancel, a running computation is abandoned
+        background = cl.BackgroundClique(lambda: [] if stop.wait(60) else [])
+        self.assertEquals([], background.cancel())
+
+    def testNativeCliqueFormat(self):
+        import io
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        self.assertIsNotNone(hg)
+        f = io.StringIO()
+        vertices = nc.write_mtx(hg, f)
+        lines = f.getvalue().splitlines()
+        n, _, m = map(int, lines[1].split())
+        self.assertEquals(hg.number_of_nodes(), n)
+        self.assertEquals(m, len(lines) - 2)
+        e = next(iter(hg.edges().values()))
+        output = "Maximum clique: {0}\n".format(" ".join(str(vertices.index(v) + 1) for v in e))
+        self.assertEquals(list(e), nc.parse_clique(output, vertices))
+        self.assertTrue(nc.is_clique(hg, list(e)))
+        self.assertIsNone(nc.parse_clique("", vertices))
+
+    def testNativeCliqueMissing(self):
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        provider = nc.PMCCliqueProvider(path=self.filePath("testHG/"), threads=2)
+        # nothing is built at runtime
+        self.assertRaises(RuntimeError, provider.binary)
+        self.assertRaises(RuntimeError, provider.largest_clique, hg)
+        cmd = provider.command('pmc', 'g.mtx', 60)
+        self.assertEquals('60', cmd[cmd.index('-w') + 1])
+        self.assertNotIn('-k', cmd)
+
+    def testGap(self):
+        hg = self.loadFile(self.filePathLocal("../graphs/rand-25-10-25-87-27.xml.hg"), fischl_format=True)
+        res = d.FractionalHypertreeDecomposer(hg, solver_bin='lib/optimathsat/optimathsat-1.6.3').solve(gap=1)
+        # fhtw 5.5
+        self.assertLessEqual(res['lower_bound'], 5.5)
+        self.assertGreaterEqual(res['objective'], 5.5)
+        self.assertLessEqual(res['objective'], 2 * res['lower_bound'])
+        self.assertAlmostEqual(res['gap'], float(res['objective'] / res['lower_bound'] - 1))
+        self.assertTrue(res['td'].validate(hg))
+
+    def testBoundRace(self):
+        import threading
+        race = ra.BoundRace(lb=1, ub=3)
+        release = threading.Event()
+
+        def slow():
+            while not race.stopped():
+                release.wait(0.01)
+            return 'stopped'
+
+        def fails():
+            raise RuntimeError('engine failed')
+
+        race.start('slow', slow)
+        race.start('fails', fails)
+        race.start('cancellable', release.wait, release.set)
+        self.assertFalse(race.wait(timeout=0.1))
+        self.assertRaises(RuntimeError, race.result, 'fails')
+        self.assertFalse(race.done('fails'))
+        self.assertFalse(race.raise_lb(2))
+        race.start('bound', lambda: race.raise_lb(3))
+        self.assertTrue(race.wait())
+        race.cancel()
+        self.assertEquals('stopped', race.result('slow'))
+        self.assertTrue(race.done('cancellable'))
+        self.assertEquals({'lb': 3.0, 'ub': 3.0, 'met': True},
+                          {k: v for k, v in race.stats.items() if k != 'engines'})
+        # gap
+        race = ra.BoundRace(lb=2, ub=3, gap=0.5)
+        self.assertTrue(race.met())
+        self.assertTrue(ra.BoundRace(lb=2).lower_ub(2))
+
+    def testSplitVertices(self):
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        self.assertIsNotNone(hg)
+        # wheel (hub 100, rim 101..104) attached at vertex 1
+        hg.add_hyperedge((1, 100))
+        for v in range(101, 105):
+            hg.add_hyperedge((100, v))
+            hg.add_hyperedge((v, 101 + v % 4))
+        pp = p.FractionalHyperTreeDecomposition_Preprocessor(hgpv.HypergraphPrimalView(hg))
+        self.assertTrue(pp.split_vertices())
+        self.assertTrue(set(range(100, 105)).isdisjoint(hg.nodes()))
+        self.assertIn(1, hg.nodes())
+        self.assertEquals(set(range(100, 105)), set(b[0] for _, b, _ in pp.replay if b[0] >= 100))
+        self.assertTrue(pp.lb >= 2)
+        self.assertTrue(pp.stats['splits'] >= 1)
+
+    def testDominatedEdges(self):
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        self.assertIsNotNone(hg)
+        hg.add_hyperedge((100, 101))
+        hg.add_hyperedge((102, 100, 101))
+        hg.add_hyperedge((101, 100))
+        hg.add_hyperedge((100, 101, 102))
+        dominated = dp.dominated_hyperedges(hg)
+        for e, f in dominated.items():
+            self.assertNotIn(f, dominated)
+            self.assertTrue(set(hg.get_edge(e)) <= set(hg.get_edge(f)))
+        added = sorted(e for e, vs in hg.edges().items() if set(vs) <= {100, 101, 102})
+        self.assertEquals(4, len(added))
+        # identical edges keep the smallest id
+        self.assertEquals({added[0]: added[1], added[2]: added[1], added[3]: added[1]},
+                          {e: dominated[e] for e in added if e in dominated})
+
+    def testTwinQuotient(self):
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        self.assertIsNotNone(hg)
+        hg.add_hyperedge((100, 101, 1))
+        hg.add_hyperedge((101, 100, 102, 2))
+        classes = tw.twin_classes(hg)
+        self.assertEquals([101], classes[100])
+        self.assertNotIn(102, [v for twins in classes.values() for v in twins])
+        tw.quotient_twins(hgpv.HypergraphPrimalView(hg), classes)
+        self.assertNotIn(101, hg.nodes())
+        self.assertIn(100, hg.nodes())
+        self.assertEquals({}, tw.twin_classes(hg))
+
+    def testTwinsPrimalVsHyperedges(self):
+        hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
+        self.assertIsNotNone(hg)
+        # 100 and 101 have the same closed neighbourhood, but lie in different hyperedges
+        hg.add_hyperedge((100, 101, 102))
+        hg.add_hyperedge((100, 102, 1))
+        hg.add_hyperedge((101, 102, 1))
+        hg.add_hyperedge((103, 104, 1))
+        primal = pr.BitsetPrimalGraph(hg).twin_classes()
+        self.assertTrue(any({100, 101} <= set(vs) for vs in primal))
+        # only vertices in the same hyperedges are twins for the encoding
+        self.assertEquals({103: [104]}, tw.twin_classes(hg))
+
     def testAlmostSimplicialPrimal(self):
         hg = self.loadFile(self.filePath("testHG/") + "C13_7.edge")
         self.assertIsNotNone(hg)